@@ -50,3 +50,6 @@ ALTER TABLE documents DISABLE ROW LEVEL SECURITY;
 -- ============================================
 -- Done! Your database is now ready.
 -- ============================================
+
+-- Schema changes after this baseline live in migrations/ — apply them in order
+-- with `python scripts/migrate.py` (needs SUPABASE_DB_URL in backend/.env).
@@ -0,0 +1,268 @@
+"""Canvas graph model and the server-side edits applied to it."""
+from typing import Any, Dict, List, Optional, Tuple
+
+# Supported ops:
+#   {"op": "upsert_node", "node": {"id": ..., ...}}   replace the node with this id, or add it
+#   {"op": "delete_node", "id": ...}                   remove node and every edge touching it
+#   {"op": "upsert_edge", "edge": {"id": ..., ...}}   replace the edge with this id, or add it
+#   {"op": "delete_edge", "id": ...}
+CANVAS_OPS = ("upsert_node", "delete_node", "upsert_edge", "delete_edge")
+
+MAX_OPS_PER_PATCH = 500
+
+EDGE_STYLE = {"stroke": "#D6D3D1", "strokeWidth": 1.5}
+USERFLOW_EDGE_STYLE = {"stroke": "#7C3AED", "strokeWidth": 1.5, "strokeDasharray": "4 4"}
+
+DEFAULT_POSITION = (400, 300)
+
+
+class CanvasPatchError(ValueError):
+    """Raised when a patch operation is malformed."""
+
+
+def _require_strings(kind: str, item: Dict[str, Any], fields: Tuple[str, ...]) -> None:
+    """Fields that CanvasGraph uses as index keys must be strings (or absent, for optional ones)."""
+    for name in fields:
+        value = item.get(name)
+        if name == "id" and not value:
+            raise CanvasPatchError(f"{kind} requires an id")
+        if value is not None and not isinstance(value, str):
+            raise CanvasPatchError(f"{kind} {name} must be a string")
+
+
+class CanvasGraph:
+    """Indexed view of a stored {"nodes": [...], "edges": [...]} canvas.
+
+    Nodes and edges are kept in insertion-ordered dicts keyed by id, with
+    per-type and source/target indexes, so lookups, type counts and
+    "does this node exist" checks don't rescan the node list. Node/edge
+    dicts are shared with the source document, not copied. `revision` goes up
+    with every edit made through these methods.
+    """
+
+    __slots__ = ("nodes", "edges", "revision", "_by_type", "_out", "_in")
+
+    def __init__(self, canvas_state: Optional[Dict[str, Any]] = None):
+        self.nodes: Dict[str, Dict] = {}
+        self.edges: Dict[str, Dict] = {}
+        self.revision = 0
+        # Dicts used as ordered sets
+        self._by_type: Dict[str, Dict[str, None]] = {}
+        self._out: Dict[str, Dict[str, None]] = {}
+        self._in: Dict[str, Dict[str, None]] = {}
+
+        canvas_state = canvas_state or {}
+        for node in canvas_state.get("nodes") or []:
+            if isinstance(node, dict) and "id" in node:
+                self.upsert_node(node)
+        for edge in canvas_state.get("edges") or []:
+            if isinstance(edge, dict) and "id" in edge:
+                self.upsert_edge(edge)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.nodes
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    # --- Lookups ---
+
+    def node(self, node_id: str) -> Optional[Dict]:
+        return self.nodes.get(node_id)
+
+    def position(self, node_id: str, default: Tuple[float, float] = DEFAULT_POSITION) -> Tuple[float, float]:
+        """(x, y) of a node, or default if it isn't on the canvas."""
+        node = self.nodes.get(node_id)
+        pos = node.get("position") if node else None
+        if not isinstance(pos, dict):
+            return default
+        return pos.get("x", default[0]), pos.get("y", default[1])
+
+    def nodes_of_type(self, node_type: str) -> List[Dict]:
+        return [self.nodes[i] for i in self._by_type.get(node_type, ())]
+
+    def count_type(self, node_type: str) -> int:
+        return len(self._by_type.get(node_type, ()))
+
+    def children(self, node_id: str) -> List[str]:
+        """Ids of nodes this node has an edge to."""
+        return [self.edges[e]["target"] for e in self._out.get(node_id, ())]
+
+    def parents(self, node_id: str) -> List[str]:
+        """Ids of nodes with an edge into this node."""
+        return [self.edges[e]["source"] for e in self._in.get(node_id, ())]
+
+    # --- Edits ---
+
+    def upsert_node(self, node: Dict) -> None:
+        """Replace the node with this id (keeping its place), or append it."""
+        node_id = node["id"]
+        old = self.nodes.get(node_id)
+        if old is not None:
+            self._by_type.get(old.get("type"), {}).pop(node_id, None)
+        self.nodes[node_id] = node
+        self._by_type.setdefault(node.get("type"), {})[node_id] = None
+        self.revision += 1
+
+    def delete_node(self, node_id: str) -> None:
+        """Remove a node and every edge touching it."""
+        node = self.nodes.pop(node_id, None)
+        if node is not None:
+            self._by_type.get(node.get("type"), {}).pop(node_id, None)
+            self.revision += 1
+        for edge_id in list(self._out.get(node_id, ())) + list(self._in.get(node_id, ())):
+            self.delete_edge(edge_id)
+
+    def upsert_edge(self, edge: Dict) -> None:
+        edge_id = edge["id"]
+        if edge_id in self.edges:
+            self.delete_edge(edge_id)
+        self.edges[edge_id] = edge
+        self._out.setdefault(edge.get("source"), {})[edge_id] = None
+        self._in.setdefault(edge.get("target"), {})[edge_id] = None
+        self.revision += 1
+
+    def delete_edge(self, edge_id: str) -> None:
+        edge = self.edges.pop(edge_id, None)
+        if edge is None:
+            return
+        self._out.get(edge.get("source"), {}).pop(edge_id, None)
+        self._in.get(edge.get("target"), {}).pop(edge_id, None)
+        self.revision += 1
+
+    def add_node(self, node_id: str, node_type: str, position: Dict[str, float], data: Dict[str, Any],
+                 parent_id: Optional[str] = None, source_handle: str = "bottom",
+                 target_handle: Optional[str] = None, edge_type: str = "smoothstep",
+                 edge_style: Optional[Dict[str, Any]] = None) -> bool:
+        """Add a node (and the edge from its parent) unless the id is already present.
+
+        Returns True if the node was added.
+        """
+        if node_id in self.nodes:
+            return False
+        self.upsert_node({"id": node_id, "type": node_type, "position": position, "data": data})
+        if parent_id:
+            edge = {
+                "id": f"{parent_id}-{node_id}",
+                "source": parent_id,
+                "target": node_id,
+                "sourceHandle": source_handle,
+                "type": edge_type,
+                "animated": False,
+                "style": dict(edge_style or EDGE_STYLE),
+            }
+            if target_handle:
+                edge["targetHandle"] = target_handle
+            self.upsert_edge(edge)
+        return True
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize back to the stored {"nodes", "edges"} format."""
+        return {"nodes": list(self.nodes.values()), "edges": list(self.edges.values())}
+
+
+def check_canvas(canvas_state: Dict[str, Any]) -> None:
+    """Validate a whole {"nodes", "edges"} document the way apply_canvas_ops validates each op."""
+    for node in canvas_state.get("nodes") or []:
+        if not isinstance(node, dict):
+            raise CanvasPatchError("Canvas nodes must be objects")
+        _require_strings("node", node, ("id", "type"))
+    for edge in canvas_state.get("edges") or []:
+        if not isinstance(edge, dict):
+            raise CanvasPatchError("Canvas edges must be objects")
+        _require_strings("edge", edge, ("id", "source", "target"))
+
+
+def apply_canvas_ops(canvas_state: Dict[str, Any], ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Apply ops to a canvas and return the new {"nodes", "edges"} document.
+
+    Node/edge order is preserved; new items are appended.
+    """
+    if len(ops) > MAX_OPS_PER_PATCH:
+        raise CanvasPatchError(f"Too many operations (max {MAX_OPS_PER_PATCH})")
+
+    graph = CanvasGraph(canvas_state)
+
+    for op in ops:
+        kind = op.get("op") if isinstance(op, dict) else None
+        if kind not in CANVAS_OPS:
+            raise CanvasPatchError(f"Unsupported canvas operation: {kind}")
+
+        if kind == "upsert_node":
+            node = op.get("node")
+            if not isinstance(node, dict):
+                raise CanvasPatchError("upsert_node requires a node")
+            _require_strings("upsert_node", node, ("id", "type"))
+            graph.upsert_node(node)
+
+        elif kind == "delete_node":
+            _require_strings("delete_node", op, ("id",))
+            graph.delete_node(op["id"])
+
+        elif kind == "upsert_edge":
+            edge = op.get("edge")
+            if not isinstance(edge, dict):
+                raise CanvasPatchError("upsert_edge requires an edge")
+            _require_strings("upsert_edge", edge, ("id", "source", "target"))
+            graph.upsert_edge(edge)
+
+        elif kind == "delete_edge":
+            _require_strings("delete_edge", op, ("id",))
+            graph.delete_edge(op["id"])
+
+    return graph.to_dict()
+
+
+def _chat_node_position(graph: CanvasGraph, node: Dict[str, Any], node_type: str) -> Dict[str, float]:
+    """Layout for nodes added from chat — mirrors the workspace's client-side placement."""
+    root_x, root_y = graph.position("root")
+    parent_id = node.get("parentId")
+
+    if node_type == "userFlow" and parent_id:
+        # Directly below the parent feature
+        if parent_id in graph:
+            x, y = graph.position(parent_id)
+            return {"x": x, "y": y + 360}
+        return {"x": 400, "y": 680}
+    if node_type == "competitors":
+        if "ideation" in graph:
+            x, y = graph.position("ideation")
+            return {"x": x + 432, "y": y - 24}
+        return {"x": root_x + 318 + 432, "y": root_y - 216}
+    if node_type == "security":
+        if "system-map" in graph:
+            return {"x": root_x + 318, "y": graph.position("system-map")[1] - 104}
+        return {"x": root_x + 318, "y": root_y - 624}
+    if node_type == "featureGroup" and parent_id == "root":
+        # Horizontal row below root
+        col = graph.count_type("featureGroup")
+        return {"x": root_x - 200 + col * 300, "y": root_y + 180}
+    if parent_id in graph:
+        x, y = graph.position(parent_id)
+        return {"x": x + 250, "y": y + len(graph.children(parent_id)) * 120}
+    return {"x": 400, "y": 300}
+
+
+def apply_chat_canvas_updates(graph: CanvasGraph, updates: List[Dict[str, Any]]) -> bool:
+    """Apply [UPDATE_CANVAS] add_node updates to the graph.
+
+    Nodes whose id already exists are skipped. Returns True if anything was added.
+    """
+    changed = False
+    for update in updates:
+        if update.get("action") != "add_node" or not isinstance(update.get("node"), dict):
+            continue
+        node = update["node"]
+        if not node.get("id") or node["id"] in graph:
+            continue
+        node_type = node.get("type", "feature")
+        is_userflow = node_type == "userFlow"
+        changed |= graph.add_node(
+            node["id"], node_type,
+            _chat_node_position(graph, node, node_type),
+            node.get("data", {}),
+            parent_id=node.get("parentId"),
+            edge_type="dotted" if is_userflow else "smoothstep",
+            edge_style=USERFLOW_EDGE_STYLE if is_userflow else EDGE_STYLE,
+        )
+    return changed
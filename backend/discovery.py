@@ -0,0 +1,232 @@
+"""Normalized, parse-once view of a project's Phase 1-3 discovery data.
+
+phase_summaries has accumulated several shapes over time (JSON strings inside
+the JSON column, flat legacy ideation pillars, bare feature lists). All of that
+is handled here once so prompt builders can read plain attributes.
+"""
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+
+def _as_obj(value: Any) -> Any:
+    """Decode values that were stored as nested JSON strings."""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return {}
+    return value
+
+
+def _str_tuple(items: Any) -> Tuple[str, ...]:
+    if not isinstance(items, list):
+        return ()
+    return tuple(str(i) for i in items)
+
+
+@dataclass(frozen=True)
+class FlowStep:
+    __slots__ = ("action", "actor")
+    action: str
+    actor: str
+
+
+@dataclass(frozen=True)
+class Feature:
+    __slots__ = ("title", "sub_features", "user_flow")
+    title: str
+    sub_features: Tuple[str, ...]
+    user_flow: Tuple[FlowStep, ...]
+
+
+@dataclass(frozen=True)
+class Competitor:
+    __slots__ = ("name", "description", "url")
+    name: str
+    description: str
+    url: str
+
+
+@dataclass(frozen=True)
+class TechStack:
+    __slots__ = ("frontend", "backend", "database")
+    frontend: Tuple[str, ...]
+    backend: Tuple[str, ...]
+    database: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class DiscoverySummary:
+    __slots__ = (
+        "core_problem", "pain_point", "target_audience", "current_solutions",
+        "competitors", "features",
+        "complementary_features", "theme", "palette_name", "palette_colors",
+        "design_style", "design_guidelines", "tech_stack",
+    )
+    # Phase 1
+    core_problem: Optional[str]
+    pain_point: Optional[str]
+    target_audience: Optional[str]
+    current_solutions: Optional[str]
+    competitors: Tuple[Competitor, ...]
+    # Phase 2
+    features: Tuple[Feature, ...]
+    # Phase 3
+    complementary_features: Tuple[str, ...]
+    theme: Optional[str]
+    palette_name: Optional[str]
+    palette_colors: Tuple[str, ...]
+    design_style: Optional[str]
+    design_guidelines: Tuple[str, ...]
+    tech_stack: Optional[TechStack]
+
+
+def _parse_ideation(ideation: Any):
+    ideation = _as_obj(ideation) or {}
+    if not isinstance(ideation, dict):
+        return {}, ()
+    # New format nests pillars next to competitors; legacy format is the flat pillars dict
+    if "pillars" in ideation:
+        pillars = _as_obj(ideation.get("pillars")) or {}
+        raw_competitors = ideation.get("competitors") or []
+    else:
+        pillars = ideation
+        raw_competitors = []
+    competitors = tuple(
+        Competitor(str(c.get("name", "")), str(c.get("description", "")), str(c.get("url", "")))
+        for c in raw_competitors if isinstance(c, dict)
+    )
+    return (pillars if isinstance(pillars, dict) else {}), competitors
+
+
+def _parse_flow(user_flow: Any) -> Tuple[FlowStep, ...]:
+    steps = user_flow.get("steps", []) if isinstance(user_flow, dict) else []
+    if not isinstance(steps, list):
+        return ()
+    parsed = []
+    for step in steps:
+        if isinstance(step, dict):
+            parsed.append(FlowStep(str(step.get("action", step)), step.get("actor", "user")))
+        else:
+            parsed.append(FlowStep(str(step), "user"))
+    return tuple(parsed)
+
+
+def _parse_features(features_summary: Any) -> Tuple[Feature, ...]:
+    features_summary = _as_obj(features_summary)
+    if isinstance(features_summary, dict):
+        raw = features_summary.get("features", [])
+    elif isinstance(features_summary, list):
+        raw = features_summary  # legacy: bare list of titles or feature dicts
+    else:
+        raw = []
+    features = []
+    for i, f in enumerate(raw if isinstance(raw, list) else [], 1):
+        if isinstance(f, dict):
+            features.append(Feature(
+                str(f.get("title") or f"Feature {i}"),
+                _str_tuple(f.get("subFeatures", [])),
+                _parse_flow(f.get("userFlow")),
+            ))
+        else:
+            features.append(Feature(str(f), (), ()))
+    return tuple(features)
+
+
+def _parse_tech_stack(*candidates: Any) -> Optional[TechStack]:
+    for candidate in candidates:
+        candidate = _as_obj(candidate)
+        if isinstance(candidate, dict) and candidate:
+            return TechStack(
+                _str_tuple(candidate.get("frontend", [])),
+                _str_tuple(candidate.get("backend", [])),
+                _str_tuple(candidate.get("database", [])),
+            )
+    return None
+
+
+def build_discovery_summary(phase_summaries: Dict, mindmap_data: Optional[Dict] = None) -> DiscoverySummary:
+    """Normalize phase_summaries (+ mindmap_data fallbacks) into a DiscoverySummary."""
+    phase_summaries = phase_summaries if isinstance(phase_summaries, dict) else {}
+    mindmap_data = mindmap_data if isinstance(mindmap_data, dict) else {}
+
+    pillars, competitors = _parse_ideation(phase_summaries.get("1"))
+    design = _as_obj(phase_summaries.get("3")) or {}
+    if not isinstance(design, dict):
+        design = {}
+
+    palette = design.get("palette", {})
+    palette_name = palette.get("name") if isinstance(palette, dict) else None
+    palette_colors = _str_tuple(palette.get("colors", [])) if isinstance(palette, dict) else ()
+
+    if competitors:
+        current_solutions = ", ".join(c.name for c in competitors if c.name) or None
+        current_solutions = f"Competitors: {current_solutions}" if current_solutions else None
+    else:
+        current_solutions = pillars.get("current_solutions")
+
+    return DiscoverySummary(
+        core_problem=pillars.get("core_problem"),
+        pain_point=pillars.get("pain_point"),
+        target_audience=pillars.get("target_audience"),
+        current_solutions=current_solutions,
+        competitors=competitors,
+        features=_parse_features(phase_summaries.get("2")),
+        complementary_features=_str_tuple(design.get("complementary_features", [])),
+        theme=design.get("theme"),
+        palette_name=palette_name,
+        palette_colors=palette_colors,
+        design_style=design.get("design_style"),
+        design_guidelines=_str_tuple(design.get("design_guidelines", [])),
+        tech_stack=_parse_tech_stack(design.get("tech_stack"), mindmap_data.get("tech_stack")),
+    )
+
+
+# Memo of summaries keyed by project id + version (updated_at, bumped on every write)
+_SUMMARY_CACHE_SIZE = 256
+_summary_cache: "OrderedDict[tuple, DiscoverySummary]" = OrderedDict()
+_summary_lock = Lock()
+_summary_counts = {"hits": 0, "misses": 0}
+
+
+def cached_discovery_summary(project_id: str, updated_at: Optional[str], with_mindmap: bool,
+                             phase_summaries: Dict, mindmap_data: Dict) -> DiscoverySummary:
+    """Return the memoized summary for this project version, building it if needed.
+
+    Snapshots without an updated_at are never cached.
+    """
+    if not updated_at:
+        return build_discovery_summary(phase_summaries, mindmap_data)
+
+    key = (project_id, updated_at, with_mindmap)
+    with _summary_lock:
+        summary = _summary_cache.get(key)
+        if summary is not None:
+            _summary_cache.move_to_end(key)
+            _summary_counts["hits"] += 1
+            return summary
+        _summary_counts["misses"] += 1
+
+    summary = build_discovery_summary(phase_summaries, mindmap_data)
+    with _summary_lock:
+        _summary_cache[key] = summary
+        while len(_summary_cache) > _SUMMARY_CACHE_SIZE:
+            _summary_cache.popitem(last=False)
+    return summary
+
+
+def summary_cache_counts() -> Tuple[int, int]:
+    """(hits, misses) of the memo since the process started."""
+    with _summary_lock:
+        return _summary_counts["hits"], _summary_counts["misses"]
+
+
+def forget_discovery_summaries(project_ids) -> None:
+    """Drop memoized summaries for projects that no longer exist."""
+    project_ids = set(project_ids)
+    with _summary_lock:
+        for key in [k for k in _summary_cache if k[0] in project_ids]:
+            del _summary_cache[key]
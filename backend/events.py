@@ -0,0 +1,200 @@
+"""Per-project event channel (served as SSE at /api/projects/{id}/events).
+
+Publishers call publish_event() from request handlers or background
+threads. Events go through a broker so every worker process sees them:
+
+    InProcessBroker  single worker / local development (default)
+    RedisBroker      cross-worker pub/sub; set EVENTS_BROKER_URL=redis://...
+                     (any redis-py compatible client works, e.g. a local
+                     stand-in like fakeredis for development)
+
+Each worker then fans events out to its own connected subscribers.
+
+EventSource can't send an Authorization header, and a token in the URL ends
+up in access logs, so the client first exchanges its bearer token for a
+stream ticket: signed, bound to one user and project, valid for
+STREAM_TICKET_TTL_SECONDS. Tickets aren't stored, so any worker holding the
+same secret accepts them.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import itertools
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Set
+
+log = logging.getLogger(__name__)
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+EVENT_TYPES = ("section_ready", "pdf_ready", "step_options_ready", "canvas_patched")
+
+CHANNEL = "founderlab:project-events"
+
+# Per-subscriber buffer; a client that falls this far behind loses the oldest events
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class InProcessBroker:
+    """Delivers straight back to this process — only correct with a single worker."""
+
+    def __init__(self):
+        self._deliver: Optional[Callable[[str], None]] = None
+
+    def start(self, deliver: Callable[[str], None]) -> None:
+        self._deliver = deliver
+
+    def publish(self, message: str) -> None:
+        if self._deliver:
+            self._deliver(message)
+
+    def stop(self) -> None:
+        self._deliver = None
+
+
+class RedisBroker:
+    """Redis pub/sub: every worker publishes to and listens on one channel."""
+
+    def __init__(self, url: Optional[str] = None, client=None, channel: str = CHANNEL):
+        if client is None:
+            if not REDIS_AVAILABLE:
+                raise RuntimeError("EVENTS_BROKER_URL is set but the redis package is not installed")
+            client = redis.Redis.from_url(url)
+        self._client = client
+        self._channel = channel
+        self._pubsub = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, deliver: Callable[[str], None]) -> None:
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{self._channel: lambda msg: deliver(_decode(msg["data"]))})
+        self._thread = self._pubsub.run_in_thread(sleep_time=0.5, daemon=True)
+
+    def publish(self, message: str) -> None:
+        self._client.publish(self._channel, message)
+
+    def stop(self) -> None:
+        if self._thread:
+            self._thread.stop()
+        if self._pubsub:
+            self._pubsub.close()
+
+
+def _decode(data: Any) -> str:
+    return data.decode() if isinstance(data, bytes) else data
+
+
+class EventBus:
+    """Fans broker messages out to the asyncio queues of local subscribers."""
+
+    def __init__(self, broker=None):
+        self.broker = broker or InProcessBroker()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self.broker.start(self._deliver)
+
+    def stop(self) -> None:
+        self.broker.stop()
+        self._loop = None
+
+    def subscribe(self, project_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(project_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, project_id: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            queues = self._subscribers.get(project_id)
+            if queues:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[project_id]
+
+    def publish(self, project_id: str, event_type: str, data: Optional[Dict[str, Any]] = None) -> None:
+        """Publish from any thread. Failures are logged, never raised into the caller."""
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"Unknown event type: {event_type}")
+        event = {
+            "id": f"{int(time.time() * 1000)}-{next(self._ids)}",
+            "type": event_type,
+            "project_id": project_id,
+            "data": data or {},
+        }
+        try:
+            self.broker.publish(json.dumps(event, default=str))
+        except Exception as e:
+            log.warning("Failed to publish %s for %s: %s", event_type, project_id, e)
+
+    # Called by the broker, possibly from its own thread
+    def _deliver(self, message: str) -> None:
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            event = json.loads(message)
+        except json.JSONDecodeError:
+            return
+        with self._lock:
+            queues = list(self._subscribers.get(event.get("project_id"), ()))
+        for queue in queues:
+            loop.call_soon_threadsafe(_offer, queue, event)
+
+
+def _offer(queue: asyncio.Queue, event: Dict) -> None:
+    if queue.full():
+        queue.get_nowait()  # drop the oldest rather than block the publisher
+    queue.put_nowait(event)
+
+
+def broker_from_env(url: Optional[str]):
+    return RedisBroker(url) if url else InProcessBroker()
+
+
+def format_sse(event: Dict) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+# --- Stream tickets ---
+
+STREAM_TICKET_TTL_SECONDS = 60
+
+
+def _sign(secret: bytes, payload: str) -> str:
+    return hmac.new(secret, payload.encode(), hashlib.sha256).hexdigest()
+
+
+def issue_stream_ticket(secret: bytes, user_id: str, project_id: str,
+                        ttl: float = STREAM_TICKET_TTL_SECONDS) -> str:
+    payload = f"{user_id}:{project_id}:{int(time.time() + ttl)}"
+    encoded = base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+    return f"{encoded}.{_sign(secret, payload)}"
+
+
+def read_stream_ticket(secret: bytes, ticket: str, project_id: str) -> Optional[str]:
+    """The user id a ticket was issued to, or None if it is forged, expired or for another project."""
+    encoded, _, signature = ticket.partition(".")
+    try:
+        payload = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)).decode()
+        user_id, ticket_project_id, expires = payload.split(":")
+        expires = int(expires)
+    except ValueError:
+        return None
+    if not hmac.compare_digest(signature, _sign(secret, payload)):
+        return None
+    if ticket_project_id != project_id or expires < time.time():
+        return None
+    return user_id
@@ -0,0 +1,42 @@
+"""ETag / If-None-Match support for read endpoints polled by the frontend.
+
+Validators are computed from values that are cheap to read (updated_at,
+canvas_version, file stat, or a hash of an already-small body), so a
+matching poll is answered with 304 without building the full response.
+Responses are marked private/no-cache: the browser keeps them and
+revalidates with If-None-Match on every request.
+"""
+import hashlib
+import json
+from typing import Any
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+CACHE_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+
+def make_etag(*parts: Any) -> str:
+    """Weak ETag from the validator parts (any JSON-serializable values)."""
+    raw = json.dumps(parts, sort_keys=True, default=str).encode()
+    return f'W/"{hashlib.sha1(raw).hexdigest()[:20]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison: ignore W/ prefixes on either side
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={**CACHE_HEADERS, "ETag": etag})
+
+
+def json_with_etag(content: Any, etag: str) -> JSONResponse:
+    return JSONResponse(content=jsonable_encoder(content), headers={**CACHE_HEADERS, "ETag": etag})
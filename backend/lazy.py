@@ -0,0 +1,68 @@
+"""Lazily built clients and optional heavy modules.
+
+Importing server.py used to construct the Supabase, OpenAI and Tavily clients
+and import WeasyPrint (GTK/Pango) up front, so every worker paid for them
+before it could answer its first request, PDF support or not. Each of these
+is now a Lazy: built by its factory on first use, once, under a lock (two
+requests arriving together build it once), and timed. Attribute access is
+forwarded to the built value, so a Lazy client is used exactly like the
+client itself (supabase.table(...), openai_client.chat...).
+
+The server's lifespan calls warm() so the values are built on worker threads
+right after startup, without holding up the first request; anything not yet
+warm is simply built by whoever needs it first. A factory that raises is
+retried on the next use.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Iterable, Optional
+
+log = logging.getLogger(__name__)
+
+_UNSET = object()
+
+
+class Lazy:
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self._name = name
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._value = _UNSET
+        self.load_seconds: Optional[float] = None
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def loaded(self) -> bool:
+        return self._value is not _UNSET
+
+    def get(self) -> Any:
+        value = self._value
+        if value is _UNSET:
+            with self._lock:
+                if self._value is _UNSET:
+                    started = time.perf_counter()
+                    self._value = self._factory()
+                    self.load_seconds = time.perf_counter() - started
+                    log.info("Initialized %s in %.0fms", self._name, self.load_seconds * 1000)
+                value = self._value
+        return value
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.get(), attr)
+
+    def __repr__(self) -> str:
+        return f"<Lazy {self._name} {'loaded' if self.loaded else 'pending'}>"
+
+
+async def warm(resources: Iterable[Lazy]) -> None:
+    """Build every resource on worker threads; failures are logged and left for first use."""
+    resources = [r for r in resources if not r.loaded]
+    results = await asyncio.gather(*(asyncio.to_thread(r.get) for r in resources), return_exceptions=True)
+    for resource, result in zip(resources, results):
+        if isinstance(result, Exception):
+            log.warning("Warm-up of %s failed; it will be retried on first use: %s", resource.name, result)
@@ -0,0 +1,162 @@
+"""Exact-match cache for JSON completions whose prompts repeat verbatim.
+
+The key is a hash of everything sent to the model (model, messages and
+sampling params), so any change to a prompt is a miss. Two tiers:
+
+    memory      per-process LRU, checked first
+    persistent  SQLite file shared by the workers on a host and kept across
+                restarts (LLM_CACHE_PATH, default /tmp/llm_cache.sqlite3)
+
+Entries expire after LLM_CACHE_TTL_SECONDS (default 7 days). Caching is
+opt-in: a call site passes cache=True, and only results that passed the
+call site's own validation are stored.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+MEMORY_MAX_ENTRIES = 1000
+
+
+def cache_key(model: str, messages: list, **params: Any) -> str:
+    raw = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class MemoryTier:
+    def __init__(self, max_entries: int = MEMORY_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SqliteTier:
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row
+
+    def set(self, key: str, value: str, expires_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)", (key, value, expires_at)
+            )
+
+    def prune(self) -> int:
+        with self._lock:
+            return self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+
+
+class ResponseCache:
+    def __init__(self, persistent: Optional[SqliteTier] = None, ttl: float = DEFAULT_TTL_SECONDS,
+                 memory: Optional[MemoryTier] = None):
+        self.memory = memory or MemoryTier()
+        self.persistent = persistent
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._counts = {"memory_hits": 0, "persistent_hits": 0, "misses": 0, "stores": 0, "tokens_saved": 0}
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            return self._hit("memory_hits", value)
+        if self.persistent:
+            try:
+                row = self.persistent.get(key)
+            except sqlite3.Error as e:
+                log.warning("Persistent read failed: %s", e)
+                row = None
+            if row:
+                value, expires_at = row
+                self.memory.set(key, value, expires_at)
+                return self._hit("persistent_hits", value)
+        self._bump("misses")
+        return None
+
+    def set(self, key: str, value: str, tokens: int = 0) -> None:
+        """Store a validated completion. tokens = what the call cost, counted per later hit."""
+        entry = json.dumps({"value": value, "tokens": tokens})
+        expires_at = time.time() + self.ttl
+        self.memory.set(key, entry, expires_at)
+        if self.persistent:
+            try:
+                self.persistent.set(key, entry, expires_at)
+            except sqlite3.Error as e:
+                log.warning("Persistent write failed: %s", e)
+        self._bump("stores")
+
+    def _hit(self, counter: str, entry: str) -> str:
+        data = json.loads(entry)
+        self._bump(counter, tokens_saved=data.get("tokens", 0))
+        return data["value"]
+
+    def _bump(self, counter: str, tokens_saved: int = 0) -> None:
+        with self._lock:
+            self._counts[counter] += 1
+            self._counts["tokens_saved"] += tokens_saved
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts["memory_hits"] + counts["persistent_hits"] + counts["misses"]
+        hits = lookups - counts["misses"]
+        return {
+            **counts,
+            "lookups": lookups,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+        }
+
+
+def cache_from_env() -> ResponseCache:
+    ttl = float(os.environ.get("LLM_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+    path = os.environ.get("LLM_CACHE_PATH", "/tmp/llm_cache.sqlite3")
+    persistent = None
+    if path:
+        try:
+            persistent = SqliteTier(path)
+            persistent.prune()
+        except sqlite3.Error as e:
+            log.warning("Persistent tier unavailable (%s); using memory only", e)
+    return ResponseCache(persistent, ttl=ttl)
@@ -0,0 +1,301 @@
+"""Single path for every OpenAI chat completion the backend makes.
+
+Each call site names a call type; its CallPolicy sets the overall deadline,
+how many attempts it may make and whether it may be hedged. On top of that:
+
+    retries      429 / 5xx / timeouts / connection errors only, with full-jitter
+                 exponential backoff, never past the deadline, and drawn from a
+                 shared retry budget so an outage doesn't multiply traffic
+    breaker      after repeated transient failures the gateway fails fast with
+                 LLMUnavailable until a cool-down passes, so callers drop
+                 straight to their existing fallbacks
+    hedging      (LLM_HEDGING=1) for short call types, a duplicate request is
+                 sent once the first has run past the observed p95 latency;
+                 whichever answers first wins (both are billed, so both are
+                 reported to on_usage)
+
+Callers keep their own fallbacks: they catch exceptions exactly as before.
+
+Each complete() is one tracing span (llm.<call type>) carrying the site,
+model, retries and token counts, and one llm_request_duration_seconds sample.
+
+on_usage(site, model, response, latency) is called after every successful
+completion (token accounting). LLM_RECORD_PATH=file.jsonl appends every request (site, call type, model,
+messages, params) to a file, e.g. as input for scripts/bench_models.py.
+"""
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from metrics import LLM_REQUEST_SECONDS
+from tracing import span
+
+log = logging.getLogger(__name__)
+
+
+class LLMUnavailable(Exception):
+    """Raised without calling OpenAI when the circuit is open or the deadline is spent."""
+
+
+@dataclass(frozen=True)
+class CallPolicy:
+    deadline: float           # seconds for the whole call, retries included
+    max_attempts: int = 3
+    hedge: bool = False       # only worth it for short, cheap completions
+
+
+POLICIES: Dict[str, CallPolicy] = {
+    "chat": CallPolicy(deadline=60, max_attempts=3, hedge=True),
+    "json": CallPolicy(deadline=45, max_attempts=3, hedge=True),
+    "tech_stack": CallPolicy(deadline=30, max_attempts=2, hedge=True),
+    "security": CallPolicy(deadline=30, max_attempts=2, hedge=True),
+    "prd_section": CallPolicy(deadline=120, max_attempts=3),
+    "prd": CallPolicy(deadline=240, max_attempts=2),
+}
+
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_CAP_SECONDS = 8.0
+
+# Latency samples kept per call type for the hedging p95
+LATENCY_WINDOW = 200
+MIN_SAMPLES_FOR_HEDGE = 20
+
+
+def is_retryable(error: Exception) -> bool:
+    # Imported here so importing the gateway doesn't load the OpenAI SDK (it is loaded by the time a call fails)
+    from openai import APIConnectionError, APIStatusError, RateLimitError
+
+    if isinstance(error, (RateLimitError, APIConnectionError)):  # includes APITimeoutError
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full jitter: uniform in [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """closed -> open after `threshold` consecutive transient failures;
+    open -> half-open after `reset_after` seconds, where one trial call decides."""
+
+    def __init__(self, threshold: int = 5, reset_after: float = 30.0):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_after:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_after or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class RetryBudget:
+    """Token bucket shared by all call types: every call earns `ratio` of a retry,
+    every retry spends one. Caps retries at roughly ratio x traffic during an outage."""
+
+    def __init__(self, ratio: float = 0.2, min_tokens: float = 10.0, max_tokens: float = 50.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = min_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class LatencyTracker:
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: Dict[str, deque] = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def record(self, call_type: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(call_type, deque(maxlen=self._window)).append(seconds)
+
+    def p95(self, call_type: str) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(call_type, ()))
+        if len(samples) < MIN_SAMPLES_FOR_HEDGE:
+            return None
+        return samples[int(0.95 * (len(samples) - 1))]
+
+
+class LLMGateway:
+    def __init__(self, client, policies: Dict[str, CallPolicy] = POLICIES,
+                 hedging: bool = False, max_workers: int = 8, record_path: Optional[str] = None,
+                 on_usage: Optional[Callable[[str, str, Any, float], None]] = None):
+        self.client = client
+        self.record_path = record_path
+        self.on_usage = on_usage
+        self._record_lock = threading.Lock()
+        self.policies = policies
+        self.hedging = hedging
+        self.breaker = CircuitBreaker()
+        self.budget = RetryBudget()
+        self.latency = LatencyTracker()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-hedge") if hedging else None
+
+    def complete(self, call_type: str, site: Optional[str] = None, **kwargs) -> Any:
+        """chat.completions.create with the call type's deadline, retries, breaker and hedging.
+
+        site names the call site (see llm_routing) and defaults to call_type.
+        Raises LLMUnavailable when the breaker is open or the deadline runs out,
+        otherwise the last OpenAI error.
+
+        Blocks for up to the deadline (requests and retry backoff), so async
+        routes call it, or the helper wrapping it, through asyncio.to_thread.
+        """
+        with span(f"llm.{call_type}", {
+            "llm.call_type": call_type,
+            "llm.site": site or call_type,
+            "llm.model": kwargs.get("model"),
+        }) as current, LLM_REQUEST_SECONDS.time(site=site or call_type, call_type=call_type, outcome="ok") as labels:
+            try:
+                response = self._complete(call_type, site, kwargs, current)
+            except LLMUnavailable:
+                labels["outcome"] = "unavailable"
+                raise
+            usage = getattr(response, "usage", None)
+            current.set_attributes({
+                "llm.prompt_tokens": getattr(usage, "prompt_tokens", None),
+                "llm.completion_tokens": getattr(usage, "completion_tokens", None),
+            })
+            return response
+
+    def _complete(self, call_type: str, site: Optional[str], kwargs: Dict, current) -> Any:
+        policy = self.policies[call_type]
+        if self.record_path:
+            self._record(site or call_type, call_type, kwargs)
+        call_started = time.monotonic()
+        deadline = call_started + policy.deadline
+        self.budget.deposit()
+
+        def report_usage(response: Any) -> None:
+            if self.on_usage:
+                try:
+                    self.on_usage(site or call_type, kwargs.get("model"), response, time.monotonic() - call_started)
+                except Exception as e:
+                    log.warning("Usage hook failed: %s", e)
+
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise LLMUnavailable(f"OpenAI circuit open; skipping {call_type} call")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMUnavailable(f"{call_type} call exceeded its {policy.deadline:.0f}s deadline")
+
+            started = time.monotonic()
+            try:
+                response = self._attempt(call_type, policy, remaining, kwargs, report_usage)
+            except Exception as e:
+                if not is_retryable(e):
+                    # A bad request says nothing about OpenAI's health
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                attempt += 1
+                delay = backoff_delay(attempt)
+                if (attempt >= policy.max_attempts
+                        or time.monotonic() + delay >= deadline
+                        or not self.budget.withdraw()):
+                    raise
+                log.info("%s attempt %d failed (%s); retrying in %.1fs", call_type, attempt, type(e).__name__, delay)
+                current.set_attribute("llm.retries", attempt)
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            self.latency.record(call_type, time.monotonic() - started)
+            report_usage(response)
+            return response
+
+    def _attempt(self, call_type: str, policy: CallPolicy, timeout: float, kwargs: Dict,
+                 report_usage: Callable[[Any], None]) -> Any:
+        hedge_after = self.latency.p95(call_type) if (self.hedging and policy.hedge) else None
+        if hedge_after is None or hedge_after >= timeout:
+            return self._create(timeout, kwargs)
+
+        primary = self._executor.submit(self._create, timeout, kwargs)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        hedge = self._executor.submit(self._create, max(timeout - hedge_after, 1.0), kwargs)
+        pending = {primary, hedge}
+        error: Optional[Exception] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winners = [f for f in done if f.exception() is None]
+            if winners:
+                # The losing request is billed too: report its usage whenever it finishes,
+                # under this request's usage scope
+                context = contextvars.copy_context()
+                for future in winners[1:] + list(pending):
+                    future.add_done_callback(lambda f: f.exception() is None and context.copy().run(report_usage, f.result()))
+                return winners[0].result()
+            error = next(iter(done)).exception()
+        raise error
+
+    def _record(self, site: str, call_type: str, kwargs: Dict) -> None:
+        line = json.dumps({"site": site, "call_type": call_type, **kwargs}, default=str)
+        try:
+            with self._record_lock, open(self.record_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            log.warning("Could not record request to %s: %s", self.record_path, e)
+
+    def _create(self, timeout: float, kwargs: Dict) -> Any:
+        return self.client.chat.completions.create(timeout=timeout, **kwargs)
+
+
+def gateway_from_env(client, on_usage: Optional[Callable[[str, str, Any, float], None]] = None) -> LLMGateway:
+    return LLMGateway(client, hedging=os.environ.get("LLM_HEDGING") == "1",
+                      record_path=os.environ.get("LLM_RECORD_PATH") or None, on_usage=on_usage)
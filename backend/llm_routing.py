@@ -0,0 +1,88 @@
+"""Which model each LLM call site uses.
+
+Call sites are routed to a tier rather than a model name, so the models
+behind the tiers can change in one place:
+
+    LLM_MODEL_FAST=gpt-4o-mini   LLM_MODEL_LARGE=gpt-4o
+    LLM_ROUTES=design_styles=large,prd_section_4=fast   (per-site overrides)
+
+JSON call sites start on their routed tier and escalate one tier up when
+the output fails to parse or validate (see complete_json in server.py).
+"""
+import os
+from typing import Dict, Optional, Tuple
+
+TIER_ORDER = ("fast", "large")
+
+DEFAULT_TIER_MODELS = {"fast": "gpt-4o-mini", "large": "gpt-4o"}
+
+DEFAULT_ROUTES: Dict[str, str] = {
+    # Long-form writing the user reads directly
+    "phase_chat": "large",
+    "prd": "large",
+    "prd_section_1": "large",
+    "prd_section_2": "large",
+    "prd_section_3": "large",
+    "prd_section_4": "large",
+    # Small structured outputs, validated and escalated on failure
+    "tech_stack": "fast",
+    "security": "fast",
+    "complementary_features": "fast",
+    "color_palettes": "fast",
+    "design_styles": "fast",
+    "design_guidelines": "fast",
+}
+
+# USD per 1M (prompt, completion) tokens
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Dollar cost of one call; 0.0 for models without a listed price."""
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class ModelRouter:
+    def __init__(self, routes: Dict[str, str] = DEFAULT_ROUTES,
+                 tier_models: Dict[str, str] = DEFAULT_TIER_MODELS):
+        unknown = {tier for tier in routes.values() if tier not in TIER_ORDER}
+        if unknown:
+            raise ValueError(f"Unknown model tier(s) in routes: {', '.join(sorted(unknown))}")
+        self.routes = dict(routes)
+        self.tier_models = dict(tier_models)
+
+    def tier(self, site: str) -> str:
+        return self.routes.get(site, "large")
+
+    def model(self, site: str) -> str:
+        return self.tier_models[self.tier(site)]
+
+    def escalate(self, model: str) -> Optional[str]:
+        """Model of the next tier up from `model`, or None if it is already the largest."""
+        tiers = [t for t in TIER_ORDER if self.tier_models[t] == model]
+        if not tiers:
+            return None
+        higher = TIER_ORDER[TIER_ORDER.index(tiers[-1]) + 1:]
+        return self.tier_models[higher[0]] if higher else None
+
+
+def parse_routes(spec: str) -> Dict[str, str]:
+    """'site=tier,site=tier' -> {site: tier}"""
+    routes = {}
+    for pair in filter(None, (p.strip() for p in spec.split(","))):
+        site, _, tier = pair.partition("=")
+        routes[site.strip()] = tier.strip()
+    return routes
+
+
+def router_from_env() -> ModelRouter:
+    tier_models = {
+        "fast": os.environ.get("LLM_MODEL_FAST", DEFAULT_TIER_MODELS["fast"]),
+        "large": os.environ.get("LLM_MODEL_LARGE", DEFAULT_TIER_MODELS["large"]),
+    }
+    routes = {**DEFAULT_ROUTES, **parse_routes(os.environ.get("LLM_ROUTES", ""))}
+    return ModelRouter(routes, tier_models)
@@ -0,0 +1,261 @@
+"""Structured, sampled, non-blocking logging.
+
+Every backend module logs through the standard library
+(log = logging.getLogger(__name__)) and this module decides what reaches
+stdout and how:
+
+- Records become one JSON object per line (LOG_FORMAT=text for local
+  development), carrying the request id, project id, phase, Phase 3 step and
+  trace id of the request that logged them. LogContextMiddleware assigns the
+  request id (taken from X-Request-ID or generated, and echoed in the
+  response) and bind_log_context() adds the project as soon as a route loads
+  it. Background tasks run in the request's context, so their records carry
+  the same ids.
+
+- The calling thread only filters the record and puts it on a bounded queue;
+  a QueueListener thread formats and writes it. When the queue is full the
+  record is dropped and counted rather than blocking a request.
+
+- Sampling keeps the cost flat under load: LOG_LEVEL (default INFO) drops
+  verbose records outright, LOG_DEBUG_SAMPLE_RATE keeps a share of DEBUG
+  records when they are enabled, and each call site (logger + message
+  template) may emit at most LOG_RATE_LIMIT records per second. The next
+  record that gets through says how many were suppressed before it.
+
+Call sites must pass values as arguments (log.info("... %s", x)), not
+f-strings, so that the template identifies the call site and formatting only
+happens for records that are kept.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from tracing import current_span
+
+DEFAULT_RATE_LIMIT = 10.0
+DEFAULT_QUEUE_SIZE = 10000
+# Call sites tracked by the rate limiter before it starts over
+MAX_RATE_KEYS = 1000
+
+REQUEST_ID_HEADER = b"x-request-id"
+UNSAFE_ID_CHARS = re.compile(r"[^A-Za-z0-9_.-]")
+
+CONTEXT_FIELDS = ("request_id", "project_id", "phase", "step", "trace_id")
+# Attributes every LogRecord has; anything else was passed with extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "suppressed"}
+
+_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar("log_context", default=None)
+
+_drops = {"queue_full": 0, "rate_limited": 0, "sampled": 0}
+_drops_lock = threading.Lock()
+
+
+def _count_drop(reason: str) -> None:
+    with _drops_lock:
+        _drops[reason] += 1
+
+
+def log_drop_counts() -> Dict[str, int]:
+    with _drops_lock:
+        return dict(_drops)
+
+
+# --- Correlation ---
+
+def bind_log_context(**fields: Any) -> None:
+    """Add fields (project_id, phase, step) to every record the current request logs from now on."""
+    current = _context.get()
+    if current is None:
+        current = {}
+        _context.set(current)
+    current.update({k: v for k, v in fields.items() if v is not None})
+
+
+class LogContextMiddleware:
+    """Gives each HTTP request a request id and a fresh log context.
+
+    The id is also written into the request headers, so middleware further in
+    (the profiler) files its output under the same id."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = [(k, v) for k, v in scope.get("headers", []) if k != REQUEST_ID_HEADER]
+        supplied = dict(scope.get("headers", [])).get(REQUEST_ID_HEADER, b"").decode("latin-1")
+        request_id = UNSAFE_ID_CHARS.sub("", supplied)[:64].lstrip(".") or uuid.uuid4().hex
+        scope = {**scope, "headers": headers + [(REQUEST_ID_HEADER, request_id.encode("latin-1"))]}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (REQUEST_ID_HEADER, request_id.encode("latin-1"))]}
+            await send(message)
+
+        token = _context.set({"request_id": request_id})
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _context.reset(token)
+
+
+# --- Filters (run on the calling thread) ---
+
+class SamplingFilter(logging.Filter):
+    """Keeps a share of DEBUG records and rate-limits each call site."""
+
+    def __init__(self, debug_sample_rate: float = 1.0, rate_limit: float = DEFAULT_RATE_LIMIT):
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+        self.rate_limit = rate_limit
+        # (logger, template) -> [tokens, last refill, suppressed since last kept]
+        self._buckets: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.DEBUG and self.debug_sample_rate < 1 and random.random() >= self.debug_sample_rate:
+            _count_drop("sampled")
+            return False
+        if not self.rate_limit:
+            return True
+
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= MAX_RATE_KEYS:
+                    self._buckets.clear()
+                bucket = self._buckets[key] = [self.rate_limit, now, 0]
+            bucket[0] = min(self.rate_limit, bucket[0] + (now - bucket[1]) * self.rate_limit)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                suppressed = None
+            else:
+                bucket[0] -= 1
+                suppressed, bucket[2] = bucket[2], 0
+        if suppressed is None:
+            _count_drop("rate_limited")
+            return False
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class ContextFilter(logging.Filter):
+    """Copies the request's correlation ids onto the record before it leaves the thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for name, value in (_context.get() or {}).items():
+            setattr(record, name, value)
+        trace_id = getattr(current_span(), "trace_id", None)
+        if trace_id:
+            record.trace_id = trace_id
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks: a full queue drops the record."""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _count_drop("queue_full")
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Like the stdlib version, but the traceback stays out of the message
+        record = logging.makeLogRecord(vars(record))
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+
+# --- Formatters (run on the listener thread) ---
+
+def _extra_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS and not k.startswith("_")}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        fields = _extra_fields(record)
+        if getattr(record, "suppressed", 0):
+            fields["suppressed"] = record.suppressed
+        line = f"{record.levelname:<7} [{record.name}] {record.getMessage()}"
+        if fields:
+            line += "  " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(level: str = "INFO", fmt: str = "json", debug_sample_rate: float = 1.0,
+                  rate_limit: float = DEFAULT_RATE_LIMIT, queue_size: int = DEFAULT_QUEUE_SIZE) -> None:
+    """Route the root logger through the sampled queue. Safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(TextFormatter() if fmt == "text" else JsonFormatter())
+
+    handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(SamplingFilter(debug_sample_rate, rate_limit))
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level.upper())
+    root.addHandler(handler)
+
+    _listener = logging.handlers.QueueListener(handler.queue, output)
+    _listener.start()
+    # Writes out whatever is still queued
+    atexit.register(_listener.stop)
+
+
+def setup_logging_from_env() -> None:
+    setup_logging(
+        level=os.environ.get("LOG_LEVEL", "INFO"),
+        fmt=os.environ.get("LOG_FORMAT", "json"),
+        debug_sample_rate=float(os.environ.get("LOG_DEBUG_SAMPLE_RATE") or 1),
+        rate_limit=float(os.environ.get("LOG_RATE_LIMIT") or DEFAULT_RATE_LIMIT),
+        queue_size=int(os.environ.get("LOG_QUEUE_SIZE") or DEFAULT_QUEUE_SIZE),
+    )
@@ -0,0 +1,372 @@
+"""In-process metrics, served in the Prometheus text format at /api/metrics.
+
+Collectors are plain counters, gauges and fixed-bucket histograms guarded by
+one lock each; recording is a dict lookup, a bisect and two additions, cheap
+enough for every request and every external call. Values that already live
+elsewhere (cache hit counts, breaker state) are read by callbacks at scrape
+time instead of being mirrored on every change.
+
+What is recorded:
+
+    http_request_duration_seconds       per route template, method, status and phase
+    llm_request_duration_seconds        per call site and outcome (ok / error / unavailable)
+    search_request_duration_seconds     per call site and outcome
+    background_jobs_queued / _running   scheduled-but-not-started and running jobs
+    background_job_duration_seconds     per job and outcome
+    pdf_render_duration_seconds
+    event_loop_lag_seconds              how late a timer on the event loop fires
+    cache_hits_total / _hit_ratio       per cache (LLM responses, discovery summaries)
+    llm_circuit_open                    1 while the OpenAI breaker is open
+
+Every worker process keeps its own numbers; scrape each worker (or sum
+across them in Prometheus).
+"""
+import asyncio
+import bisect
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+# Seconds; spans a cached lookup up to a slow PRD generation
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+LAG_INTERVAL_SECONDS = 0.5
+
+UNMEASURED_PATHS = ("/api/metrics",)
+# Open for minutes (SSE)
+UNMEASURED_SUFFIXES = ("/events",)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_label_text(self.label_names, k)} {_number(v)}" for k, v in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (non-cumulative, last is +Inf), sum]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[Dict[str, Any]]:
+        """Observe the block's duration. Labels may be changed through the yielded dict;
+        an exception turns outcome="ok" into outcome="error"."""
+        labels = dict(labels)
+        started = time.perf_counter()
+        try:
+            yield labels
+        except BaseException:
+            if labels.get("outcome") == "ok":
+                labels["outcome"] = "error"
+            raise
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def timed(self, **labels) -> Callable:
+        """Decorator form of time()."""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((k, (list(v[0]), v[1])) for k, v in self._series.items())
+        lines = self.header()
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.label_names, key, le)} {cumulative}")
+            labels = _label_text(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_number(round(total, 6))}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._callbacks: List[Callable[[], Iterable[Tuple[str, str, str, Dict[str, Any], float]]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Iterable[str] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def add_callback(self, callback: Callable[[], Iterable[Tuple[str, str, str, Dict[str, Any], float]]]) -> None:
+        """callback() yields (name, type, help, labels, value) samples at scrape time."""
+        self._callbacks.append(callback)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        # Samples of one metric must be contiguous, whichever callbacks produced them
+        families: Dict[str, List[str]] = {}
+        for callback in self._callbacks:
+            try:
+                samples = list(callback())
+            except Exception as e:
+                log.warning("Collector callback failed: %s", e)
+                continue
+            for name, kind, help, labels, value in samples:
+                family = families.setdefault(name, [f"# HELP {name} {help}", f"# TYPE {name} {kind}"])
+                names = tuple(labels)
+                family.append(f"{name}{_label_text(names, tuple(labels[n] for n in names))} {_number(value)}")
+        for family in families.values():
+            lines.extend(family)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.",
+    ("route", "method", "status", "phase"))
+LLM_REQUEST_SECONDS = registry.histogram(
+    "llm_request_duration_seconds", "LLM gateway call latency, including retries.",
+    ("site", "call_type", "outcome"))
+SEARCH_REQUEST_SECONDS = registry.histogram(
+    "search_request_duration_seconds", "Web search latency.", ("site", "outcome"))
+JOBS_QUEUED = registry.gauge(
+    "background_jobs_queued", "Background jobs scheduled but not yet started.", ("job",))
+JOBS_RUNNING = registry.gauge(
+    "background_jobs_running", "Background jobs currently running.", ("job",))
+JOB_SECONDS = registry.histogram(
+    "background_job_duration_seconds", "Background job run time.", ("job", "outcome"))
+PDF_RENDER_SECONDS = registry.histogram(
+    "pdf_render_duration_seconds", "Markdown to PDF render time.")
+EVENT_LOOP_LAG_SECONDS = registry.histogram(
+    "event_loop_lag_seconds", "How late a timer on the event loop fired.", buckets=LAG_BUCKETS)
+
+
+# --- Requests ---
+
+_request_labels: ContextVar[Optional[Dict[str, Any]]] = ContextVar("metrics_request_labels", default=None)
+# Jobs the current request handed to BackgroundTasks (see track_job)
+_request_jobs: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("metrics_request_jobs", default=None)
+
+
+def label_request(**labels: Any) -> None:
+    """Add labels (e.g. phase) to the current request's latency sample."""
+    current = _request_labels.get()
+    if current is not None:
+        current.update({k: v for k, v in labels.items() if v is not None})
+
+
+class MetricsMiddleware:
+    """Times each HTTP request to the end of its response body (not its background tasks)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or path in UNMEASURED_PATHS or path.endswith(UNMEASURED_SUFFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        labels = {}
+        response = {"status": 500}
+
+        async def send_and_watch(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body"):
+                response["end"] = time.perf_counter()
+            await send(message)
+
+        jobs = []
+        token = _request_labels.set(labels)
+        jobs_token = _request_jobs.set(jobs)
+        try:
+            await self.app(scope, receive, send_and_watch)
+        finally:
+            _request_labels.reset(token)
+            _request_jobs.reset(jobs_token)
+            # Background tasks run inside the app call, so any job not started by now never will be
+            # (the handler raised after add_task, or an earlier task failed)
+            for job in jobs:
+                _start_job(job)
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                response.get("end", time.perf_counter()) - started,
+                # Unmatched paths share one label so scanners can't blow up cardinality
+                route=route.path if route is not None and hasattr(route, "path") else "unmatched",
+                method=scope.get("method", ""),
+                status=response["status"],
+                phase=labels.get("phase", ""),
+            )
+
+
+# --- Background jobs ---
+
+@contextmanager
+def job_timer(job: str) -> Iterator[None]:
+    JOBS_RUNNING.inc(job=job)
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        JOBS_RUNNING.dec(job=job)
+        JOB_SECONDS.observe(time.perf_counter() - started, job=job, outcome=outcome)
+
+
+_jobs_lock = threading.Lock()
+
+
+def _start_job(state: Dict[str, Any]) -> bool:
+    """Take a tracked job off the queued gauge, once. False if it already was."""
+    with _jobs_lock:
+        if state["dequeued"]:
+            return False
+        state["dequeued"] = True
+    JOBS_QUEUED.dec(job=state["job"])
+    return True
+
+
+def track_job(job: str, fn: Callable) -> Callable:
+    """Wrap fn for BackgroundTasks.add_task: counted as queued from now until it starts.
+
+    If the request ends without running it (Starlette drops a response's tasks
+    when the handler raises), MetricsMiddleware takes it off the gauge.
+    """
+    state = {"job": job, "dequeued": False}
+    JOBS_QUEUED.inc(job=job)
+    jobs = _request_jobs.get()
+    if jobs is not None:
+        jobs.append(state)
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        _start_job(state)
+        with job_timer(job):
+            return fn(*args, **kwargs)
+    return run
+
+
+# --- Scrape-time values ---
+
+def register_cache(cache: str, counts: Callable[[], Tuple[int, int]]) -> None:
+    """Expose a cache's (hits, misses) as totals and a hit ratio, labelled cache=<name>."""
+    def samples():
+        hits, misses = counts()
+        lookups = hits + misses
+        labels = {"cache": cache}
+        return [
+            ("cache_hits_total", "counter", "Cache lookups that hit.", labels, hits),
+            ("cache_misses_total", "counter", "Cache lookups that missed.", labels, misses),
+            ("cache_hit_ratio", "gauge", "Hits over lookups since the worker started.", labels,
+             round(hits / lookups, 4) if lookups else 0),
+        ]
+    registry.add_callback(samples)
+
+
+# --- Event loop ---
+
+async def monitor_event_loop_lag(interval: float = LAG_INTERVAL_SECONDS) -> None:
+    """Run forever on the server's loop (started from the lifespan)."""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(0.0, time.perf_counter() - started - interval))
+
+
+def render_metrics() -> str:
+    return registry.render()
@@ -0,0 +1,673 @@
+"""Offline mode: in-process stand-ins for Supabase, OpenAI and Tavily.
+
+Set FOUNDERLAB_OFFLINE=1 and server.py builds these instead of the real
+clients, so the app runs with no keys and no network, e.g. for profiling
+and load tests. Everything is deterministic:
+
+    OfflineSupabase  in-memory tables with the query builder calls, RPCs and
+                     triggers the backend relies on (migrations 001-008).
+                     Any bearer token is accepted; each distinct token is
+                     its own user. OFFLINE_DB_LATENCY_MS delays every query.
+    ScriptedLLM      chat.completions.create returning realistic phase
+                     replies (with the [UPDATE_CANVAS] / [IDEATION_COMPLETE] /
+                     [FEATURES_COMPLETE] tags), JSON for the structured call
+                     sites and Markdown for PRD sections, after a simulated
+                     latency of OFFLINE_LLM_LATENCY_MS plus
+                     OFFLINE_LLM_MS_PER_TOKEN per completion token.
+    CannedSearch     Tavily-shaped results derived from the query, after
+                     OFFLINE_SEARCH_LATENCY_MS.
+
+The latencies are blocking sleeps, as the real clients' network calls are.
+"""
+import copy
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+OFFLINE_MODE = os.environ.get("FOUNDERLAB_OFFLINE") == "1"
+
+PATCHABLE_COLUMNS = ("canvas_state", "phase_summaries", "mindmap_data", "prd_draft", "ideation_pillars", "feature_data")
+
+
+# --- Supabase -------------------------------------------------------------
+
+class OfflineError(Exception):
+    """Raised where PostgREST would return an error."""
+
+
+class OfflineStore:
+    """Rows per table plus the trigger behavior of the real schema."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.tables: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.lock = threading.RLock()
+        self.latency_ms = latency_ms
+        self._last_ts = datetime.now(timezone.utc)
+        self._ids = 0
+
+    def now(self) -> str:
+        """Strictly increasing timestamps, like clock_timestamp() on one server."""
+        ts = datetime.now(timezone.utc)
+        if ts <= self._last_ts:
+            ts = self._last_ts + timedelta(microseconds=1)
+        self._last_ts = ts
+        return ts.isoformat(timespec="microseconds")
+
+    def project(self, project_id: str) -> Optional[Dict[str, Any]]:
+        return next((p for p in self.tables["projects"] if p["id"] == project_id), None)
+
+    # Column defaults
+    def defaults(self, table: str) -> Dict[str, Any]:
+        now = self.now()
+        if table == "projects":
+            return {"user_id": None, "phase": 1, "canvas_state": None, "created_at": now, "updated_at": now,
+                    **dict.fromkeys(PATCHABLE_COLUMNS[1:]), "canvas_version": 0, "deleted_at": None,
+                    "message_count": 0, "has_prd": False}
+        if table == "messages":
+            return {"id": str(uuid.uuid4()), "created_at": now, "phase": 1, "metadata": None}
+        if table == "documents":
+            return {"id": str(uuid.uuid4()), "created_at": now, "md_path": None, "pdf_path": None}
+        if table == "llm_usage":
+            self._ids += 1
+            return {"id": self._ids, "created_at": now}
+        return {}
+
+    # Triggers
+    def before_update(self, table: str, row: Dict[str, Any], changes: Dict[str, Any]) -> Dict[str, Any]:
+        if table != "projects":
+            return changes
+        changes = dict(changes)
+        if "canvas_state" in changes and changes["canvas_state"] != row.get("canvas_state"):
+            changes["canvas_version"] = row.get("canvas_version", 0) + 1
+        changes["updated_at"] = self.now()
+        return changes
+
+    def after_insert(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        if table == "messages":
+            for project_id, n in _count_by(rows, "project_id").items():
+                self._touch_project(project_id, lambda p: {"message_count": p["message_count"] + n})
+        elif table == "documents":
+            for row in rows:
+                if row.get("doc_type") == "prd":
+                    self._touch_project(row.get("project_id"), lambda p: {"has_prd": True})
+
+    def after_delete(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        if table == "messages":
+            for project_id, n in _count_by(rows, "project_id").items():
+                self._touch_project(project_id, lambda p: {"message_count": max(p["message_count"] - n, 0)})
+        elif table == "documents":
+            for project_id in {r.get("project_id") for r in rows}:
+                has_prd = any(d.get("project_id") == project_id and d.get("doc_type") == "prd"
+                              for d in self.tables["documents"])
+                self._touch_project(project_id, lambda p: {"has_prd": has_prd})
+
+    def _touch_project(self, project_id: str, changes: Callable[[Dict], Dict]) -> None:
+        project = self.project(project_id)
+        if project:
+            project.update(self.before_update("projects", project, changes(project)))
+
+
+def _count_by(rows: List[Dict[str, Any]], key: str) -> Dict[Any, int]:
+    counts: Dict[Any, int] = defaultdict(int)
+    for row in rows:
+        counts[row.get(key)] += 1
+    return counts
+
+
+def _compare(value: Any, target: Any) -> Tuple[Any, Any]:
+    """Coerce a PostgREST filter argument (often a string) to the column's type."""
+    if isinstance(value, bool) or value is None:
+        return value, target
+    if isinstance(value, (int, float)) and isinstance(target, str):
+        try:
+            return value, type(value)(target)
+        except ValueError:
+            return str(value), target
+    if isinstance(value, str) and not isinstance(target, str):
+        return value, str(target)
+    return value, target
+
+
+def _op(op: str, value: Any, target: Any) -> bool:
+    if op == "is":
+        wanted = {"null": None, "true": True, "false": False}.get(str(target).lower(), target)
+        return value is wanted
+    if value is None:
+        return False
+    value, target = _compare(value, target)
+    if op == "eq":
+        return value == target
+    if op == "neq":
+        return value != target
+    if op == "lt":
+        return value < target
+    if op == "lte":
+        return value <= target
+    if op == "gt":
+        return value > target
+    if op == "gte":
+        return value >= target
+    raise OfflineError(f"Unsupported filter operator: {op}")
+
+
+def _split_top_level(expr: str) -> List[str]:
+    parts, depth, quoted, current = [], 0, False, []
+    for ch in expr:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0 and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(ch)
+    if current:
+        parts.append("".join(current))
+    return parts
+
+
+def _parse_logic(expr: str) -> Callable[[Dict[str, Any]], bool]:
+    """PostgREST logical filter syntax: 'a.eq.1,and(b.lt."x",c.is.null)' (the body of or=(...))."""
+    preds = []
+    for part in _split_top_level(expr):
+        part = part.strip()
+        match = re.match(r"^(and|or)\((.*)\)$", part)
+        if match:
+            inner = [_parse_logic(p) for p in _split_top_level(match.group(2))]
+            combine = all if match.group(1) == "and" else any
+            preds.append(lambda row, inner=inner, combine=combine: combine(p(row) for p in inner))
+            continue
+        column, op, target = part.split(".", 2)
+        if target.startswith('"') and target.endswith('"'):
+            target = target[1:-1]
+        preds.append(lambda row, c=column, o=op, t=target: _op(o, row.get(c), t))
+    return lambda row: any(p(row) for p in preds)
+
+
+class OfflineQuery:
+    """The subset of the postgrest-py request builder used by the backend."""
+
+    def __init__(self, store: OfflineStore, table: str):
+        self.store = store
+        self.table = table
+        self._action = "select"
+        self._columns: Optional[List[str]] = None
+        self._payload: Any = None
+        self._count: Optional[str] = None
+        self._filters: List[Callable[[Dict[str, Any]], bool]] = []
+        self._order: List[Tuple[str, bool]] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+        self._negate_next = False
+
+    # Actions
+    def select(self, *columns: str, count: Optional[str] = None):
+        spec = ",".join(columns) or "*"
+        self._columns = None if spec.strip() == "*" else [c.strip() for c in spec.split(",") if c.strip()]
+        self._count = count
+        return self
+
+    def insert(self, data, count: Optional[str] = None, returning: str = "representation", **_):
+        self._action, self._payload, self._count = "insert", data, count
+        return self
+
+    def update(self, data: Dict[str, Any], count: Optional[str] = None, returning: str = "representation", **_):
+        self._action, self._payload, self._count = "update", data, count
+        return self
+
+    def delete(self, count: Optional[str] = None, returning: str = "representation", **_):
+        self._action, self._count = "delete", count
+        return self
+
+    # Filters
+    def _filter(self, pred: Callable[[Dict[str, Any]], bool]):
+        if self._negate_next:
+            self._negate_next = False
+            self._filters.append(lambda row: not pred(row))
+        else:
+            self._filters.append(pred)
+        return self
+
+    @property
+    def not_(self):
+        self._negate_next = True
+        return self
+
+    def eq(self, column: str, value: Any):
+        return self._filter(lambda row: _op("eq", row.get(column), value))
+
+    def neq(self, column: str, value: Any):
+        return self._filter(lambda row: _op("neq", row.get(column), value))
+
+    def lt(self, column: str, value: Any):
+        return self._filter(lambda row: _op("lt", row.get(column), value))
+
+    def lte(self, column: str, value: Any):
+        return self._filter(lambda row: _op("lte", row.get(column), value))
+
+    def gt(self, column: str, value: Any):
+        return self._filter(lambda row: _op("gt", row.get(column), value))
+
+    def gte(self, column: str, value: Any):
+        return self._filter(lambda row: _op("gte", row.get(column), value))
+
+    def is_(self, column: str, value: Any):
+        return self._filter(lambda row: _op("is", row.get(column), value))
+
+    def in_(self, column: str, values):
+        wanted = {str(v) for v in values}
+        return self._filter(lambda row: str(row.get(column)) in wanted)
+
+    def or_(self, filters: str, reference_table: Optional[str] = None):
+        return self._filter(_parse_logic(filters))
+
+    # Modifiers
+    def order(self, column: str, desc: bool = False, nullsfirst: bool = False, **_):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, size: int, **_):
+        self._limit = size
+        return self
+
+    def range(self, start: int, end: int, **_):
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    def execute(self):
+        if self.store.latency_ms:
+            time.sleep(self.store.latency_ms / 1000)
+        with self.store.lock:
+            return getattr(self, f"_execute_{self._action}")()
+
+    def _matching(self) -> List[Dict[str, Any]]:
+        return [row for row in self.store.tables[self.table] if all(f(row) for f in self._filters)]
+
+    def _project(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if self._columns is None:
+            return copy.deepcopy(rows)
+        return [copy.deepcopy({c: row.get(c) for c in self._columns}) for row in rows]
+
+    def _execute_select(self):
+        rows = self._matching()
+        count = len(rows) if self._count else None
+        for column, desc in reversed(self._order):
+            # Nulls last, as Postgres does for ascending order
+            rows = sorted(rows, key=lambda r: (r.get(column) is None, r.get(column) if r.get(column) is not None else 0),
+                          reverse=desc)
+        rows = rows[self._offset:]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        return _response(self._project(rows), count)
+
+    def _execute_insert(self):
+        payload = self._payload if isinstance(self._payload, list) else [self._payload]
+        rows = []
+        for item in payload:
+            row = {**self.store.defaults(self.table), **copy.deepcopy(item)}
+            if "id" in row and any(r.get("id") == row["id"] for r in self.store.tables[self.table]):
+                raise OfflineError(f'duplicate key value violates unique constraint "{self.table}_pkey"')
+            rows.append(row)
+        self.store.tables[self.table].extend(rows)
+        self.store.after_insert(self.table, rows)
+        return _response(copy.deepcopy(rows), len(rows) if self._count else None)
+
+    def _execute_update(self):
+        rows = self._matching()
+        for row in rows:
+            row.update(self.store.before_update(self.table, row, copy.deepcopy(self._payload)))
+        return _response(copy.deepcopy(rows), len(rows) if self._count else None)
+
+    def _execute_delete(self):
+        rows = self._matching()
+        doomed = {id(r) for r in rows}
+        self.store.tables[self.table] = [r for r in self.store.tables[self.table] if id(r) not in doomed]
+        self.store.after_delete(self.table, rows)
+        return _response(copy.deepcopy(rows), len(rows) if self._count else None)
+
+
+def _response(data: Any, count: Optional[int] = None):
+    return SimpleNamespace(data=data, count=count)
+
+
+def _set_deep(target: Any, path: List[str], value: Any, create_parents: bool) -> Any:
+    """jsonb_set_deep / jsonb_set from migrations/001 on Python values."""
+    if not path:
+        return copy.deepcopy(value)
+    doc = copy.deepcopy(target) if target is not None else {}
+    parent = doc
+    for key in path[:-1]:
+        if isinstance(parent, list):
+            if not key.isdigit() or int(key) >= len(parent):
+                return doc
+            parent = parent[int(key)]
+        else:
+            if parent.get(key) is None:
+                if not create_parents:
+                    return doc
+                parent[key] = {}
+            parent = parent[key]
+    last = path[-1]
+    if isinstance(parent, list):
+        if last.isdigit() and int(last) < len(parent):
+            parent[int(last)] = copy.deepcopy(value)
+    elif isinstance(parent, dict):
+        parent[last] = copy.deepcopy(value)
+    return doc
+
+
+class OfflineRpc:
+    def __init__(self, store: OfflineStore, name: str, params: Dict[str, Any]):
+        self.store, self.name, self.params = store, name, params
+
+    def execute(self):
+        handler = getattr(self, f"_{self.name}", None)
+        if handler is None:
+            raise OfflineError(f"Function {self.name} is not available offline")
+        if self.store.latency_ms:
+            time.sleep(self.store.latency_ms / 1000)
+        with self.store.lock:
+            return _response(handler(**self.params))
+
+    def _patch_project_json(self, p_project_id: str, p_patches: List[Dict[str, Any]]):
+        project = self.store.project(p_project_id)
+        if project is None:
+            return None
+        changes: Dict[str, Any] = {}
+        for patch in p_patches:
+            column = patch["column"]
+            if column not in PATCHABLE_COLUMNS:
+                raise OfflineError(f"Column {column} is not patchable")
+            current = changes.get(column, project.get(column))
+            changes[column] = _set_deep(current, [str(p) for p in patch.get("path", [])], patch.get("value"),
+                                        patch.get("create_parents", True))
+        project.update(self.store.before_update("projects", project, changes))
+        return None
+
+    def _replace_canvas(self, p_project_id: str, p_base_version: Optional[int], p_canvas: Dict[str, Any]):
+        project = self.store.project(p_project_id)
+        if project is None or (p_base_version is not None and project["canvas_version"] != p_base_version):
+            return None
+        project.update(self.store.before_update("projects", project, {"canvas_state": copy.deepcopy(p_canvas)}))
+        return project["canvas_version"]
+
+    def _usage_rows(self, since: str, until: Optional[str] = None):
+        for row in self.store.tables["llm_usage"]:
+            created = row["created_at"]
+            if created >= since and (until is None or created < until):
+                yield row
+
+    def _llm_usage_tokens(self, p_user_id: str, p_since: str):
+        return sum(r["prompt_tokens"] + r["completion_tokens"]
+                   for r in self._usage_rows(p_since) if r.get("user_id") == p_user_id)
+
+    def _llm_usage_rollup(self, p_since: str, p_until: str, p_group_by: List[str],
+                          p_limit: int = 1000, p_offset: int = 0):
+        dims = ("day", "user_id", "project_id", "phase", "site", "model")
+        groups: Dict[tuple, Dict[str, Any]] = {}
+        for r in self._usage_rows(p_since, p_until):
+            values = (r["created_at"][:10], r.get("user_id"), r.get("project_id"), r.get("phase"), r["site"], r["model"])
+            key = tuple(v if d in p_group_by else None for d, v in zip(dims, values))
+            g = groups.setdefault(key, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                        "latency_ms": 0, "cost_usd": 0.0})
+            g["calls"] += 1
+            for field in ("prompt_tokens", "completion_tokens", "latency_ms", "cost_usd"):
+                g[field] += r.get(field) or 0
+        ordered = sorted(groups.items(), key=lambda item: tuple((v is None, str(v)) for v in item[0]))
+        return [{**dict(zip(dims, key)), **totals} for key, totals in ordered[p_offset:p_offset + p_limit]]
+
+
+class OfflineAuth:
+    def __init__(self):
+        self.deleted_users = set()
+        self.admin = SimpleNamespace(delete_user=self.deleted_users.add)
+
+    def get_user(self, token: str):
+        """Each distinct token is a user; a UUID token is used as the user id directly."""
+        try:
+            user_id = str(uuid.UUID(token))
+        except ValueError:
+            user_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"founderlab-offline:{token}"))
+        if not token or user_id in self.deleted_users:
+            return SimpleNamespace(user=None)
+        return SimpleNamespace(user=SimpleNamespace(id=user_id, email=f"{user_id[:8]}@offline.local"))
+
+
+class OfflineSupabase:
+    def __init__(self, store: Optional[OfflineStore] = None):
+        self.store = store or OfflineStore()
+        self.auth = OfflineAuth()
+
+    def table(self, name: str) -> OfflineQuery:
+        return OfflineQuery(self.store, name)
+
+    from_ = table
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> OfflineRpc:
+        return OfflineRpc(self.store, name, params or {})
+
+
+# --- OpenAI ---------------------------------------------------------------
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _title(text: str, words: int = 4) -> str:
+    cleaned = re.sub(r"[^\w\s-]", "", text).split()
+    return " ".join(w.capitalize() for w in cleaned[:words]) or "New Feature"
+
+
+class ScriptedLLM:
+    """Drop-in for OpenAI(): client.chat.completions.create(...)."""
+
+    def __init__(self, latency_ms: float = 200.0, ms_per_token: float = 2.0, sleep: Callable[[float], None] = time.sleep):
+        self.latency_ms = latency_ms
+        self.ms_per_token = ms_per_token
+        self._sleep = sleep
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model: str, messages: List[Dict[str, str]], response_format: Optional[Dict] = None,
+               max_tokens: Optional[int] = None, timeout: Optional[float] = None, **_):
+        system = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+        prompt = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        if response_format and response_format.get("type") == "json_object":
+            content = json.dumps(self._json(system, prompt))
+        else:
+            content = self._text(system, prompt, messages)
+
+        prompt_tokens = sum(_approx_tokens(m.get("content") or "") for m in messages)
+        completion_tokens = _approx_tokens(content)
+        if max_tokens:
+            completion_tokens = min(completion_tokens, max_tokens)
+        # Deterministic per prompt: +-20% jitter seeded from the request
+        rng = random.Random(hashlib.sha1((model + prompt).encode()).hexdigest())
+        delay_ms = (self.latency_ms + self.ms_per_token * completion_tokens) * rng.uniform(0.8, 1.2)
+        if timeout is not None and delay_ms / 1000 > timeout:
+            self._sleep(timeout)
+            raise TimeoutError(f"Scripted completion exceeded timeout of {timeout:.1f}s")
+        self._sleep(delay_ms / 1000)
+
+        return SimpleNamespace(
+            id=f"offline-{uuid.uuid4().hex[:12]}",
+            model=model,
+            choices=[SimpleNamespace(index=0, finish_reason="stop",
+                                     message=SimpleNamespace(role="assistant", content=content))],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                  total_tokens=prompt_tokens + completion_tokens),
+        )
+
+    # Structured call sites, recognised by the JSON shape their prompt asks for
+    def _json(self, system: str, prompt: str) -> Dict[str, Any]:
+        if "security architect" in system:
+            return {
+                "frontend": [{"item": "Sanitize all user-rendered content", "priority": "critical"},
+                             {"item": "Store tokens in httpOnly cookies", "priority": "critical"},
+                             {"item": "Strict Content Security Policy", "priority": "high"}],
+                "backend": [{"item": "Rate limit auth endpoints", "priority": "critical"},
+                            {"item": "Validate every request payload", "priority": "critical"},
+                            {"item": "Rotate service keys quarterly", "priority": "high"}],
+                "database": [{"item": "Row Level Security on all tables", "priority": "critical"},
+                             {"item": "Encrypt PII columns at rest", "priority": "critical"},
+                             {"item": "Daily point-in-time backups", "priority": "high"}],
+            }
+        if "technical architect" in system:
+            return {"frontend": ["React (Vite)", "Tailwind CSS", "React Router"],
+                    "backend": ["Supabase Auth", "Supabase Realtime", "Supabase Edge Functions"],
+                    "database": ["PostgreSQL (via Supabase)", "Row Level Security"]}
+        if '"palettes"' in prompt:
+            return {"palettes": [
+                {"name": "Ocean Breeze", "colors": ["#0EA5E9", "#06B6D4", "#F0F9FF", "#0F172A"], "description": "Calm and trustworthy"},
+                {"name": "Warm Sunset", "colors": ["#E8613C", "#D97706", "#FFF7F5", "#1C1917"], "description": "Energetic and friendly"},
+                {"name": "Forest Calm", "colors": ["#059669", "#10B981", "#F0FDF4", "#1E293B"], "description": "Grounded and steady"},
+            ]}
+        if '"styles"' in prompt:
+            return {"styles": [
+                {"name": "Minimalist", "description": "Clean screens that show only what matters."},
+                {"name": "Bold & Modern", "description": "Confident colors and clear, punchy sections."},
+                {"name": "Soft & Friendly", "description": "Rounded shapes that feel warm and easy."},
+            ]}
+        if '"guidelines"' in prompt:
+            return {"guidelines": [
+                "Typography: Inter with bold headings and relaxed body text",
+                "Layout: Card-based sections with generous spacing",
+                "Interactions: Gentle fades and quick button feedback",
+            ]}
+        if '"features"' in prompt:
+            return {"features": [
+                "Analytics Dashboard: Shows usage trends so founders can see what works",
+                "Push Notifications: Brings users back at the right moment",
+                "Guided Onboarding: Gets new users to their first success quickly",
+                "Settings & Preferences: Lets users tailor the app to their routine",
+                "Calendar Integration: Syncs key dates with the tools users already use",
+            ]}
+        return {}
+
+    def _text(self, system: str, prompt: str, messages: List[Dict[str, str]]) -> str:
+        if "[IDEATION_COMPLETE]" in system:
+            return self._ideation_reply(messages)
+        if "[FEATURES_COMPLETE]" in system:
+            return self._feature_reply(prompt, messages)
+        if re.search(r"Generate .*PRD", system):
+            section = re.search(r"Section (\d)", prompt)
+            return self._prd_markdown(int(section.group(1)) if section else None)
+        return ("That's a solid direction. Based on what you've shared, I'd focus on the smallest version "
+                "that proves the core value. What would a user need to see in their first five minutes?")
+
+    def _ideation_reply(self, messages: List[Dict[str, str]]) -> str:
+        answers = [m["content"] for m in messages if m["role"] == "user"]
+        questions = [
+            "Great start! What specific problem are you solving, and who feels it most?",
+            "That makes sense. How painful is this today — what do people do instead?",
+            "Helpful. Who exactly is your first target user, and where do they hang out?",
+        ]
+        if len(answers) < 3:
+            return questions[len(answers) - 1 if answers else 0]
+        pillars = {
+            "core_problem": answers[0][:200],
+            "pain_point": answers[1][:200],
+            "target_audience": answers[2][:200],
+        }
+        competitors = [
+            {"name": "Notion", "description": "Flexible workspace that users bend to this job.", "url": "https://notion.so"},
+            {"name": "Trello", "description": "Boards for tracking work with light structure.", "url": "https://trello.com"},
+            {"name": "Airtable", "description": "Spreadsheet-database hybrid for custom workflows.", "url": "https://airtable.com"},
+        ]
+        return (
+            f"- **Core Problem:** {pillars['core_problem']}\n"
+            f"- **Pain Point:** {pillars['pain_point']}\n"
+            f"- **Target Audience:** {pillars['target_audience']}\n\n"
+            "This is a focused idea with a clear first audience. Click \"Continue to Feature Mapping\" to proceed.\n\n"
+            f"[IDEATION_COMPLETE]{json.dumps({'pillars': pillars, 'competitors': competitors})}[/IDEATION_COMPLETE]"
+        )
+
+    def _feature_reply(self, prompt: str, messages: List[Dict[str, str]]) -> str:
+        added = [m["content"] for m in messages if m["role"] == "assistant" and "to your canvas" in m["content"]]
+        titles = [t for m in added for t in re.findall(r"Adding \*\*(.+?)\*\* to your canvas", m)]
+        if titles and re.search(r"\b(ready|done|move on|architecture)\b", prompt, re.IGNORECASE):
+            features = [{"title": t, "subFeatures": [f"{t} Setup: Configure it in one step",
+                                                     f"{t} Insights: See how it is used"]} for t in titles]
+            summary = "\n".join(f"- **{t}:** Core capability for your first users" for t in titles)
+            return (f"{summary}\n\nA tight, buildable feature set. Click \"Continue to Architecture\" to proceed.\n\n"
+                    f"[FEATURES_COMPLETE]{json.dumps({'features': features})}[/FEATURES_COMPLETE]")
+
+        n = len(titles) + 1
+        title = _title(prompt)
+        feature = {"action": "add_node", "node": {
+            "id": f"feature-{n}", "type": "featureGroup", "parentId": "root",
+            "data": {"label": title, "subFeatures": [
+                f"Quick Create: Start a new {title.lower()} entry in one tap",
+                f"Smart Defaults: Pre-fill {title.lower()} details from past activity",
+                f"History View: Review and edit previous {title.lower()} entries",
+            ]},
+        }}
+        flow = {"action": "add_node", "node": {
+            "id": f"userflow-{n}", "type": "userFlow", "parentId": f"feature-{n}",
+            "data": {"parentFeatureId": f"feature-{n}", "steps": [
+                {"action": f"User opens {title}", "actor": "user"},
+                {"action": "System shows recent entries", "actor": "system"},
+                {"action": "User creates a new entry", "actor": "user"},
+                {"action": "System saves and confirms", "actor": "system"},
+            ]},
+        }}
+        return (f"Adding **{title}** to your canvas...\n\n"
+                f"[UPDATE_CANVAS]\n{json.dumps(feature)}\n[/UPDATE_CANVAS]\n\n"
+                f"[UPDATE_CANVAS]\n{json.dumps(flow)}\n[/UPDATE_CANVAS]\n\n"
+                + ("What's your next feature idea?" if n < 3 else
+                   f"You have {n} features mapped. Want to add more, or are you ready to move on to Architecture?"))
+
+    def _prd_markdown(self, section: Optional[int]) -> str:
+        sections = [section] if section else [1, 2, 3, 4]
+        parts = []
+        for s in sections:
+            parts.append(f"## {s}. Section {s}\n")
+            for sub in range(1, 4):
+                parts.append(f"### {s}.{sub} Topic {sub}\n")
+                parts.extend(f"- **Point {i}:** A concise, specific requirement for agents to implement." for i in range(1, 5))
+                parts.append("")
+        return "\n".join(parts)
+
+
+# --- Tavily ---------------------------------------------------------------
+
+class CannedSearch:
+    """Drop-in for TavilyClient: search(query, max_results) with stable results per query."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+
+    def search(self, query: str, max_results: int = 5, **_) -> Dict[str, Any]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        slug = re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-")[:40] or "search"
+        results = [{
+            "title": f"{kind}: {query[:60]}",
+            "url": f"https://example.com/{slug}/{i}",
+            "content": f"{kind} for '{query[:80]}'. Teams in this space focus on fast onboarding, "
+                       "clear pricing and integrations with the tools users already rely on.",
+            "score": round(0.9 - i * 0.1, 2),
+        } for i, kind in enumerate(["Market overview", "Competitor roundup", "User research notes",
+                                    "Design trends", "Pricing benchmarks"])]
+        return {"query": query, "results": results[:max_results]}
+
+
+def offline_clients() -> Tuple[OfflineSupabase, ScriptedLLM, CannedSearch]:
+    llm = ScriptedLLM(
+        latency_ms=float(os.environ.get("OFFLINE_LLM_LATENCY_MS", 200)),
+        ms_per_token=float(os.environ.get("OFFLINE_LLM_MS_PER_TOKEN", 2)),
+    )
+    store = OfflineStore(latency_ms=float(os.environ.get("OFFLINE_DB_LATENCY_MS", 0)))
+    search = CannedSearch(latency_ms=float(os.environ.get("OFFLINE_SEARCH_LATENCY_MS", 0)))
+    return OfflineSupabase(store), llm, search
@@ -0,0 +1,231 @@
+"""On-demand sampling profiler for slow requests.
+
+A profiled request gets a statistical profile of the event loop thread while
+it runs: a sampler thread reads the loop thread's stack every
+PROFILE_INTERVAL_MS (sys._current_frames, no tracing hooks) and counts each
+distinct stack. The result is written as folded stacks
+(PROFILE_DIR/<request id>.folded, "frame;frame;frame count" per line), which
+flamegraph.pl, inferno and speedscope read directly, with one line of
+metadata per profile appended to PROFILE_DIR/index.jsonl.
+
+Which requests are profiled:
+
+    X-Profile: <PROFILE_TOKEN>   that request (header ignored unless PROFILE_TOKEN is set);
+                                 the response carries X-Profile-Id
+    PROFILE_SAMPLE_RATE=0.01     that share of requests
+    PROFILE_SLOW_MS=2000         every request is sampled and the profile kept only
+                                 if the request took at least this long
+
+Only the loop thread is sampled: that is where async endpoints run their
+synchronous parsing, JSON and markdown work. Other requests running on the
+loop at the same time show up in the same profile, so profile on a quiet
+worker when the numbers must be exact. Samples where the loop was idle
+(waiting in the selector) are counted but left out of the stacks.
+
+Off unless one of the settings above is set.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, Optional, Set
+
+log = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL_MS = 5.0
+# Deeper stacks are cut from the root side; the leaf frames are what matter
+MAX_STACK_DEPTH = 128
+
+PROFILE_HEADER = b"x-profile"
+REQUEST_ID_HEADER = b"x-request-id"
+# The request id becomes a file name
+UNSAFE_ID_CHARS = re.compile(r"[^A-Za-z0-9_.-]")
+
+IDLE_FUNCTIONS = {("selectors.py", "select"), ("selectors.py", "poll")}
+
+
+class Profile:
+    __slots__ = ("request_id", "reason", "samples", "idle", "started")
+
+    def __init__(self, request_id: str, reason: Optional[str]):
+        self.request_id = request_id
+        # None = auto-capture candidate, kept only if the request turns out slow
+        self.reason = reason
+        self.samples: Counter = Counter()
+        self.idle = 0
+        self.started = time.perf_counter()
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+def fold_stack(frame) -> Optional[str]:
+    """Root-first "a;b;c" for a frame, or None when the thread is idle in the selector."""
+    code = frame.f_code
+    if (os.path.basename(code.co_filename), code.co_name) in IDLE_FUNCTIONS:
+        return None
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """One thread that samples a target thread while any profile is active."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.target: Optional[int] = None
+        self._active: Set[Profile] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, profile: Profile, target: int) -> None:
+        with self._lock:
+            self.target = target
+            self._active.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def remove(self, profile: Profile) -> None:
+        with self._lock:
+            self._active.discard(profile)
+            if not self._active:
+                self._wake.clear()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            with self._lock:
+                active = list(self._active)
+                target = self.target
+            frame = sys._current_frames().get(target)
+            if frame is not None and active:
+                stack = fold_stack(frame)
+                del frame
+                for profile in active:
+                    if stack is None:
+                        profile.idle += 1
+                    else:
+                        profile.samples[stack] += 1
+            time.sleep(self.interval)
+
+
+class RequestProfiler:
+    def __init__(self, directory: str, token: str = "", sample_rate: float = 0.0,
+                 slow_ms: float = 0.0, interval_ms: float = DEFAULT_INTERVAL_MS):
+        self.directory = directory
+        self.token = token
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.sampler = StackSampler(interval_ms / 1000)
+        self._write_lock = threading.Lock()
+
+    def reason(self, headers: Dict[bytes, bytes]) -> Optional[str]:
+        """Why this request should be profiled up front, or None."""
+        if self.token and headers.get(PROFILE_HEADER, b"").decode("latin-1") == self.token:
+            return "header"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    def save(self, profile: Profile, meta: Dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{profile.request_id}.folded")
+        with open(path, "w") as f:
+            for stack, count in profile.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        meta = {
+            "request_id": profile.request_id,
+            "reason": profile.reason,
+            "samples": sum(profile.samples.values()),
+            "idle_samples": profile.idle,
+            "interval_ms": self.sampler.interval * 1000,
+            "file": path,
+            **meta,
+        }
+        with self._write_lock, open(os.path.join(self.directory, "index.jsonl"), "a") as f:
+            f.write(json.dumps(meta) + "\n")
+        log.info("%s %s took %.0fms (%s); profile saved to %s", meta["method"], meta["route"],
+                 meta["duration_ms"], profile.reason, path)
+
+
+class ProfilingMiddleware:
+    """Profiles requests as configured on the RequestProfiler (no-op when it is None)."""
+
+    def __init__(self, app, profiler: Optional[RequestProfiler] = None):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        profiler = self.profiler
+        if profiler is None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers", []))
+        reason = profiler.reason(headers)
+        if reason is None and not profiler.slow_ms:
+            await self.app(scope, receive, send)
+            return
+
+        request_id = UNSAFE_ID_CHARS.sub("", headers.get(REQUEST_ID_HEADER, b"").decode("latin-1"))[:64].lstrip(".")
+        request_id = request_id or uuid.uuid4().hex
+        profile = Profile(request_id, reason)
+        response = {}
+
+        async def send_and_watch(message):
+            if message["type"] == "http.response.start" and reason == "header":
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (b"x-profile-id", request_id.encode("latin-1"))]}
+            elif message["type"] == "http.response.body" and not message.get("more_body"):
+                response["end"] = time.perf_counter()
+            await send(message)
+
+        profiler.sampler.add(profile, threading.get_ident())
+        try:
+            await self.app(scope, receive, send_and_watch)
+        finally:
+            profiler.sampler.remove(profile)
+            duration_ms = (response.get("end", time.perf_counter()) - profile.started) * 1000
+            if profile.reason is None and duration_ms >= profiler.slow_ms:
+                profile.reason = "slow"
+            if profile.reason is not None:
+                route = scope.get("route")
+                meta = {
+                    "method": scope.get("method", ""),
+                    "route": route.path if route is not None and hasattr(route, "path") else scope.get("path", ""),
+                    "duration_ms": round(duration_ms, 1),
+                    "captured_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                }
+                try:
+                    await asyncio.to_thread(profiler.save, profile, meta)
+                except OSError as e:
+                    log.warning("Could not save profile %s: %s", request_id, e)
+
+
+def profiler_from_env() -> Optional[RequestProfiler]:
+    token = os.environ.get("PROFILE_TOKEN", "")
+    sample_rate = float(os.environ.get("PROFILE_SAMPLE_RATE") or 0)
+    slow_ms = float(os.environ.get("PROFILE_SLOW_MS") or 0)
+    if not (token or sample_rate or slow_ms):
+        return None
+    return RequestProfiler(
+        os.environ.get("PROFILE_DIR", "/tmp/founderlab_profiles"),
+        token=token,
+        sample_rate=sample_rate,
+        slow_ms=slow_ms,
+        interval_ms=float(os.environ.get("PROFILE_INTERVAL_MS") or DEFAULT_INTERVAL_MS),
+    )
@@ -0,0 +1,208 @@
+"""Per-request project snapshot with lazily parsed JSON columns."""
+import base64
+import json
+import re
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from canvas import CanvasGraph
+from discovery import DiscoverySummary, cached_discovery_summary
+
+# JSONB columns in the projects table (JSON text before migrations/001)
+JSON_COLUMNS = ("canvas_state", "phase_summaries", "mindmap_data", "prd_draft", "ideation_pillars", "feature_data")
+
+# Always selected — needed for the ownership check; updated_at is the project version
+OWNERSHIP_COLUMNS = ("id", "user_id", "updated_at")
+
+# Everything the dashboard/workspace needs except the PRD draft blob
+PROJECT_DETAIL_COLUMNS = (
+    "name", "phase", "created_at", "updated_at",
+    "canvas_state", "phase_summaries", "mindmap_data", "ideation_pillars", "feature_data",
+)
+
+# Dashboard list: no JSON blobs; counters are maintained by triggers (migrations/004)
+PROJECT_LIST_COLUMNS = "id, name, phase, created_at, updated_at, message_count, has_prd"
+
+EMPTY_CANVAS = {"nodes": [], "edges": []}
+
+
+def project_columns(columns: Iterable[str]) -> str:
+    """Build a select() projection that always includes the ownership columns."""
+    selected = list(OWNERSHIP_COLUMNS)
+    for col in columns:
+        if col not in selected:
+            selected.append(col)
+    # The canvas is never read without the version it belongs to
+    if "canvas_state" in selected and "canvas_version" not in selected:
+        selected.append("canvas_version")
+    return ", ".join(selected)
+
+
+def json_patch(column: str, path: List[Union[str, int]], value: Any, create_parents: bool = True) -> Dict[str, Any]:
+    """One field-level edit for the patch_project_json RPC (see migrations/001)."""
+    return {
+        "column": column,
+        "path": [str(p) for p in path],
+        "value": value,
+        "create_parents": create_parents,
+    }
+
+
+_TIMESTAMP_RE = re.compile(r"^\d{4}-\d{2}-\d{2}[T ][\d:.]+(Z|[+-]\d{2}:?\d{2})?$")
+
+
+def encode_project_cursor(row: Dict[str, Any]) -> str:
+    """Opaque keyset cursor pointing just past this row in (updated_at, id) order."""
+    raw = json.dumps([row.get("updated_at"), row["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_project_cursor(cursor: str) -> Optional[Tuple[str, str]]:
+    """(updated_at, id) from a cursor, or None if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        updated_at, project_id = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    # Both values end up inside a PostgREST filter string, so only accept well-formed ones
+    try:
+        uuid.UUID(project_id)
+    except (ValueError, TypeError, AttributeError):
+        return None
+    if not isinstance(updated_at, str) or not _TIMESTAMP_RE.match(updated_at):
+        return None
+    return updated_at, project_id
+
+
+def _default_for(column: str) -> Any:
+    if column == "canvas_state":
+        return {"nodes": [], "edges": []}
+    return {}
+
+
+class ProjectState:
+    """A loaded project row whose JSON columns are parsed on first access.
+
+    Each JSON column is decoded at most once; the parsed object is shared by
+    every helper that receives this snapshot, so in-place edits (e.g. setting
+    mindmap_data["step"]) are visible to later code in the same request.
+    """
+
+    __slots__ = ("row", "columns", "_parsed", "_summary", "_canvas", "_canvas_dict")
+
+    def __init__(self, row: Dict[str, Any], columns: Tuple[str, ...] = ()):
+        self.row = row
+        self.columns = columns or tuple(row.keys())
+        self._parsed: Dict[str, Any] = {}
+        self._summary = None
+        self._canvas = None
+        # (graph revision, serialized canvas) for canvas_state
+        self._canvas_dict: Optional[Tuple[int, Dict]] = None
+
+    # Dict-style access to raw column values (kept for existing call sites)
+    def __getitem__(self, key: str) -> Any:
+        return self.row[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.row.get(key, default)
+
+    def _require(self, column: str) -> None:
+        if column not in self.row and column not in self.columns:
+            raise KeyError(f"Column '{column}' was not loaded for this request")
+
+    def json(self, column: str) -> Any:
+        """Return the parsed value of a JSON column, decoding it only once."""
+        if column in self._parsed:
+            return self._parsed[column]
+        self._require(column)
+        raw = self.row.get(column)
+        if isinstance(raw, str):
+            try:
+                value = json.loads(raw) if raw else None
+            except json.JSONDecodeError:
+                value = None
+        else:
+            value = raw
+        if value is None:
+            value = _default_for(column)
+        self._parsed[column] = value
+        return value
+
+    def set_json(self, column: str, value: Any) -> None:
+        """Replace a parsed column (e.g. after a write) without re-decoding."""
+        self._parsed[column] = value
+
+    @property
+    def id(self) -> str:
+        return self.row["id"]
+
+    @property
+    def name(self) -> str:
+        return self.row.get("name") or "Untitled Project"
+
+    @property
+    def phase(self) -> int:
+        self._require("phase")
+        return self.row.get("phase") or 1
+
+    @property
+    def canvas_state(self) -> Dict:
+        """The canvas document. Once .canvas is built this is its serialization, redone only
+        after the graph changes; edit through .canvas, not through this dict."""
+        if self._canvas is None:
+            return self.json("canvas_state")
+        if self._canvas_dict is None or self._canvas_dict[0] != self._canvas.revision:
+            self._canvas_dict = (self._canvas.revision, self._canvas.to_dict())
+        return self._canvas_dict[1]
+
+    @property
+    def canvas(self) -> CanvasGraph:
+        """Indexed canvas graph; once built, edits made through it are what canvas_state returns."""
+        if self._canvas is None:
+            self._canvas = CanvasGraph(self.json("canvas_state"))
+        return self._canvas
+
+    @property
+    def canvas_version(self) -> int:
+        return self.row.get("canvas_version") or 0
+
+    @property
+    def phase_summaries(self) -> Dict:
+        return self.json("phase_summaries")
+
+    @property
+    def mindmap_data(self) -> Dict:
+        return self.json("mindmap_data")
+
+    @property
+    def prd_draft(self) -> Dict:
+        return self.json("prd_draft")
+
+    @property
+    def ideation_pillars(self) -> Any:
+        return self.json("ideation_pillars")
+
+    @property
+    def feature_data(self) -> Any:
+        return self.json("feature_data")
+
+    @property
+    def summary(self) -> DiscoverySummary:
+        """Normalized Phase 1-3 data for prompt builders, memoized per stored version.
+
+        Reflects the project as loaded — build it before mutating phase_summaries.
+        """
+        if self._summary is None:
+            mindmap_loaded = "mindmap_data" in self.columns or "mindmap_data" in self.row
+            self._summary = cached_discovery_summary(
+                self.id,
+                self.row.get("updated_at"),
+                mindmap_loaded,
+                self.phase_summaries,
+                self.mindmap_data if mindmap_loaded else {},
+            )
+        return self._summary
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Raw row as returned by Supabase (JSON columns left as stored)."""
+        return dict(self.row)
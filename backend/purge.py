@@ -0,0 +1,313 @@
+"""Set-based deletion of projects and their messages, documents and files.
+
+Deletes go out as one in_() filter per table per batch instead of three
+round trips per project. Large accounts are purged by a background job
+whose progress is kept in the purge_jobs table and polled by the client;
+soft-deleted projects are purged by a periodic sweeper.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from discovery import forget_discovery_summaries
+from metrics import job_timer
+from tracing import span
+
+log = logging.getLogger(__name__)
+
+DOCUMENTS_DIR = "/tmp/documents"
+
+# Project ids per in_() filter — keeps the PostgREST request URL bounded
+PURGE_BATCH_SIZE = 100
+
+# Accounts with more projects than this are purged in the background
+BACKGROUND_PURGE_THRESHOLD = 20
+
+# How often the sweeper purges soft-deleted projects and orphaned files and expires purge jobs
+SWEEP_INTERVAL_SECONDS = 60
+
+# Files younger than this are never treated as orphaned: a document is written
+# to disk before its rows are saved
+ORPHAN_GRACE_SECONDS = 3600
+
+
+def _count(result) -> int:
+    return result.count or 0
+
+
+def remove_document_files(project_ids: List[str], documents_dir: str = DOCUMENTS_DIR) -> int:
+    """Delete every generated file ("<project_id>_*") for these projects. Returns files removed."""
+    try:
+        filenames = os.listdir(documents_dir)
+    except FileNotFoundError:
+        return 0
+    prefixes = tuple(f"{pid}_" for pid in project_ids)
+    removed = 0
+    for name in filenames:
+        if name.startswith(prefixes):
+            try:
+                os.remove(os.path.join(documents_dir, name))
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def purge_projects(client, project_ids: List[str],
+                   on_batch: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, int]:
+    """Delete projects with their documents, messages and files, in batches.
+
+    Children are deleted before parents within each batch. on_batch receives
+    the counts for each finished batch.
+    """
+    totals = {"projects": 0, "messages": 0, "documents": 0, "files": 0}
+    for start in range(0, len(project_ids), PURGE_BATCH_SIZE):
+        batch = project_ids[start:start + PURGE_BATCH_SIZE]
+        counts = {
+            "documents": _count(client.table("documents").delete(count="exact", returning="minimal").in_("project_id", batch).execute()),
+            "messages": _count(client.table("messages").delete(count="exact", returning="minimal").in_("project_id", batch).execute()),
+            "projects": _count(client.table("projects").delete(count="exact", returning="minimal").in_("id", batch).execute()),
+            "files": remove_document_files(batch),
+        }
+        forget_discovery_summaries(batch)
+        for key, value in counts.items():
+            totals[key] += value
+        if on_batch:
+            on_batch(counts)
+    return totals
+
+
+@dataclass
+class PurgeJob:
+    user_id: str
+    total_projects: int
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    status: str = "pending"  # pending | running | done | failed
+    deleted: Dict[str, int] = field(default_factory=lambda: {"projects": 0, "messages": 0, "documents": 0, "files": 0})
+    error: Optional[str] = None
+    created_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    finished_at: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row: Dict) -> "PurgeJob":
+        return cls(
+            user_id=row["user_id"],
+            total_projects=row.get("total_projects") or 0,
+            id=row["id"],
+            status=row.get("status") or "pending",
+            deleted={"projects": 0, "messages": 0, "documents": 0, "files": 0, **(row.get("deleted") or {})},
+            error=row.get("error"),
+            created_at=row.get("created_at"),
+            finished_at=row.get("finished_at"),
+        )
+
+    def to_row(self) -> Dict:
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "status": self.status,
+            "total_projects": self.total_projects,
+            "deleted": dict(self.deleted),
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": datetime.utcnow().isoformat(),
+            "finished_at": self.finished_at,
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total_projects": self.total_projects,
+            "deleted": dict(self.deleted),
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+# Jobs live in the purge_jobs table (migrations/008), so any worker can answer a poll.
+# A running job rewrites its row after every batch; one not written for this long lost
+# its worker (restart, crash) and is marked failed so the client can start it again
+PURGE_JOB_STALE_SECONDS = 600
+# Finished jobs are kept this long so the client can read the final counts
+PURGE_JOB_RETENTION_SECONDS = 7 * 24 * 3600
+
+
+def create_purge_job(client, user_id: str, total_projects: int) -> PurgeJob:
+    job = PurgeJob(user_id=user_id, total_projects=total_projects)
+    client.table("purge_jobs").insert(job.to_row(), returning="minimal").execute()
+    return job
+
+
+def get_purge_job(client, job_id: str) -> Optional[PurgeJob]:
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        return None
+    result = client.table("purge_jobs").select("*").eq("id", job_id).execute()
+    return PurgeJob.from_row(result.data[0]) if result.data else None
+
+
+def _save_job(client, job: PurgeJob) -> None:
+    row = job.to_row()
+    del row["id"], row["user_id"], row["created_at"]
+    client.table("purge_jobs").update(row, returning="minimal").eq("id", job.id).execute()
+
+
+def run_purge_job(client, job: PurgeJob, project_ids: List[str],
+                  after: Optional[Callable[[], None]] = None) -> None:
+    """Background task: purge project_ids, recording progress on the job's row.
+
+    after() runs once the data is gone (e.g. deleting the auth user).
+    """
+    def record(counts: Dict[str, int]) -> None:
+        for key, value in counts.items():
+            job.deleted[key] += value
+        _save_job(client, job)
+
+    job.status = "running"
+    with span("job.purge", {"purge.projects": len(project_ids)}) as current:
+        try:
+            _save_job(client, job)
+            purge_projects(client, project_ids, on_batch=record)
+            if after:
+                after()
+            job.status = "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            current.record_error(e)
+            log.exception("Purge job %s failed", job.id)
+        finally:
+            job.finished_at = datetime.utcnow().isoformat()
+            try:
+                _save_job(client, job)
+            except Exception:
+                log.exception("Could not record the outcome of purge job %s", job.id)
+
+
+def expire_purge_jobs(client) -> int:
+    """Fail jobs whose worker stopped updating them and drop old finished ones. Returns jobs failed."""
+    now = datetime.utcnow()
+    interrupted = {
+        "status": "failed",
+        "error": "Interrupted; start the deletion again",
+        "updated_at": now.isoformat(),
+        "finished_at": now.isoformat(),
+    }
+    stale = (client.table("purge_jobs").update(interrupted)
+             .in_("status", ["pending", "running"])
+             .lt("updated_at", (now - timedelta(seconds=PURGE_JOB_STALE_SECONDS)).isoformat())
+             .execute())
+    (client.table("purge_jobs").delete(returning="minimal")
+     .in_("status", ["done", "failed"])
+     .lt("updated_at", (now - timedelta(seconds=PURGE_JOB_RETENTION_SECONDS)).isoformat())
+     .execute())
+    return len(stale.data or [])
+
+
+# --- Soft-delete sweeper ---
+
+def sweep_deleted_projects(client) -> Dict[str, int]:
+    """Purge every soft-deleted project, a batch at a time."""
+    totals = {"projects": 0, "messages": 0, "documents": 0, "files": 0}
+    while True:
+        result = (client.table("projects").select("id")
+                  .not_.is_("deleted_at", "null")
+                  .order("deleted_at")
+                  .limit(PURGE_BATCH_SIZE)
+                  .execute())
+        project_ids = [p["id"] for p in (result.data or [])]
+        if not project_ids:
+            return totals
+        counts = purge_projects(client, project_ids)
+        for key, value in counts.items():
+            totals[key] += value
+        if not counts["projects"]:
+            return totals  # nothing could be deleted; don't spin on the same batch
+
+
+def _is_uuid(value: str) -> bool:
+    try:
+        uuid.UUID(value)
+        return True
+    except ValueError:
+        return False
+
+
+def collect_orphaned_files(client, documents_dir: str = DOCUMENTS_DIR,
+                           grace_seconds: float = ORPHAN_GRACE_SECONDS) -> int:
+    """Remove generated files older than grace_seconds whose project row no longer exists.
+
+    Returns files removed.
+    """
+    try:
+        filenames = os.listdir(documents_dir)
+    except FileNotFoundError:
+        return 0
+    cutoff = time.time() - grace_seconds
+    stale: Dict[str, List[str]] = {}
+    for name in filenames:
+        project_id = name.split("_", 1)[0]
+        if "_" not in name or not _is_uuid(project_id):
+            continue
+        try:
+            if os.path.getmtime(os.path.join(documents_dir, name)) >= cutoff:
+                continue
+        except OSError:
+            continue
+        stale.setdefault(project_id, []).append(name)
+
+    file_project_ids = sorted(stale)
+    orphaned = []
+    for start in range(0, len(file_project_ids), PURGE_BATCH_SIZE):
+        batch = file_project_ids[start:start + PURGE_BATCH_SIZE]
+        result = client.table("projects").select("id").in_("id", batch).execute()
+        existing = {p["id"] for p in (result.data or [])}
+        orphaned.extend(pid for pid in batch if pid not in existing)
+    if orphaned:
+        forget_discovery_summaries(orphaned)
+
+    removed = 0
+    for project_id in orphaned:
+        for name in stale[project_id]:
+            try:
+                os.remove(os.path.join(documents_dir, name))
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def sweep_once(client, collect_files: bool = True) -> Dict[str, int]:
+    with span("job.sweep") as current, job_timer("sweep"):
+        totals = sweep_deleted_projects(client)
+        totals["orphaned_files"] = collect_orphaned_files(client) if collect_files else 0
+        totals["interrupted_jobs"] = expire_purge_jobs(client)
+        current.set_attributes({"purge.projects": totals["projects"], "purge.orphaned_files": totals["orphaned_files"]})
+        return totals
+
+
+async def run_sweeper(client, interval: float = SWEEP_INTERVAL_SECONDS, collect_files: bool = True) -> None:
+    """Run sweep_once forever in a worker thread; started from the app lifespan.
+
+    collect_files=False skips the orphaned-file scan, for a client whose
+    projects table does not describe the files on disk (offline mode).
+    """
+    while True:
+        try:
+            totals = await asyncio.to_thread(sweep_once, client, collect_files)
+            if totals["projects"] or totals["orphaned_files"]:
+                log.info("Sweeper purged %d projects, %d messages, %d documents, %d files", totals["projects"],
+                         totals["messages"], totals["documents"], totals["files"] + totals["orphaned_files"])
+            if totals["interrupted_jobs"]:
+                log.warning("Sweeper marked %d interrupted purge jobs as failed", totals["interrupted_jobs"])
+        except Exception:
+            log.exception("Sweep failed")
+        await asyncio.sleep(interval)
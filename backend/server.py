@@ -1,30 +1,79 @@
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable, Callable
 import os
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from openai import OpenAI
-from tavily import TavilyClient
+import copy
+import hashlib
+import hmac
+import importlib
 import json
+import logging
+import secrets
 import uuid
 from datetime import datetime
-import markdown
-try:
-    from weasyprint import HTML
-    WEASYPRINT_AVAILABLE = True
-except (ImportError, OSError):
-    WEASYPRINT_AVAILABLE = False
 from io import BytesIO
+from contextlib import asynccontextmanager
 import asyncio
 
+from canvas import CanvasGraph, CanvasPatchError, apply_canvas_ops, apply_chat_canvas_updates, check_canvas
+from discovery import DiscoverySummary, summary_cache_counts
+from events import STREAM_TICKET_TTL_SECONDS, EventBus, broker_from_env, format_sse, issue_stream_ticket, read_stream_ticket
+from http_cache import etag_matches, json_with_etag, make_etag, not_modified
+from lazy import Lazy, warm
+from llm_cache import cache_from_env, cache_key
+from llm_gateway import gateway_from_env
+from llm_routing import router_from_env
+from logs import LogContextMiddleware, bind_log_context, log_drop_counts, setup_logging_from_env
+from offline import OFFLINE_MODE, offline_clients
+from usage import GROUP_DIMENSIONS, SUM_FIELDS, UsageRecorder, rollup_usage, set_usage_scope, usage_window
+from project_state import (
+    ProjectState, PROJECT_DETAIL_COLUMNS, PROJECT_LIST_COLUMNS, project_columns, json_patch,
+    encode_project_cursor, decode_project_cursor,
+)
+from profiling import ProfilingMiddleware, profiler_from_env
+from purge import BACKGROUND_PURGE_THRESHOLD, create_purge_job, get_purge_job, purge_projects, run_purge_job, run_sweeper
+from metrics import (
+    PDF_RENDER_SECONDS, SEARCH_REQUEST_SECONDS, MetricsMiddleware, label_request, monitor_event_loop_lag,
+    register_cache, registry, render_metrics, track_job,
+)
+from tracing import (
+    TracedSupabase, TracingMiddleware, current_span, set_project_attributes, set_tracer, span, traced, tracer_from_env,
+)
+
 # Load environment variables
 load_dotenv()
 
-app = FastAPI()
+# JSON logs through a sampled, non-blocking queue (see logs.py)
+setup_logging_from_env()
+log = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if tracer:
+        tracer.start()
+    event_bus.start(asyncio.get_running_loop())
+    usage_recorder.start()
+    # Purge soft-deleted projects and orphaned document files in the background. The offline
+    # store starts empty, so every file on disk would look orphaned: leave the files alone there
+    sweeper = asyncio.create_task(run_sweeper(supabase, collect_files=not OFFLINE_MODE))
+    loop_lag = asyncio.create_task(monitor_event_loop_lag())
+    # Build the clients and load WeasyPrint off the loop, without delaying startup (see lazy.py)
+    warm_up = asyncio.create_task(warm(lazy_resources)) if STARTUP_WARMUP else None
+    yield
+    if warm_up:
+        warm_up.cancel()
+    loop_lag.cancel()
+    sweeper.cancel()
+    event_bus.stop()
+    usage_recorder.stop()
+    if tracer:
+        tracer.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS configuration
 app.add_middleware(
@@ -34,40 +83,187 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# One span per request (no-op unless TRACE_EXPORTER is set, see tracing.py)
+app.add_middleware(TracingMiddleware)
+# Request latency histograms for /api/metrics
+app.add_middleware(MetricsMiddleware)
+# Sampling profiles of chosen or slow requests (no-op unless PROFILE_* is set, see profiling.py)
+app.add_middleware(ProfilingMiddleware, profiler=profiler_from_env())
+# Request id and project on every log record; outermost so the profiler sees the same id
+app.add_middleware(LogContextMiddleware)
+
+# Clients and heavy optional modules are built on first use (or by the lifespan warm-up)
+def create_supabase_client():
+    from supabase import create_client
+    return create_client(
+        os.environ.get("SUPABASE_PROJECT_URL"),
+        os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+    )
 
-# Initialize clients
-supabase: Client = create_client(
-    os.environ.get("SUPABASE_PROJECT_URL"),
-    os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
-)
-openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-tavily_client = TavilyClient(api_key=os.environ.get("TAVILY_API_KEY"))
+def create_openai_client():
+    from openai import OpenAI
+    # The gateway owns retries, so the SDK's own are turned off
+    return OpenAI(api_key=os.environ.get("OPENAI_API_KEY"), max_retries=0)
+
+def create_tavily_client():
+    from tavily import TavilyClient
+    return TavilyClient(api_key=os.environ.get("TAVILY_API_KEY"))
+
+def load_weasyprint():
+    """WeasyPrint's HTML class, or None when it (or its GTK libraries) is missing."""
+    try:
+        from weasyprint import HTML
+        return HTML
+    except (ImportError, OSError) as e:
+        log.info("PDF generation not available: %s", e)
+        return None
+
+STARTUP_WARMUP = os.environ.get("STARTUP_WARMUP", "1") != "0"
+
+# FOUNDERLAB_OFFLINE=1 swaps in the in-process fakes from offline.py
+if OFFLINE_MODE:
+    supabase, openai_client, tavily_client = offline_clients()
+    log.info("Offline mode: using in-memory Supabase, scripted LLM and canned search")
+else:
+    supabase = Lazy("supabase", create_supabase_client)
+    openai_client = Lazy("openai", create_openai_client)
+    tavily_client = Lazy("tavily", create_tavily_client)
+weasyprint_html = Lazy("weasyprint", load_weasyprint)
+markdown_lib = Lazy("markdown", lambda: importlib.import_module("markdown"))
+lazy_resources = [r for r in (supabase, openai_client, tavily_client, weasyprint_html, markdown_lib) if isinstance(r, Lazy)]
+
+# Request tracing; with it on, every Supabase query is a span
+tracer = tracer_from_env()
+if tracer:
+    set_tracer(tracer)
+    supabase = TracedSupabase(supabase)
+
+# Token/cost accounting for every completion; rows are written to llm_usage in batches
+usage_recorder = UsageRecorder(supabase)
+llm = gateway_from_env(openai_client, on_usage=usage_recorder.record)
+llm_cache = cache_from_env()
+model_router = router_from_env()
+
+# Read at scrape time by /api/metrics
+def llm_cache_counts():
+    stats = llm_cache.stats()
+    return stats["lookups"] - stats["misses"], stats["misses"]
+
+register_cache("llm_response", llm_cache_counts)
+register_cache("discovery_summary", summary_cache_counts)
+registry.add_callback(lambda: [
+    ("llm_circuit_open", "gauge", "1 while the OpenAI circuit breaker is open.", {}, int(llm.breaker.state == "open")),
+])
+registry.add_callback(lambda: [
+    ("log_records_dropped_total", "counter", "Log records dropped by sampling, rate limiting or a full queue.",
+     {"reason": reason}, count)
+    for reason, count in log_drop_counts().items()
+])
+
+# Project events (SSE); set EVENTS_BROKER_URL=redis://... when running several workers
+event_bus = EventBus(broker_from_env(os.environ.get("EVENTS_BROKER_URL")))
 
 # Auth dependency
 security = HTTPBearer()
 
+def user_id_from_token(token: str) -> str:
+    """Validate a Supabase JWT and return the user's UUID."""
+    with span("auth.get_current_user"):
+        try:
+            user_response = supabase.auth.get_user(token)
+            user = user_response.user
+            if not user:
+                raise HTTPException(status_code=401, detail="Invalid token")
+            return user.id
+        except Exception as e:
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
     """Validate JWT and return the user's UUID."""
-    token = credentials.credentials
-    try:
-        user_response = supabase.auth.get_user(token)
-        user = user_response.user
-        if not user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        return user.id
-    except Exception as e:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    return user_id_from_token(credentials.credentials)
+
+# Tokens per user per UTC day across all LLM calls; 0 = no quota
+LLM_DAILY_TOKEN_QUOTA = int(os.environ.get("LLM_DAILY_TOKEN_QUOTA") or 0)
 
-async def verify_project_ownership(project_id: str, user_id: str) -> dict:
-    """Verify a project belongs to the user and return it. Raises 404 if not found/owned."""
-    result = supabase.table("projects").select("*").eq("id", project_id).execute()
+async def require_llm_quota(user_id: str = Depends(get_current_user)) -> str:
+    """get_current_user for endpoints that call the LLM: enforces the daily
+    token quota and attributes the request's LLM usage to the user."""
+    set_usage_scope(user_id=user_id)
+    if LLM_DAILY_TOKEN_QUOTA:
+        try:
+            used = await asyncio.to_thread(usage_recorder.tokens_today, user_id)
+        except Exception as e:
+            log.warning("Quota check failed for %s, allowing request: %s", user_id, e)
+            return user_id
+        if used >= LLM_DAILY_TOKEN_QUOTA:
+            raise HTTPException(status_code=429, detail="Daily AI usage limit reached. It resets at midnight UTC.")
+    return user_id
+
+ADMIN_USER_IDS = {u.strip() for u in os.environ.get("ADMIN_USER_IDS", "").split(",") if u.strip()}
+
+async def get_admin_user(user_id: str = Depends(get_current_user)) -> str:
+    if user_id not in ADMIN_USER_IDS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user_id
+
+optional_security = HTTPBearer(auto_error=False)
+
+def stream_ticket_secret() -> bytes:
+    """Key for event stream tickets; shared by every worker unless none is configured."""
+    configured = os.environ.get("EVENT_STREAM_SECRET") or os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+    if configured:
+        return hashlib.sha256(b"event-stream-ticket:" + configured.encode()).digest()
+    # Offline / local: tickets are only accepted by this process
+    return secrets.token_bytes(32)
+
+STREAM_TICKET_SECRET = stream_ticket_secret()
+
+async def get_event_stream_user(project_id: str, ticket: Optional[str] = None,
+                                credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)) -> str:
+    """Like get_current_user, but also accepts ?ticket= (see events.py) since EventSource can't send headers."""
+    if credentials:
+        return user_id_from_token(credentials.credentials)
+    if not ticket:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    user_id = read_stream_ticket(STREAM_TICKET_SECRET, ticket, project_id)
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired stream ticket")
+    return user_id
+
+
+def fetch_project_state(project_id: str, columns: Iterable[str] = PROJECT_DETAIL_COLUMNS) -> Optional[ProjectState]:
+    """Fetch only the requested project columns. Returns None if the project doesn't exist."""
+    projection = project_columns(columns)
+    # Soft-deleted projects are gone as far as every route is concerned
+    result = supabase.table("projects").select(projection).eq("id", project_id).is_("deleted_at", "null").execute()
     if not result.data:
+        return None
+    return ProjectState(result.data[0], tuple(c.strip() for c in projection.split(",")))
+
+def owned_project(project_id: str, project: Optional[ProjectState], user_id: str) -> ProjectState:
+    """Check a fetched project belongs to the user (404 if not) and label the request's spans, logs and metrics with it."""
+    if project is None:
         raise HTTPException(status_code=404, detail="Project not found")
-    project = result.data[0]
     if project.get("user_id") and project["user_id"] != user_id:
         raise HTTPException(status_code=404, detail="Project not found")
+    set_project_attributes(project_id=project_id, phase=project.get("phase"))
+    bind_log_context(project_id=project_id, phase=project.get("phase"))
+    label_request(phase=project.get("phase"))
     return project
 
+async def load_project(project_id: str, user_id: str, columns: Iterable[str] = PROJECT_DETAIL_COLUMNS) -> ProjectState:
+    """Load a project snapshot with the columns a route needs. Raises 404 if not found/owned."""
+    return owned_project(project_id, fetch_project_state(project_id, columns), user_id)
+
+async def verify_project_ownership(project_id: str, user_id: str) -> ProjectState:
+    """Verify a project belongs to the user without fetching any JSON blobs."""
+    return await load_project(project_id, user_id, ())
+
+def patch_project_json(project_id: str, patches: List[Dict]) -> None:
+    """Apply field-level JSONB patches server-side in one atomic RPC call."""
+    if patches:
+        supabase.rpc("patch_project_json", {"p_project_id": project_id, "p_patches": patches}).execute()
+
 # Pydantic models
 class ChatMessage(BaseModel):
     role: str
@@ -90,6 +286,11 @@ class NodeUpdate(BaseModel):
     project_id: str
     nodes: List[Dict[str, Any]]
     edges: List[Dict[str, Any]]
+    canvas_version: Optional[int] = None  # If set, only write when the stored version still matches
+
+class CanvasPatch(BaseModel):
+    canvas_version: int
+    ops: List[Dict[str, Any]]  # node/edge-level operations, see canvas.py
 
 class DocumentRequest(BaseModel):
     project_id: str
@@ -281,48 +482,88 @@ Always include a brief message with the action, like "Here's your PRD! [ACTION:D
 Keep responses brief and actionable."""
 }
 
+AI_UNAVAILABLE_MESSAGE = "Sorry, I couldn't reach the AI service just now. Please try sending that again in a moment."
+
 # Helper functions
-def web_search(query: str) -> str:
-    """Perform web search using Tavily"""
-    try:
-        response = tavily_client.search(query=query, max_results=3)
-        results = []
-        for result in response.get('results', []):
-            results.append(f"- {result.get('title', '')}: {result.get('content', '')[:200]}...")
-        return "\n".join(results) if results else "No results found"
-    except Exception as e:
-        return f"Search error: {str(e)}"
+def web_search(query: str, site: str = "chat") -> str:
+    """Perform web search using Tavily (site names the caller for metrics)"""
+    with span("search.tavily", {"search.site": site, "search.max_results": 3}) as current, \
+            SEARCH_REQUEST_SECONDS.time(site=site, outcome="ok") as labels:
+        try:
+            response = tavily_client.search(query=query, max_results=3)
+            results = []
+            for result in response.get('results', []):
+                results.append(f"- {result.get('title', '')}: {result.get('content', '')[:200]}...")
+            current.set_attribute("search.results", len(results))
+            return "\n".join(results) if results else "No results found"
+        except Exception as e:
+            current.record_error(e)
+            labels["outcome"] = "error"
+            return f"Search error: {str(e)}"
+
+def build_chat_context(project: ProjectState, phase: int) -> Dict:
+    """Project context appended to the phase prompt: canvas plus the summaries of earlier phases."""
+    project_context = {
+        "phase": project.phase,
+        "canvas_state": project.canvas_state if project.get("canvas_state") else None
+    }
 
-def get_ai_response(messages: List[Dict], phase: int, project_context: Dict = None) -> str:
-    """Get response from OpenAI GPT-4o"""
+    # Inject phase summaries for phases > 1
+    if phase > 1:
+        phase_summaries = project.phase_summaries
+        # Always inject the immediate previous phase summary
+        prev_phase_key = str(phase - 1)
+        if prev_phase_key in phase_summaries:
+            project_context["previous_phase_summary"] = phase_summaries[prev_phase_key]
+        # For Phase 3+, inject ALL prior phase summaries so AI has full context
+        if phase >= 3:
+            all_summaries = {}
+            for k, v in phase_summaries.items():
+                if int(k) < phase:
+                    all_summaries[k] = v
+            if all_summaries:
+                project_context["all_phase_summaries"] = all_summaries
+
+    return project_context
+
+def build_chat_messages(messages: List[Dict], phase: int, project_context: Dict = None) -> List[Dict]:
+    """The full message list sent for a phase chat turn."""
     system_prompt = PHASE_PROMPTS.get(phase, PHASE_PROMPTS[1])
-    
+
     if project_context:
         system_prompt += f"\n\nProject Context:\n{json.dumps(project_context, indent=2)}"
-    
+
+    return [{"role": "system", "content": system_prompt}, *messages]
+
+def get_ai_response(messages: List[Dict], phase: int, project_context: Dict = None) -> str:
+    """Get response from OpenAI GPT-4o"""
     try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                *messages
-            ],
+        response = llm.complete(
+            "chat",
+            site="phase_chat",
+            model=model_router.model("phase_chat"),
+            messages=build_chat_messages(messages, phase, project_context),
             temperature=0.7,
             max_tokens=2000
         )
         return response.choices[0].message.content
     except Exception as e:
-        return f"AI Error: {str(e)}"
+        # Shown in the chat as the assistant's reply, so keep provider errors out of it
+        log.warning("Chat completion failed: %s", e)
+        return AI_UNAVAILABLE_MESSAGE
 
 def generate_markdown_doc(content: str, title: str) -> str:
     """Generate markdown document"""
     return f"# {title}\n\n{content}"
 
+@traced("pdf.render")
+@PDF_RENDER_SECONDS.timed()
 def generate_pdf_from_markdown(md_content: str, output_path: str):
     """Convert markdown to PDF using weasyprint"""
-    if not WEASYPRINT_AVAILABLE:
+    HTML = weasyprint_html.get()
+    if HTML is None:
         raise HTTPException(status_code=501, detail="PDF generation not available (WeasyPrint requires GTK libraries)")
-    html_content = markdown.markdown(md_content, extensions=['extra', 'tables'])
+    html_content = markdown_lib.markdown(md_content, extensions=['extra', 'tables'])
     html_full = f"""
     <html>
     <head>
@@ -342,96 +583,101 @@ def generate_pdf_from_markdown(md_content: str, output_path: str):
     """
     HTML(string=html_full).write_pdf(output_path)
 
-def get_ai_json_response(prompt: str, project_context: Dict = None) -> Any:
-    """Get a JSON-only response from OpenAI GPT-4o"""
+def _usage_tokens(response) -> int:
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", 0) or 0
+
+
+def complete_json(call_type: str, site: str, messages: List[Dict],
+                  validate: Optional[Callable[[Dict], bool]] = None, cache: bool = False, **params) -> Optional[Dict]:
+    """JSON-object completion on the site's routed model.
+
+    Output that doesn't parse or fails validate() is retried one tier up.
+    With cache=True, an identical request is answered from the response
+    cache and validated results are stored. Returns None on failure.
+    """
+    request = dict(model=model_router.model(site), messages=messages,
+                   response_format={"type": "json_object"}, **params)
+    key = cache_key(**request) if cache else None
+    if key:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return json.loads(cached)
+
+    model = request["model"]
+    while model:
+        try:
+            response = llm.complete(call_type, site=site, **{**request, "model": model})
+            raw = response.choices[0].message.content.strip()
+            result = json.loads(raw)
+            if isinstance(result, dict) and (validate is None or validate(result)):
+                if key:
+                    llm_cache.set(key, raw, tokens=_usage_tokens(response))
+                return result
+            problem = "failed validation"
+        except json.JSONDecodeError:
+            problem = "was not valid JSON"
+        except Exception as e:
+            log.warning("%s call failed: %s: %s", site, type(e).__name__, e)
+            return None
+        next_model = model_router.escalate(model)
+        if next_model:
+            log.info("%s output from %s %s; escalating to %s", site, model, problem, next_model)
+        model = next_model
+    return None
+
+
+def get_ai_json_response(prompt: str, site: str, project_context: Dict = None,
+                         validate: Optional[Callable[[Dict], bool]] = None, cache: bool = False) -> Any:
+    """Get a JSON-only response for a product-design call site (see complete_json)."""
     system = "You are a product design expert. Return ONLY valid JSON, no markdown, no explanation."
     if project_context:
         system += f"\n\nProject Context:\n{json.dumps(project_context, indent=2)}"
-    try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1500,
-            response_format={"type": "json_object"}
-        )
-        raw = response.choices[0].message.content.strip()
-        return json.loads(raw)
-    except Exception as e:
-        return None
+    return complete_json(
+        "json", site,
+        [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt}
+        ],
+        validate=validate,
+        cache=cache,
+        temperature=0.7,
+        max_tokens=1500,
+    )
 
 
-def build_prd_prompt(phase_summaries: Dict, mindmap_data: Dict, project_name: str) -> str:
+def build_prd_prompt(summary: DiscoverySummary, project_name: str) -> str:
     """Build a comprehensive PRD prompt using all Phase 1-3 context."""
-    ideation = phase_summaries.get("1", {})
-    if isinstance(ideation, str):
-        ideation = json.loads(ideation)
-    features_summary = phase_summaries.get("2", {})
-    if isinstance(features_summary, str):
-        features_summary = json.loads(features_summary)
-    design = phase_summaries.get("3", {})
-    if isinstance(design, str):
-        design = json.loads(design)
-
-    # Handle both new format (pillars nested) and legacy format (flat)
-    if "pillars" in ideation:
-        pillars = ideation.get("pillars", {})
-        competitors = ideation.get("competitors", [])
-    else:
-        # Legacy format
-        pillars = ideation
-        competitors = []
-
     # Ideation context
-    core_problem = pillars.get("core_problem", "Not specified")
-    pain_point = pillars.get("pain_point", "Not specified")
-    target_audience = pillars.get("target_audience", "Not specified")
-
-    # Format competitors as current solutions context
-    if competitors:
-        competitor_list = ", ".join([c.get("name", "Unknown") for c in competitors if c.get("name")])
-        current_solutions = f"Competitors: {competitor_list}" if competitor_list else "Not specified"
-    else:
-        current_solutions = pillars.get("current_solutions", "Not specified")
+    core_problem = summary.core_problem or "Not specified"
+    pain_point = summary.pain_point or "Not specified"
+    target_audience = summary.target_audience or "Not specified"
+    current_solutions = summary.current_solutions or "Not specified"
 
     # Features context
     feature_list = ""
-    if isinstance(features_summary, dict) and "features" in features_summary:
-        for f in features_summary["features"]:
-            title = f.get("title", "")
-            subs = f.get("subFeatures", [])
-            feature_list += f"\n### {title}\n"
-            for sub in subs:
-                feature_list += f"- {sub}\n"
-    elif isinstance(features_summary, list):
-        for f in features_summary:
-            title = f.get("title", str(f)) if isinstance(f, dict) else str(f)
-            feature_list += f"- {title}\n"
+    for f in summary.features:
+        feature_list += f"\n### {f.title}\n"
+        for sub in f.sub_features:
+            feature_list += f"- {sub}\n"
 
     # Complementary features
-    comp_features = design.get("complementary_features", [])
+    comp_features = summary.complementary_features
     comp_list = "\n".join(f"- {cf}" for cf in comp_features) if comp_features else "None specified"
 
     # Design context
-    theme = design.get("theme", "Not specified")
-    palette = design.get("palette", {})
-    palette_name = palette.get("name", "Custom") if isinstance(palette, dict) else "Custom"
-    palette_colors = palette.get("colors", []) if isinstance(palette, dict) else []
-    color_str = ", ".join(palette_colors) if palette_colors else "Not specified"
-    design_style = design.get("design_style", "Not specified")
-    design_guidelines = design.get("design_guidelines", [])
+    theme = summary.theme or "Not specified"
+    palette_name = summary.palette_name or "Custom"
+    color_str = ", ".join(summary.palette_colors) or "Not specified"
+    design_style = summary.design_style or "Not specified"
+    design_guidelines = summary.design_guidelines
     guidelines_str = "\n".join(f"- {g}" for g in design_guidelines) if design_guidelines else "None specified"
 
     # Tech stack context
-    tech_stack = design.get("tech_stack", {})
-    if isinstance(tech_stack, str):
-        tech_stack = json.loads(tech_stack)
-    tech_frontend = ", ".join(tech_stack.get("frontend", [])) if isinstance(tech_stack, dict) else "Not specified"
-    tech_backend = ", ".join(tech_stack.get("backend", [])) if isinstance(tech_stack, dict) else "Not specified"
-    tech_database = ", ".join(tech_stack.get("database", [])) if isinstance(tech_stack, dict) else "Not specified"
+    tech_stack = summary.tech_stack
+    tech_frontend = ", ".join(tech_stack.frontend) if tech_stack else "Not specified"
+    tech_backend = ", ".join(tech_stack.backend) if tech_stack else "Not specified"
+    tech_database = ", ".join(tech_stack.database) if tech_stack else "Not specified"
 
     prompt = f"""You are writing a comprehensive Product Requirements Document (PRD) for **{project_name}**.
 
@@ -534,8 +780,9 @@ Write in clear, professional Markdown. Use headers, bullets, and bold text for s
 def generate_prd_content(prompt: str) -> str:
     """Generate PRD content via a single GPT-4o call."""
     try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
+        response = llm.complete(
+            "prd",
+            model=model_router.model("prd"),
             messages=[
                 {"role": "system", "content": "You are an expert product manager and technical architect. Generate comprehensive, detailed PRD documents in Markdown format."},
                 {"role": "user", "content": prompt}
@@ -548,45 +795,33 @@ def generate_prd_content(prompt: str) -> str:
         raise Exception(f"PRD generation failed: {str(e)}")
 
 
-def generate_section_content(prompt: str, max_tokens: int = 1000) -> str:
-    """Generate a single PRD section via GPT-4o."""
-    response = openai_client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": "You are an expert product manager. Generate concise PRD sections in clean Markdown. Use only headings (##, ###, ####), bullet lists, and bold text. Never use tables, code blocks, or horizontal rules. Keep descriptions brief — no filler, no verbose schema definitions. Target agentic coding tools."},
-            {"role": "user", "content": prompt}
-        ],
+PRD_SECTION_SYSTEM_PROMPT = "You are an expert product manager. Generate concise PRD sections in clean Markdown. Use only headings (##, ###, ####), bullet lists, and bold text. Never use tables, code blocks, or horizontal rules. Keep descriptions brief — no filler, no verbose schema definitions. Target agentic coding tools."
+
+def build_section_messages(prompt: str) -> List[Dict]:
+    return [
+        {"role": "system", "content": PRD_SECTION_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+def generate_section_content(prompt: str, site: str, max_tokens: int = 1000) -> str:
+    """Generate a single PRD section (site: prd_section_1 .. prd_section_4)."""
+    response = llm.complete(
+        "prd_section",
+        site=site,
+        model=model_router.model(site),
+        messages=build_section_messages(prompt),
         temperature=0.5,
         max_tokens=max_tokens
     )
     return response.choices[0].message.content
 
 
-def generate_section1_prompt(phase_summaries: Dict, project_name: str) -> str:
+def generate_section1_prompt(summary: DiscoverySummary, project_name: str) -> str:
     """Build prompt for Section 1: Product Overview (uses Phase 1 ideation data)."""
-    ideation = phase_summaries.get("1", {})
-    if isinstance(ideation, str):
-        ideation = json.loads(ideation)
-
-    # Handle both new format (pillars nested) and legacy format (flat)
-    if "pillars" in ideation:
-        pillars = ideation.get("pillars", {})
-        competitors = ideation.get("competitors", [])
-    else:
-        # Legacy format
-        pillars = ideation
-        competitors = []
-
-    core_problem = pillars.get("core_problem", "Not specified")
-    pain_point = pillars.get("pain_point", "Not specified")
-    target_audience = pillars.get("target_audience", "Not specified")
-
-    # Format competitors as current solutions context
-    if competitors:
-        competitor_list = ", ".join([c.get("name", "Unknown") for c in competitors if c.get("name")])
-        current_solutions = f"Competitors: {competitor_list}" if competitor_list else "Not specified"
-    else:
-        current_solutions = pillars.get("current_solutions", "Not specified")
+    core_problem = summary.core_problem or "Not specified"
+    pain_point = summary.pain_point or "Not specified"
+    target_audience = summary.target_audience or "Not specified"
+    current_solutions = summary.current_solutions or "Not specified"
 
     return f"""Generate **Section 1: Product Overview** for **{project_name}**. Keep it concise.
 
@@ -613,39 +848,23 @@ Write in Markdown:
 Be specific. No filler. No tables or code blocks — use only headings, bullets, and bold."""
 
 
-def generate_section2_prompt(phase_summaries: Dict, mindmap_data: Dict, project_name: str) -> str:
+def generate_section2_prompt(summary: DiscoverySummary, project_name: str) -> str:
     """Build prompt for Section 2: System Map (uses Phase 1-3 data)."""
-    ideation = phase_summaries.get("1", {})
-    if isinstance(ideation, str):
-        ideation = json.loads(ideation)
-    features_summary = phase_summaries.get("2", {})
-    if isinstance(features_summary, str):
-        features_summary = json.loads(features_summary)
-    design = phase_summaries.get("3", {})
-    if isinstance(design, str):
-        design = json.loads(design)
-
     # Build feature list
     feature_list = ""
-    if isinstance(features_summary, dict) and "features" in features_summary:
-        for f in features_summary["features"]:
-            title = f.get("title", "")
-            subs = f.get("subFeatures", [])
-            feature_list += f"\n- **{title}**: {', '.join(subs[:3])}"
-    elif isinstance(features_summary, list):
-        for f in features_summary:
-            title = f.get("title", str(f)) if isinstance(f, dict) else str(f)
-            feature_list += f"\n- {title}"
-
-    comp_features = design.get("complementary_features", [])
+    for f in summary.features:
+        if f.sub_features:
+            feature_list += f"\n- **{f.title}**: {', '.join(f.sub_features[:3])}"
+        else:
+            feature_list += f"\n- {f.title}"
+
+    comp_features = summary.complementary_features
     comp_list = ", ".join(comp_features) if comp_features else "None"
 
-    tech_stack = design.get("tech_stack", {}) or mindmap_data.get("tech_stack", {})
-    if isinstance(tech_stack, str):
-        tech_stack = json.loads(tech_stack)
-    tech_frontend = ", ".join(tech_stack.get("frontend", [])) if isinstance(tech_stack, dict) else "React + Vite"
-    tech_backend = ", ".join(tech_stack.get("backend", [])) if isinstance(tech_stack, dict) else "Supabase"
-    tech_database = ", ".join(tech_stack.get("database", [])) if isinstance(tech_stack, dict) else "Supabase PostgreSQL"
+    tech_stack = summary.tech_stack
+    tech_frontend = ", ".join(tech_stack.frontend) if tech_stack else "React + Vite"
+    tech_backend = ", ".join(tech_stack.backend) if tech_stack else "Supabase"
+    tech_database = ", ".join(tech_stack.database) if tech_stack else "Supabase PostgreSQL"
 
     return f"""Generate **Section 2: System Map** for **{project_name}**. Keep it concise.
 
@@ -669,53 +888,31 @@ Write in Markdown:
 Keep it concise. No tables or code blocks — use only headings, bullets, and bold."""
 
 
-def generate_section3_prompt(phase_summaries: Dict, mindmap_data: Dict, project_name: str) -> str:
+def generate_section3_prompt(summary: DiscoverySummary, project_name: str) -> str:
     """Build prompt for Section 3: Feature Specifications (uses Phase 1-3 data)."""
-    ideation = phase_summaries.get("1", {})
-    if isinstance(ideation, str):
-        ideation = json.loads(ideation)
-    features_summary = phase_summaries.get("2", {})
-    if isinstance(features_summary, str):
-        features_summary = json.loads(features_summary)
-    design = phase_summaries.get("3", {})
-    if isinstance(design, str):
-        design = json.loads(design)
-
-    # Handle both new format (pillars nested) and legacy format (flat)
-    pillars = ideation.get("pillars", ideation) if isinstance(ideation, dict) else {}
-    core_problem = pillars.get("core_problem", "Not specified")
-    target_audience = pillars.get("target_audience", "Not specified")
+    core_problem = summary.core_problem or "Not specified"
+    target_audience = summary.target_audience or "Not specified"
 
     # Build detailed feature list with user flows
     feature_list = ""
-    if isinstance(features_summary, dict) and "features" in features_summary:
-        for i, f in enumerate(features_summary["features"], 1):
-            title = f.get("title", f"Feature {i}")
-            subs = f.get("subFeatures", [])
-            user_flow = f.get("userFlow", {})
-            steps = user_flow.get("steps", []) if isinstance(user_flow, dict) else []
-
-            feature_list += f"\n**Feature {i}: {title}**\n"
-            for sub in subs:
-                feature_list += f"  - {sub}\n"
-
-            if steps:
-                feature_list += f"\n  **User Flow:**\n"
-                for step in steps:
-                    actor = step.get("actor", "user") if isinstance(step, dict) else "user"
-                    action = step.get("action", str(step)) if isinstance(step, dict) else str(step)
-                    icon = "○" if actor == "user" else "◆"
-                    feature_list += f"    {icon} {action}\n"
-
-    comp_features = design.get("complementary_features", [])
+    for i, f in enumerate(summary.features, 1):
+        feature_list += f"\n**Feature {i}: {f.title}**\n"
+        for sub in f.sub_features:
+            feature_list += f"  - {sub}\n"
+
+        if f.user_flow:
+            feature_list += f"\n  **User Flow:**\n"
+            for step in f.user_flow:
+                icon = "○" if step.actor == "user" else "◆"
+                feature_list += f"    {icon} {step.action}\n"
+
+    comp_features = summary.complementary_features
     comp_list = "\n".join(f"- {cf}" for cf in comp_features) if comp_features else "None"
 
-    tech_stack = design.get("tech_stack", {}) or mindmap_data.get("tech_stack", {})
-    if isinstance(tech_stack, str):
-        tech_stack = json.loads(tech_stack)
-    tech_frontend = ", ".join(tech_stack.get("frontend", [])) if isinstance(tech_stack, dict) else "React"
-    tech_backend = ", ".join(tech_stack.get("backend", [])) if isinstance(tech_stack, dict) else "Supabase"
-    tech_database = ", ".join(tech_stack.get("database", [])) if isinstance(tech_stack, dict) else "Supabase PostgreSQL"
+    tech_stack = summary.tech_stack
+    tech_frontend = ", ".join(tech_stack.frontend) if tech_stack else "React"
+    tech_backend = ", ".join(tech_stack.backend) if tech_stack else "Supabase"
+    tech_database = ", ".join(tech_stack.database) if tech_stack else "Supabase PostgreSQL"
 
     return f"""Generate **Section 3: Feature Specifications** for **{project_name}**. Be concise — focus on what an AI coding agent needs to build each feature.
 
@@ -757,20 +954,14 @@ For EACH feature, use this structure:
 Core features first (P0), then complementary (P1). Be specific but concise. No tables or code blocks — use only headings, bullets, and bold."""
 
 
-def generate_section4_prompt(phase_summaries: Dict, mindmap_data: Dict, project_name: str) -> str:
+def generate_section4_prompt(summary: DiscoverySummary, project_name: str) -> str:
     """Build prompt for Section 4: Execution Guidance for Agents (uses ALL phase data)."""
-    design = phase_summaries.get("3", {})
-    if isinstance(design, str):
-        design = json.loads(design)
+    tech_stack = summary.tech_stack
+    tech_frontend = ", ".join(tech_stack.frontend) if tech_stack else "React + Vite"
+    tech_backend = ", ".join(tech_stack.backend) if tech_stack else "Supabase"
 
-    tech_stack = design.get("tech_stack", {}) or mindmap_data.get("tech_stack", {})
-    if isinstance(tech_stack, str):
-        tech_stack = json.loads(tech_stack)
-    tech_frontend = ", ".join(tech_stack.get("frontend", [])) if isinstance(tech_stack, dict) else "React + Vite"
-    tech_backend = ", ".join(tech_stack.get("backend", [])) if isinstance(tech_stack, dict) else "Supabase"
-
-    design_style = design.get("design_style", "Minimalist")
-    theme = design.get("theme", "light")
+    design_style = summary.design_style or "Minimalist"
+    theme = summary.theme or "light"
 
     return f"""Generate **Section 4: Execution Guidance for Agents** for **{project_name}**. Keep it concise.
 
@@ -799,82 +990,73 @@ Write in Markdown:
 Be prescriptive. No tables or code blocks — use only headings, bullets, and bold."""
 
 
+@traced("job.generate_prd_sections")
 def generate_prd_sections(project_id: str, completed_phase: int):
     """Background task: pre-generate PRD sections after a phase completes."""
+    set_project_attributes(project_id=project_id, phase=completed_phase)
+    bind_log_context(project_id=project_id, phase=completed_phase)
     try:
-        project_result = supabase.table("projects").select("*").eq("id", project_id).execute()
-        if not project_result.data:
+        project = fetch_project_state(project_id, ("name", "phase_summaries", "mindmap_data", "prd_draft"))
+        if project is None:
             return
-        project = project_result.data[0]
-
-        phase_summaries = project.get("phase_summaries") or {}
-        if isinstance(phase_summaries, str):
-            phase_summaries = json.loads(phase_summaries)
 
-        mindmap_data = project.get("mindmap_data") or {}
-        if isinstance(mindmap_data, str):
-            mindmap_data = json.loads(mindmap_data)
+        summary = project.summary
+        project_name = project.name
 
-        project_name = project.get("name", "Untitled Project")
-
-        prd_draft = project.get("prd_draft") or {}
-        if isinstance(prd_draft, str):
-            prd_draft = json.loads(prd_draft)
-        if not isinstance(prd_draft, dict):
-            prd_draft = {}
-        if "sections" not in prd_draft:
-            prd_draft["sections"] = {}
-        if "generated_phases" not in prd_draft:
-            prd_draft["generated_phases"] = []
+        prd_draft = project.prd_draft if isinstance(project.prd_draft, dict) else {}
+        generated_phases = list(prd_draft.get("generated_phases", []))
 
+        # Only the generated sections are sent — other sections written concurrently are kept
+        patches = []
         if completed_phase == 1:
-            prompt = generate_section1_prompt(phase_summaries, project_name)
-            content = generate_section_content(prompt, max_tokens=800)
-            prd_draft["sections"]["1"] = content
-            if 1 not in prd_draft["generated_phases"]:
-                prd_draft["generated_phases"].append(1)
+            prompt = generate_section1_prompt(summary, project_name)
+            content = generate_section_content(prompt, "prd_section_1", max_tokens=800)
+            patches.append(json_patch("prd_draft", ["sections", "1"], content))
 
         elif completed_phase == 3:
-            prompt2 = generate_section2_prompt(phase_summaries, mindmap_data, project_name)
-            content2 = generate_section_content(prompt2, max_tokens=1000)
-            prd_draft["sections"]["2"] = content2
-
-            prompt3 = generate_section3_prompt(phase_summaries, mindmap_data, project_name)
-            content3 = generate_section_content(prompt3, max_tokens=2500)
-            prd_draft["sections"]["3"] = content3
-
-            if 3 not in prd_draft["generated_phases"]:
-                prd_draft["generated_phases"].append(3)
+            prompt2 = generate_section2_prompt(summary, project_name)
+            content2 = generate_section_content(prompt2, "prd_section_2", max_tokens=1000)
+            patches.append(json_patch("prd_draft", ["sections", "2"], content2))
+
+            prompt3 = generate_section3_prompt(summary, project_name)
+            content3 = generate_section_content(prompt3, "prd_section_3", max_tokens=2500)
+            patches.append(json_patch("prd_draft", ["sections", "3"], content3))
+
+        if completed_phase not in generated_phases:
+            generated_phases.append(completed_phase)
+        patches.append(json_patch("prd_draft", ["generated_phases"], generated_phases))
+        patches.append(json_patch("prd_draft", ["last_updated"], datetime.utcnow().isoformat()))
+
+        patch_project_json(project_id, patches)
+        event_bus.publish(project_id, "section_ready", {
+            "phase": completed_phase,
+            "sections": [p["path"][1] for p in patches if p["path"][0] == "sections"],
+        })
 
-        prd_draft["last_updated"] = datetime.utcnow().isoformat()
+        log.debug("Generated PRD sections for phase %s", completed_phase)
 
-        supabase.table("projects").update({
-            "prd_draft": json.dumps(prd_draft)
-        }).eq("id", project_id).execute()
+    except Exception as e:
+        current_span().record_error(e)
+        log.exception("Generating PRD sections for phase %s failed", completed_phase)
 
-        print(f"[Background PRD] Successfully generated sections for phase {completed_phase}, project {project_id}")
 
-    except Exception as e:
-        print(f"[Background PRD] Error generating sections for {project_id} (phase {completed_phase}): {e}")
+def _feature_lines(summary: DiscoverySummary) -> List[str]:
+    """One "- Title: sub, sub" line per core feature (Phase 3 generator prompts)."""
+    lines = []
+    for f in summary.features:
+        if f.sub_features:
+            lines.append(f"- {f.title}: {', '.join(f.sub_features)}")
+        else:
+            lines.append(f"- {f.title}")
+    return lines
 
 
-def generate_tech_stack(phase_summaries: Dict, complementary_features: list, project_name: str, core_problem: str) -> Dict:
+def generate_tech_stack(summary: DiscoverySummary, complementary_features: list, project_name: str) -> Dict:
     """Generate a tech stack recommendation based on all features."""
-    # Gather core features from Phase 2
-    features_summary = phase_summaries.get("2", {})
-    if isinstance(features_summary, str):
-        features_summary = json.loads(features_summary)
+    core_problem = summary.core_problem or "the stated problem"
 
-    feature_list = ""
-    if isinstance(features_summary, dict) and "features" in features_summary:
-        for f in features_summary["features"]:
-            title = f.get("title", "")
-            subs = f.get("subFeatures", [])
-            feature_list += f"\n- {title}: {', '.join(subs)}"
-    elif isinstance(features_summary, list):
-        for f in features_summary:
-            title = f.get("title", str(f)) if isinstance(f, dict) else str(f)
-            feature_list += f"\n- {title}"
+    # Gather core features from Phase 2
+    feature_list = "".join(f"\n{line}" for line in _feature_lines(summary))
 
     comp_list = "\n".join(f"- {cf}" for cf in complementary_features) if complementary_features else "None"
 
@@ -897,24 +1079,19 @@ RULES:
 Return JSON with exactly this shape:
 {{"frontend": ["React", "Tailwind CSS", ...], "backend": ["Supabase Auth", "Supabase Realtime", ...], "database": ["PostgreSQL (via Supabase)", "Row Level Security", ...]}}"""
 
-    try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a senior technical architect. Return ONLY valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.5,
-            max_tokens=800,
-            response_format={"type": "json_object"}
-        )
-        raw = response.choices[0].message.content.strip()
-        result = json.loads(raw)
-        # Validate structure
-        if "frontend" in result and "backend" in result and "database" in result:
-            return result
-    except Exception:
-        pass
+    result = complete_json(
+        "tech_stack", "tech_stack",
+        [
+            {"role": "system", "content": "You are a senior technical architect. Return ONLY valid JSON."},
+            {"role": "user", "content": prompt}
+        ],
+        validate=lambda r: all(key in r for key in ("frontend", "backend", "database")),
+        cache=True,
+        temperature=0.5,
+        max_tokens=800,
+    )
+    if result is not None:
+        return result
 
     # Fallback
     return {
@@ -924,24 +1101,11 @@ Return JSON with exactly this shape:
     }
 
 
-def generate_security_checklist(phase_summaries: Dict, tech_stack: Dict, complementary_features: list, project_name: str) -> Dict:
+def generate_security_checklist(summary: DiscoverySummary, tech_stack: Dict, complementary_features: list, project_name: str) -> Dict:
     """Generate context-aware security requirements based on features and tech stack."""
 
     # Gather features from Phase 2
-    features_summary = phase_summaries.get("2", {})
-    if isinstance(features_summary, str):
-        features_summary = json.loads(features_summary)
-
-    feature_list = ""
-    if isinstance(features_summary, dict) and "features" in features_summary:
-        for f in features_summary["features"]:
-            title = f.get("title", "")
-            subs = f.get("subFeatures", [])
-            feature_list += f"\n- {title}: {', '.join(subs)}"
-    elif isinstance(features_summary, list):
-        for f in features_summary:
-            title = f.get("title", str(f)) if isinstance(f, dict) else str(f)
-            feature_list += f"\n- {title}"
+    feature_list = "".join(f"\n{line}" for line in _feature_lines(summary))
 
     comp_list = "\n".join(f"- {cf}" for cf in complementary_features) if complementary_features else "None"
 
@@ -1000,32 +1164,25 @@ Return JSON with exactly this shape:
         }
 
     try:
-        print(f"[Security] Generating security checklist for {project_name}")
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
+        result = complete_json(
+            "security", "security",
+            [
                 {"role": "system", "content": "You are a senior security architect. Return ONLY valid JSON."},
                 {"role": "user", "content": prompt}
             ],
+            validate=lambda r: all(isinstance(r.get(key), list) for key in ("frontend", "backend", "database")),
             temperature=0.4,
             max_tokens=800,
-            timeout=30,  # 30 second timeout
-            response_format={"type": "json_object"}
         )
-        raw = response.choices[0].message.content.strip()
-        print(f"[Security] AI response received: {raw[:200]}...")
-        result = json.loads(raw)
-
-        # Validate structure
-        if not all(key in result for key in ["frontend", "backend", "database"]):
-            print(f"[Security] Missing required keys in AI response, using fallback")
+        if result is None:
+            log.info("No valid security checklist from the LLM, using fallback")
             return get_fallback()
 
         # Validate each item has required fields
         for category in ["frontend", "backend", "database"]:
             items = result.get(category, [])
             if not isinstance(items, list):
-                print(f"[Security] Invalid {category} format, using fallback")
+                log.info("Invalid %s security checklist format, using fallback", category)
                 return get_fallback()
 
             validated_items = []
@@ -1045,27 +1202,22 @@ Return JSON with exactly this shape:
             if len(result[category]) == 0:
                 result[category] = fallback[category]
 
-        print(f"[Security] Successfully generated checklist with {len(result['frontend'])} frontend, {len(result['backend'])} backend, {len(result['database'])} database items")
+        log.debug("Generated security checklist", extra={"checklist_items": {k: len(result[k]) for k in ("frontend", "backend", "database")}})
         return result
 
     except Exception as e:
-        print(f"[Security] AI generation failed with error: {type(e).__name__}: {e}")
+        log.warning("Security checklist generation failed: %s: %s", type(e).__name__, e)
         return get_fallback()
 
 
-async def handle_phase3(request: ChatRequest, project: Dict, chat_history: List[Dict], background_tasks: BackgroundTasks = None) -> Dict:
+async def handle_phase3(request: ChatRequest, project: ProjectState, chat_history: List[Dict], background_tasks: BackgroundTasks = None) -> Dict:
     """Deterministic step controller for Phase 3 (MindMapping as Guided Flow)"""
     project_id = request.project_id
 
-    # Load existing mindmap_data
-    mindmap_data = project.get("mindmap_data") or {}
-    if isinstance(mindmap_data, str):
-        mindmap_data = json.loads(mindmap_data)
-
-    # Load phase summaries
-    phase_summaries = project.get("phase_summaries") or {}
-    if isinstance(phase_summaries, str):
-        phase_summaries = json.loads(phase_summaries)
+    # Parsed once per request by the project snapshot
+    mindmap_data = project.mindmap_data
+    phase_summaries = project.phase_summaries
+    summary = project.summary
 
     # Helper: save user message
     def save_user_msg(content):
@@ -1089,15 +1241,17 @@ async def handle_phase3(request: ChatRequest, project: Dict, chat_history: List[
         if metadata:
             msg_data["metadata"] = metadata
         supabase.table("messages").insert(msg_data).execute()
+        if metadata and metadata.get("options"):
+            event_bus.publish(project_id, "step_options_ready", {"step": metadata.get("step"), "metadata": metadata})
 
-    # Helper: update mindmap_data
-    def persist_mindmap(data):
-        supabase.table("projects").update({
-            "mindmap_data": json.dumps(data),
-            "updated_at": datetime.utcnow().isoformat()
-        }).eq("id", project_id).execute()
+    # Helper: set mindmap_data fields locally and patch only those keys in the DB
+    def persist_mindmap(**fields):
+        mindmap_data.update(fields)
+        patch_project_json(project_id, [json_patch("mindmap_data", [k], v) for k, v in fields.items()])
 
     step_data = request.step_data
+    set_project_attributes(step=step_data.get("step") if step_data else 0)
+    bind_log_context(step=step_data.get("step") if step_data else 0)
 
     # === No step_data: init Phase 3 / Step 1 (complementary features) ===
     if not step_data:
@@ -1106,22 +1260,10 @@ async def handle_phase3(request: ChatRequest, project: Dict, chat_history: List[
             save_user_msg(request.message)
 
         # Get features from phase_summaries["2"]
-        features_summary = phase_summaries.get("2", {})
-        feature_list = ""
-        if isinstance(features_summary, dict) and "features" in features_summary:
-            for f in features_summary["features"]:
-                title = f.get("title", "")
-                subs = ", ".join(f.get("subFeatures", []))
-                feature_list += f"- {title}: {subs}\n"
-        elif isinstance(features_summary, list):
-            for f in features_summary:
-                title = f.get("title", "") if isinstance(f, dict) else str(f)
-                feature_list += f"- {title}\n"
-
-        ideation = phase_summaries.get("1", {})
-        pillars = ideation.get("pillars", ideation) if isinstance(ideation, dict) else {}
-        target_audience = pillars.get("target_audience", "general users") if isinstance(pillars, dict) else "general users"
-        core_problem = pillars.get("core_problem", "the stated problem") if isinstance(pillars, dict) else "the stated problem"
+        feature_list = "".join(f"{line}\n" for line in _feature_lines(summary))
+
+        target_audience = summary.target_audience or "general users"
+        core_problem = summary.core_problem or "the stated problem"
         project_name = project.get("name", "the app")
 
         prompt = f"""Given these core features for a {project_name} app:
@@ -1138,7 +1280,8 @@ For each feature, provide a clear name and a brief 1-sentence description of wha
 
 Return as JSON: {{"features": ["Feature Name: One sentence explaining what this does and why it helps users", ...]}}"""
 
-        ai_result = get_ai_json_response(prompt)
+        ai_result = await asyncio.to_thread(get_ai_json_response, prompt, "complementary_features",
+                                            validate=lambda r: isinstance(r.get("features"), list))
         features = []
         if ai_result and "features" in ai_result:
             features = ai_result["features"][:5]
@@ -1158,8 +1301,7 @@ Return as JSON: {{"features": ["Feature Name: One sentence explaining what this
             desc = parts[1].strip() if len(parts) > 1 else ""
             options.append({"id": f"cf-{i+1}", "label": label, "description": desc})
 
-        mindmap_data["step"] = 1
-        persist_mindmap(mindmap_data)
+        persist_mindmap(step=1)
 
         intro = "Let's enhance your product with some complementary features! I've analyzed your core features and have some suggestions."
         metadata = {
@@ -1191,19 +1333,11 @@ Return as JSON: {{"features": ["Feature Name: One sentence explaining what this
     # === Step 1 response: save complementary features, create canvas node, show Step 2 (theme) ===
     if step_data.get("step") == 1:
         selections = step_data.get("selections", [])
-        save_user_msg(request.message)
-
-        mindmap_data["complementary_features"] = selections
-        mindmap_data["step"] = 2
-        persist_mindmap(mindmap_data)
 
         # Build comp features canvas node
-        canvas_state = json.loads(project["canvas_state"]) if project.get("canvas_state") else {"nodes": [], "edges": []}
-        root_node = next((n for n in canvas_state["nodes"] if n["id"] == "root"), None)
-        root_x = root_node["position"]["x"] if root_node else 400
-        root_y = root_node["position"]["y"] if root_node else 300
-        existing_feature_groups = [n for n in canvas_state["nodes"] if n.get("type") == "featureGroup"]
-        col = len(existing_feature_groups)
+        canvas = project.canvas
+        root_x, root_y = canvas.position("root")
+        col = canvas.count_type("featureGroup")
         cf_x = root_x - 200 + col * 300
         cf_y = root_y + 180
 
@@ -1221,26 +1355,20 @@ Return as JSON: {{"features": ["Feature Name: One sentence explaining what this
             }
         }]
 
-        # Save canvas update to DB
-        if not any(n["id"] == "complementary-features" for n in canvas_state["nodes"]):
-            canvas_state["nodes"].append({
-                "id": "complementary-features",
-                "type": "complementaryFeatures",
-                "position": {"x": cf_x, "y": cf_y},
-                "data": {
-                    "label": "Complementary Features",
-                    "features": selections,
-                },
-            })
-            canvas_state["edges"].append({
-                "id": "root-complementary-features",
-                "source": "root",
-                "target": "complementary-features",
-                "sourceHandle": "bottom",
-                "type": "smoothstep",
-                "animated": False,
-                "style": {"stroke": "#D6D3D1", "strokeWidth": 1.5}
-            })
+        def add_complementary_features(graph: CanvasGraph) -> None:
+            graph.add_node(
+                "complementary-features", "complementaryFeatures", {"x": cf_x, "y": cf_y},
+                {"label": "Complementary Features", "features": selections},
+                parent_id="root",
+            )
+
+        # Save canvas update to DB (version-checked; re-applied if the canvas changed meanwhile).
+        # First, so a 409 leaves the step unanswered and a retry lands on step 1 again
+        add_complementary_features(canvas)
+        save_canvas_edits(project_id, canvas, project.canvas_version, add_complementary_features)
+
+        save_user_msg(request.message)
+        persist_mindmap(complementary_features=selections, step=2)
 
         intro = f"Great choices! You've selected {len(selections)} complementary feature{'s' if len(selections) != 1 else ''}. Now let's define the visual direction for your product."
         metadata = {
@@ -1256,11 +1384,6 @@ Return as JSON: {{"features": ["Feature Name: One sentence explaining what this
 
         save_assistant_msg(intro, metadata)
 
-        supabase.table("projects").update({
-            "canvas_state": json.dumps(canvas_state),
-            "updated_at": datetime.utcnow().isoformat()
-        }).eq("id", project_id).execute()
-
         return {
             "message": intro,
             "message_type": "single_select",
@@ -1274,18 +1397,14 @@ Return as JSON: {{"features": ["Feature Name: One sentence explaining what this
         selection = step_data.get("selection", "light")
         save_user_msg(request.message)
 
-        mindmap_data["theme"] = selection
-        mindmap_data["step"] = 3
-        persist_mindmap(mindmap_data)
+        persist_mindmap(theme=selection, step=3)
 
         project_name = project.get("name", "the app")
-        ideation = phase_summaries.get("1", {})
-        pillars = ideation.get("pillars", ideation) if isinstance(ideation, dict) else {}
-        core_problem = pillars.get("core_problem", "") if isinstance(pillars, dict) else ""
+        core_problem = summary.core_problem or ""
 
         # Tavily search for color palette inspiration
         search_query = f"best color palettes for {project_name} app {selection} theme UI design 2025"
-        search_results = web_search(search_query)
+        search_results = await asyncio.to_thread(web_search, search_query, site="color_palettes")
 
         prompt = f"""Based on this product:
 - Name: {project_name}
@@ -1303,7 +1422,8 @@ Return as JSON: {{"palettes": [
   ...
 ]}}"""
 
-        ai_result = get_ai_json_response(prompt)
+        ai_result = await asyncio.to_thread(get_ai_json_response, prompt, "color_palettes",
+                                            validate=lambda r: len(r.get("palettes", [])) >= 3)
         palettes = []
         if ai_result and "palettes" in ai_result:
             palettes = ai_result["palettes"][:3]
@@ -1354,9 +1474,7 @@ Return as JSON: {{"palettes": [
         selection = step_data.get("selection", {})
         save_user_msg(request.message)
 
-        mindmap_data["palette"] = selection
-        mindmap_data["step"] = 4
-        persist_mindmap(mindmap_data)
+        persist_mindmap(palette=selection, step=4)
 
         palette_name = selection.get("name", "Custom") if isinstance(selection, dict) else "Custom"
         theme = mindmap_data.get("theme", "light")
@@ -1375,7 +1493,9 @@ Return as JSON: {{"styles": [
   ...
 ]}}"""
 
-        ai_result = get_ai_json_response(prompt)
+        # Keyed only on theme, app name and palette — repeats across projects
+        ai_result = await asyncio.to_thread(get_ai_json_response, prompt, "design_styles",
+                                            validate=lambda r: len(r.get("styles", [])) >= 3, cache=True)
         styles = []
         if ai_result and "styles" in ai_result:
             styles = ai_result["styles"][:3]
@@ -1422,10 +1542,6 @@ Return as JSON: {{"styles": [
     # === Step 4 response: save style, generate design guidelines + tech stack, create System Map node ===
     if step_data.get("step") == 4:
         selection = step_data.get("selection", "Minimalist")
-        save_user_msg(request.message)
-
-        mindmap_data["design_style"] = selection
-        persist_mindmap(mindmap_data)
 
         comp_features = mindmap_data.get("complementary_features", [])
         theme = mindmap_data.get("theme", "light")
@@ -1449,7 +1565,9 @@ Keep each to 1 sentence. Use simple language.
 
 Return as JSON: {{"guidelines": ["Guideline 1", "Guideline 2", "Guideline 3"]}}"""
 
-        design_lang_result = get_ai_json_response(design_lang_prompt)
+        design_lang_result = await asyncio.to_thread(get_ai_json_response,
+            design_lang_prompt, "design_guidelines",
+            validate=lambda r: len(r.get("guidelines", [])) >= 3, cache=True)
         design_guidelines = []
         if design_lang_result and "guidelines" in design_lang_result:
             design_guidelines = design_lang_result["guidelines"][:3]
@@ -1459,26 +1577,13 @@ Return as JSON: {{"guidelines": ["Guideline 1", "Guideline 2", "Guideline 3"]}}"
                 "Layout: Card-based sections with consistent spacing and visual grouping",
                 "Interactions: Smooth transitions and subtle hover effects for responsive feel"
             ]
-        mindmap_data["design_guidelines"] = design_guidelines
-        persist_mindmap(mindmap_data)
 
         # Generate tech stack
-        ideation = phase_summaries.get("1", {})
-        if isinstance(ideation, str):
-            ideation = json.loads(ideation)
-        pillars = ideation.get("pillars", ideation) if isinstance(ideation, dict) else {}
-        core_problem = pillars.get("core_problem", "the stated problem") if isinstance(pillars, dict) else "the stated problem"
-
-        tech_stack = generate_tech_stack(phase_summaries, comp_features, project_name, core_problem)
-        mindmap_data["tech_stack"] = tech_stack
-        mindmap_data["step"] = 5
-        persist_mindmap(mindmap_data)
+        tech_stack = await asyncio.to_thread(generate_tech_stack, summary, comp_features, project_name)
 
         # Create System Map canvas node — positioned directly above root
-        canvas_state = json.loads(project["canvas_state"]) if project["canvas_state"] else {"nodes": [], "edges": []}
-        root_node = next((n for n in canvas_state["nodes"] if n["id"] == "root"), None)
-        root_x = root_node["position"]["x"] if root_node else 400
-        root_y = root_node["position"]["y"] if root_node else 300
+        canvas = project.canvas
+        root_x, root_y = canvas.position("root")
 
         sm_x = root_x
         sm_y = root_y - 520
@@ -1500,28 +1605,20 @@ Return as JSON: {{"guidelines": ["Guideline 1", "Guideline 2", "Guideline 3"]}}"
         }]
 
         # Persist System Map node to canvas_state in DB
-        if not any(n["id"] == "system-map" for n in canvas_state["nodes"]):
-            canvas_state["nodes"].append({
-                "id": "system-map",
-                "type": "systemMap",
-                "position": {"x": sm_x, "y": sm_y},
-                "data": {
-                    "label": "System Map",
-                    "frontend": tech_stack.get("frontend", []),
-                    "backend": tech_stack.get("backend", []),
-                    "database": tech_stack.get("database", []),
-                },
-            })
-            canvas_state["edges"].append({
-                "id": "root-system-map",
-                "source": "root",
-                "target": "system-map",
-                "sourceHandle": "top",
-                "targetHandle": "bottom",
-                "type": "smoothstep",
-                "animated": False,
-                "style": {"stroke": "#D6D3D1", "strokeWidth": 1.5}
-            })
+        system_map = canvas_updates[0]["node"]
+
+        def add_system_map(graph: CanvasGraph) -> None:
+            graph.add_node(
+                "system-map", "systemMap", system_map["position"], system_map["data"],
+                parent_id="root", source_handle="top", target_handle="bottom",
+            )
+
+        # Canvas first, so a 409 leaves the step unanswered and a retry lands on step 4 again
+        add_system_map(canvas)
+        save_canvas_edits(project_id, canvas, project.canvas_version, add_system_map)
+
+        save_user_msg(request.message)
+        persist_mindmap(design_style=selection, design_guidelines=design_guidelines, tech_stack=tech_stack, step=5)
 
         # Build chat message summarizing tech choices
         fe_str = ", ".join(tech_stack.get("frontend", []))
@@ -1535,15 +1632,10 @@ Return as JSON: {{"guidelines": ["Guideline 1", "Guideline 2", "Guideline 3"]}}"
 
         save_assistant_msg(tech_msg)
 
-        supabase.table("projects").update({
-            "canvas_state": json.dumps(canvas_state),
-            "updated_at": datetime.utcnow().isoformat()
-        }).eq("id", project_id).execute()
-
         # Background: pre-generate PRD Sections 2+3 (System Map + Feature Specs)
         # Triggered when tech stack node is created — runs while user finishes Phase 3
         if background_tasks:
-            background_tasks.add_task(generate_prd_sections, project_id, 3)
+            background_tasks.add_task(track_job("prd_sections", generate_prd_sections), project_id, 3)
 
         return {
             "message": tech_msg,
@@ -1567,28 +1659,27 @@ Return as JSON: {{"guidelines": ["Guideline 1", "Guideline 2", "Guideline 3"]}}"
         project_name = project.get("name", "the app")
 
         # Generate context-aware security checklist
-        security_checklist = generate_security_checklist(
-            phase_summaries,
+        security_checklist = await asyncio.to_thread(generate_security_checklist,
+            summary,
             tech_stack,
             comp_features,
             project_name
         )
 
-        # Log security checklist for debugging
-        print(f"[Step 5] Security checklist generated: frontend={len(security_checklist.get('frontend', []))}, backend={len(security_checklist.get('backend', []))}, database={len(security_checklist.get('database', []))} items")
+        log.debug("Step 5 security checklist ready", extra={
+            "checklist_items": {k: len(security_checklist.get(k, [])) for k in ("frontend", "backend", "database")},
+        })
 
-        summary = f"Your design blueprint is complete! Here's a summary:\n\n"
-        summary += f"**Complementary Features:** {', '.join(comp_features)}\n\n"
-        summary += f"**Theme:** {theme.capitalize()}\n\n"
-        summary += f"**Color Palette:** {palette_name}\n\n"
-        summary += f"**Design Style:** {design_style}\n\n"
-        summary += "I've added these to your canvas. Click **Continue to PRD Generation** when you're ready!"
+        summary_text = f"Your design blueprint is complete! Here's a summary:\n\n"
+        summary_text += f"**Complementary Features:** {', '.join(comp_features)}\n\n"
+        summary_text += f"**Theme:** {theme.capitalize()}\n\n"
+        summary_text += f"**Color Palette:** {palette_name}\n\n"
+        summary_text += f"**Design Style:** {design_style}\n\n"
+        summary_text += "I've added these to your canvas. Click **Continue to PRD Generation** when you're ready!"
 
         # Build canvas updates — UI Design node
-        canvas_state = json.loads(project["canvas_state"]) if project["canvas_state"] else {"nodes": [], "edges": []}
-        root_node = next((n for n in canvas_state["nodes"] if n["id"] == "root"), None)
-        root_x = root_node["position"]["x"] if root_node else 400
-        root_y = root_node["position"]["y"] if root_node else 300
+        canvas = project.canvas
+        root_x, root_y = canvas.position("root")
 
         canvas_updates = []
 
@@ -1634,8 +1725,6 @@ Return as JSON: {{"guidelines": ["Guideline 1", "Guideline 2", "Guideline 3"]}}"
             }
         })
 
-        save_assistant_msg(summary)
-
         # Save phase summary (now includes tech_stack and security_checklist)
         phase_summaries["3"] = {
             "complementary_features": comp_features,
@@ -1648,50 +1737,28 @@ Return as JSON: {{"guidelines": ["Guideline 1", "Guideline 2", "Guideline 3"]}}"
         }
 
         # Apply canvas updates to canvas_state
-        for update in canvas_updates:
-            if update["action"] == "add_node":
+        # Edge handles: UI Design hangs off root's left side, Security off System Map's right
+        handles = {"ui-design": ("left", "right"), "security": ("right", "left")}
+
+        def add_design_nodes(graph: CanvasGraph) -> None:
+            for update in canvas_updates:
                 node = update["node"]
-                if not any(n["id"] == node["id"] for n in canvas_state["nodes"]):
-                    canvas_state["nodes"].append({
-                        "id": node["id"],
-                        "type": node["type"],
-                        "position": node.get("position", {"x": 400, "y": 300}),
-                        "data": node["data"],
-                    })
-                    if node.get("parentId"):
-                        # Determine handle positions based on node type
-                        if node["id"] == "ui-design":
-                            source_handle = "left"
-                            target_handle = "right"
-                        elif node["id"] == "security":
-                            source_handle = "right"
-                            target_handle = "left"
-                        else:
-                            source_handle = "bottom"
-                            target_handle = None
-
-                        edge = {
-                            "id": f"{node['parentId']}-{node['id']}",
-                            "source": node["parentId"],
-                            "target": node["id"],
-                            "sourceHandle": source_handle,
-                            "type": "smoothstep",
-                            "animated": False,
-                            "style": {"stroke": "#D6D3D1", "strokeWidth": 1.5}
-                        }
-                        if target_handle:
-                            edge["targetHandle"] = target_handle
-                        canvas_state["edges"].append(edge)
+                source_handle, target_handle = handles.get(node["id"], ("bottom", None))
+                graph.add_node(
+                    node["id"], node["type"], node["position"], node["data"],
+                    parent_id=node.get("parentId"), source_handle=source_handle, target_handle=target_handle,
+                )
 
         # Save phase summary + canvas but do NOT advance phase — user clicks Continue
-        supabase.table("projects").update({
-            "phase_summaries": json.dumps(phase_summaries),
-            "canvas_state": json.dumps(canvas_state),
-            "updated_at": datetime.utcnow().isoformat()
-        }).eq("id", project_id).execute()
+        add_design_nodes(canvas)
+        save_canvas_edits(project_id, canvas, project.canvas_version, add_design_nodes)
+        # Only phase_summaries["3"] is written, so summaries saved concurrently are kept
+        patch_project_json(project_id, [json_patch("phase_summaries", ["3"], phase_summaries["3"])])
+
+        save_assistant_msg(summary_text)
 
         return {
-            "message": summary,
+            "message": summary_text,
             "message_type": "text",
             "mindmap_complete": True,
             "mindmap_step": 5,
@@ -1705,15 +1772,54 @@ Return as JSON: {{"guidelines": ["Guideline 1", "Guideline 2", "Guideline 3"]}}"
 # API Routes
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", "llm_cache": llm_cache.stats()}
+
+# Bearer token Prometheus must send to /api/metrics; unset = open (keep it off the public proxy)
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+@app.get("/api/metrics")
+async def get_metrics(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)):
+    """This worker's metrics in the Prometheus text format."""
+    if METRICS_TOKEN and (not credentials or not hmac.compare_digest(credentials.credentials, METRICS_TOKEN)):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+MAX_PROJECTS_PAGE = 100
 
 @app.get("/api/projects")
-async def list_projects(user_id: str = Depends(get_current_user)):
-    """List all projects for the authenticated user"""
+async def list_projects(limit: Optional[int] = None, cursor: Optional[str] = None,
+                        user_id: str = Depends(get_current_user)):
+    """List projects for the authenticated user, most recently updated first.
+
+    With limit, returns one page plus next_cursor (None on the last page);
+    pass it back as cursor for the next page. Without limit, returns everything.
+    """
     try:
-        result = supabase.table("projects").select("id, name, phase, created_at, updated_at").eq("user_id", user_id).order("updated_at", desc=True).order("created_at", desc=True).execute()
-        projects = result.data or []
-        return {"projects": projects}
+        query = (supabase.table("projects").select(PROJECT_LIST_COLUMNS)
+                 .eq("user_id", user_id).is_("deleted_at", "null"))
+
+        if cursor:
+            position = decode_project_cursor(cursor)
+            if position is None:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            updated_at, last_id = position
+            # Keyset: rows strictly after (updated_at, id) in descending order
+            query = query.or_(f'updated_at.lt."{updated_at}",and(updated_at.eq."{updated_at}",id.lt.{last_id})')
+
+        query = query.order("updated_at", desc=True).order("id", desc=True)
+        if limit is not None:
+            limit = max(1, min(limit, MAX_PROJECTS_PAGE))
+            query = query.limit(limit + 1)  # one extra row tells us whether there's a next page
+
+        projects = query.execute().data or []
+
+        next_cursor = None
+        if limit is not None and len(projects) > limit:
+            projects = projects[:limit]
+            next_cursor = encode_project_cursor(projects[-1])
+        return {"projects": projects, "next_cursor": next_cursor}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1730,7 +1836,7 @@ async def create_project(project: ProjectCreate, user_id: str = Depends(get_curr
             "phase": 1,
             "user_id": user_id,
             "created_at": datetime.utcnow().isoformat(),
-            "canvas_state": json.dumps({
+            "canvas_state": {
                 "nodes": [
                     {
                         "id": "root",
@@ -1740,7 +1846,7 @@ async def create_project(project: ProjectCreate, user_id: str = Depends(get_curr
                     }
                 ],
                 "edges": []
-            })
+            }
         }).execute()
 
         return {"project_id": project_id, "name": project.name}
@@ -1748,30 +1854,109 @@ async def create_project(project: ProjectCreate, user_id: str = Depends(get_curr
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/projects/{project_id}")
-async def get_project(project_id: str, user_id: str = Depends(get_current_user)):
+async def get_project(project_id: str, http_request: Request, user_id: str = Depends(get_current_user)):
     """Get project details with current-phase messages"""
     try:
-        project = await verify_project_ownership(project_id, user_id)
-        current_phase = project["phase"]
+        # updated_at changes on every project write, including new messages (message_count trigger)
+        project = await load_project(project_id, user_id)
+        etag = make_etag("project", project_id, project.get("updated_at"))
+        if etag_matches(http_request, etag):
+            return not_modified(etag)
+
+        current_phase = project.phase
 
         # Get chat history for current phase only
         chat_result = supabase.table("messages").select("*").eq("project_id", project_id).eq("phase", current_phase).order("created_at").execute()
         messages = chat_result.data if chat_result.data else []
 
-        return {
-            "project": project,
+        return json_with_etag({
+            "project": project.to_dict(),
             "messages": messages
-        }
+        }, etag)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+WORKSPACE_FIELDS = ("project", "messages", "canvas", "documents", "prd")
+MAX_WORKSPACE_MESSAGES = 500
+
+@app.get("/api/projects/{project_id}/workspace")
+async def get_workspace(project_id: str, fields: Optional[str] = None, messages_limit: int = 200,
+                        user_id: str = Depends(get_current_user)):
+    """Everything the workspace needs to open a project, in one round trip.
+
+    fields: comma-separated subset of project, messages, canvas, documents, prd (default: all).
+    messages is the newest messages_limit messages of the current phase, oldest first.
+    """
+    try:
+        wanted = set(WORKSPACE_FIELDS) if not fields else {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = wanted - set(WORKSPACE_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        messages_limit = max(1, min(messages_limit, MAX_WORKSPACE_MESSAGES))
+
+        columns = ["phase"]
+        if "project" in wanted:
+            columns += [c for c in PROJECT_DETAIL_COLUMNS if c != "canvas_state"]
+        if "canvas" in wanted:
+            columns.append("canvas_state")
+
+        def fetch_documents():
+            return supabase.table("documents").select("*").eq("project_id", project_id).execute().data or []
+
+        def fetch_messages(phase=None):
+            # Newest first so the limit keeps the most recent messages
+            query = supabase.table("messages").select("*").eq("project_id", project_id)
+            if phase is not None:
+                query = query.eq("phase", phase)
+            return query.order("created_at", desc=True).limit(messages_limit + 1).execute().data or []
+
+        # The documents and messages queries don't depend on the project row, so they run
+        # alongside it; their results are discarded if the ownership check fails. The
+        # phase isn't known yet, so messages are read across phases and filtered below.
+        need_documents = bool(wanted & {"documents", "prd"})
+        need_messages = "messages" in wanted
+        project, documents, recent_messages = await asyncio.gather(
+            asyncio.to_thread(fetch_project_state, project_id, columns),
+            asyncio.to_thread(fetch_documents) if need_documents else asyncio.sleep(0, []),
+            asyncio.to_thread(fetch_messages) if need_messages else asyncio.sleep(0, []),
+        )
+        project = owned_project(project_id, project, user_id)
+
+        response = {}
+        if "project" in wanted:
+            response["project"] = {k: v for k, v in project.to_dict().items() if k not in ("canvas_state", "canvas_version")}
+        if "canvas" in wanted:
+            response["canvas"] = {**project.canvas_state, "canvas_version": project.canvas_version}
+        if "documents" in wanted:
+            response["documents"] = documents
+        if "prd" in wanted:
+            prd_doc = next((d for d in documents if d.get("doc_type") == "prd"), None)
+            response["prd"] = {"generated": prd_doc is not None, "document": prd_doc}
+
+        if need_messages:
+            rows = [m for m in recent_messages if m.get("phase") == project.phase]
+            if len(recent_messages) > messages_limit and len(rows) <= messages_limit:
+                # Newer messages from other phases filled the page; ask for this phase only
+                rows = await asyncio.to_thread(fetch_messages, project.phase)
+            response["messages_has_more"] = len(rows) > messages_limit
+            response["messages"] = list(reversed(rows[:messages_limit]))
+
+        return response
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/chat")
-async def chat(request: ChatRequest, background_tasks: BackgroundTasks, user_id: str = Depends(get_current_user)):
+async def chat(request: ChatRequest, background_tasks: BackgroundTasks, user_id: str = Depends(require_llm_quota)):
     """Handle chat messages"""
+    set_usage_scope(project_id=request.project_id, phase=request.phase)
     try:
-        project = await verify_project_ownership(request.project_id, user_id)
+        project = await load_project(request.project_id, user_id, (
+            "name", "phase", "canvas_state", "phase_summaries", "mindmap_data",
+        ))
 
         # Get chat history filtered by phase
         chat_result = supabase.table("messages").select("*").eq("project_id", request.project_id).eq("phase", request.phase).order("created_at").execute()
@@ -1797,7 +1982,7 @@ async def chat(request: ChatRequest, background_tasks: BackgroundTasks, user_id:
 
         # Explicit user search request
         if "research" in request.message.lower() or "search" in request.message.lower():
-            search_results = web_search(request.message)
+            search_results = await asyncio.to_thread(web_search, request.message, site="chat_research")
             context_note = f"\n\n[Web Search Results]:\n{search_results}"
             chat_history.append({"role": "system", "content": context_note})
             search_triggered = True
@@ -1818,7 +2003,7 @@ async def chat(request: ChatRequest, background_tasks: BackgroundTasks, user_id:
                     # Build a search query from the project name + first user message (the idea)
                     first_user_msg = next((m["content"] for m in chat_history if m["role"] == "user"), "")
                     search_query = f"competitors alternatives to {first_user_msg[:120]}"
-                    search_results = web_search(search_query)
+                    search_results = await asyncio.to_thread(web_search, search_query, site="competitors")
                     if search_results and "No results found" not in search_results:
                         context_note = f"\n\n[Web Search Results - Competitor Research]:\n{search_results}"
                         chat_history.append({"role": "system", "content": context_note})
@@ -1832,15 +2017,10 @@ async def chat(request: ChatRequest, background_tasks: BackgroundTasks, user_id:
                 existing_searches = sum(1 for m in chat_history if m.get("role") == "system" and "[Web Search Results]" in m.get("content", ""))
                 if existing_searches < 2:
                     # Use ideation context for targeted search
-                    phase_summaries = project.get("phase_summaries") or {}
-                    if isinstance(phase_summaries, str):
-                        phase_summaries = json.loads(phase_summaries)
-                    ideation = phase_summaries.get("1", {})
-                    pillars = ideation.get("pillars", ideation) if isinstance(ideation, dict) else {}
-                    problem = pillars.get("core_problem", "") if isinstance(pillars, dict) else ""
-                    audience = pillars.get("target_audience", "") if isinstance(pillars, dict) else ""
+                    problem = project.summary.core_problem or ""
+                    audience = project.summary.target_audience or ""
                     search_query = f"top features for {problem[:80]} app for {audience[:60]}"
-                    search_results = web_search(search_query)
+                    search_results = await asyncio.to_thread(web_search, search_query, site="feature_research")
                     if search_results and "No results found" not in search_results:
                         context_note = f"\n\n[Web Search Results - Feature Research]:\n{search_results}"
                         chat_history.append({"role": "system", "content": context_note})
@@ -1853,31 +2033,8 @@ async def chat(request: ChatRequest, background_tasks: BackgroundTasks, user_id:
         if request.phase == 3:
             return await handle_phase3(request, project, chat_history, background_tasks)
 
-        # Build project context
-        project_context = {
-            "phase": project["phase"],
-            "canvas_state": json.loads(project["canvas_state"]) if project["canvas_state"] else None
-        }
-
-        # Inject phase summaries for phases > 1
-        if request.phase > 1:
-            phase_summaries = project.get("phase_summaries") or {}
-            if isinstance(phase_summaries, str):
-                phase_summaries = json.loads(phase_summaries)
-            # Always inject the immediate previous phase summary
-            prev_phase_key = str(request.phase - 1)
-            if prev_phase_key in phase_summaries:
-                project_context["previous_phase_summary"] = phase_summaries[prev_phase_key]
-            # For Phase 3+, inject ALL prior phase summaries so AI has full context
-            if request.phase >= 3:
-                all_summaries = {}
-                for k, v in phase_summaries.items():
-                    if int(k) < request.phase:
-                        all_summaries[k] = v
-                if all_summaries:
-                    project_context["all_phase_summaries"] = all_summaries
-
-        ai_response = get_ai_response(chat_history, request.phase, project_context)
+        project_context = build_chat_context(project, request.phase)
+        ai_response = await asyncio.to_thread(get_ai_response, chat_history, request.phase, project_context)
 
         # Check for canvas updates in AI response
         canvas_updates = []
@@ -2001,9 +2158,7 @@ async def chat(request: ChatRequest, background_tasks: BackgroundTasks, user_id:
                     features_parsed.append(current_feature)
 
                 if features_parsed:
-                    canvas_state_raw = project.get("canvas_state")
-                    existing_canvas = json.loads(canvas_state_raw) if canvas_state_raw else {"nodes": [], "edges": []}
-                    existing_feature_count = sum(1 for n in existing_canvas.get("nodes", []) if n.get("type") == "featureGroup")
+                    existing_feature_count = project.canvas.count_type("featureGroup")
 
                     for i, feat in enumerate(features_parsed):
                         feature_id = f"feature-{existing_feature_count + i + 1}"
@@ -2040,6 +2195,9 @@ async def chat(request: ChatRequest, background_tasks: BackgroundTasks, user_id:
             except Exception:
                 pass
 
+        # Every project-level change from this turn goes out in a single write below
+        project_update = {}
+
         # Extract [IDEATION_COMPLETE] tag
         ideation_complete = False
         ideation_data = None
@@ -2055,9 +2213,7 @@ async def chat(request: ChatRequest, background_tasks: BackgroundTasks, user_id:
                 cleaned_response = cleaned_response[:ic_start] + cleaned_response[ic_end:]
 
                 # Persist ideation_pillars to project for refresh recovery
-                supabase.table("projects").update({
-                    "ideation_pillars": json.dumps(ideation_data)
-                }).eq("id", request.project_id).execute()
+                project_update["ideation_pillars"] = ideation_data
             except (ValueError, json.JSONDecodeError):
                 pass
 
@@ -2073,9 +2229,7 @@ async def chat(request: ChatRequest, background_tasks: BackgroundTasks, user_id:
                 features_complete = True
                 cleaned_response = cleaned_response[:fc_start] + cleaned_response[fc_end:]
                 # Persist for refresh recovery
-                supabase.table("projects").update({
-                    "feature_data": json.dumps(feature_data)
-                }).eq("id", request.project_id).execute()
+                project_update["feature_data"] = feature_data
             except (ValueError, json.JSONDecodeError):
                 pass
 
@@ -2088,11 +2242,20 @@ async def chat(request: ChatRequest, background_tasks: BackgroundTasks, user_id:
             ai_response = ai_response.replace("[PHASE_COMPLETE]", "").strip()
             if request.phase not in (1, 2, 3):
                 # Auto-advance for phases 4+
-                supabase.table("projects").update({"phase": project["phase"] + 1}).eq("id", request.project_id).execute()
+                project_update["phase"] = project.phase + 1
             else:
                 # Phase 1, 2 & 3: do NOT auto-advance via [PHASE_COMPLETE] tag
                 phase_complete = False
 
+        # Apply canvas updates here so the canvas is saved even if the client
+        # navigates away before its debounced save fires. Saved before the reply,
+        # so a 409 doesn't leave a message whose canvas updates were never applied
+        canvas_state, canvas_version = None, None
+        if canvas_updates and apply_chat_canvas_updates(project.canvas, canvas_updates):
+            canvas_state, canvas_version = save_chat_canvas(
+                request.project_id, project.canvas, project.canvas_version, canvas_updates
+            )
+
         # Save AI message with phase
         supabase.table("messages").insert({
             "project_id": request.project_id,
@@ -2102,10 +2265,9 @@ async def chat(request: ChatRequest, background_tasks: BackgroundTasks, user_id:
             "created_at": datetime.utcnow().isoformat()
         }).execute()
 
-        # Touch updated_at on the project
-        supabase.table("projects").update({
-            "updated_at": datetime.utcnow().isoformat()
-        }).eq("id", request.project_id).execute()
+        # Pillars / features / phase, and touches updated_at on the project
+        project_update["updated_at"] = datetime.utcnow().isoformat()
+        supabase.table("projects").update(project_update).eq("id", request.project_id).execute()
 
         response_data = {
             "message": ai_response,
@@ -2113,6 +2275,10 @@ async def chat(request: ChatRequest, background_tasks: BackgroundTasks, user_id:
             "canvas_updates": canvas_updates
         }
 
+        if canvas_state is not None:
+            response_data["canvas_state"] = canvas_state
+            response_data["canvas_version"] = canvas_version
+
         if ideation_complete:
             response_data["ideation_complete"] = True
             response_data["ideation_data"] = ideation_data
@@ -2122,33 +2288,39 @@ async def chat(request: ChatRequest, background_tasks: BackgroundTasks, user_id:
             response_data["feature_data"] = feature_data
 
         return response_data
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/projects/{project_id}/advance-phase")
-async def advance_phase(project_id: str, request: AdvancePhaseRequest, background_tasks: BackgroundTasks, user_id: str = Depends(get_current_user)):
+async def advance_phase(project_id: str, request: AdvancePhaseRequest, background_tasks: BackgroundTasks, user_id: str = Depends(require_llm_quota)):
     """Manually advance to the next phase (Phase 1->2 or Phase 2->3)"""
+    set_usage_scope(project_id=project_id, phase=request.current_phase)
     try:
-        project = await verify_project_ownership(project_id, user_id)
+        project = await load_project(project_id, user_id, (
+            "phase", "canvas_state", "phase_summaries", "ideation_pillars", "feature_data",
+        ))
 
-        if project["phase"] != request.current_phase:
+        if project.phase != request.current_phase:
             raise HTTPException(status_code=400, detail="Phase mismatch")
 
-        phase_summaries = project.get("phase_summaries") or {}
-        if isinstance(phase_summaries, str):
-            phase_summaries = json.loads(phase_summaries)
-
-        canvas_state = json.loads(project["canvas_state"]) if project["canvas_state"] else {"nodes": [], "edges": []}
+        phase_summaries = project.phase_summaries
+        canvas = project.canvas
         current = request.current_phase
+        # Field-level edits of phase_summaries, applied with the phase change
+        patches = []
+        # Only Phase 1→2 adds canvas nodes; the other transitions leave the canvas alone
+        canvas_state, canvas_version = project.canvas_state, project.canvas_version
 
         if current == 1:
             # Phase 1→2: Ideation to Feature Mapping
             ideation_data = request.ideation_data
             if not ideation_data and project.get("ideation_pillars"):
-                stored = project["ideation_pillars"]
-                ideation_data = json.loads(stored) if isinstance(stored, str) else stored
+                ideation_data = project.ideation_pillars
 
             phase_summaries["1"] = ideation_data
+            patches.append(json_patch("phase_summaries", ["1"], ideation_data))
 
             # Extract pillars and competitors from new format (or use legacy format)
             # New format: {"pillars": {...}, "competitors": [...]}
@@ -2161,62 +2333,37 @@ async def advance_phase(project_id: str, request: AdvancePhaseRequest, backgroun
                 pillars_data = ideation_data or {}
                 competitors_data = []
 
-            # Find root node position
-            root_node = next((n for n in canvas_state["nodes"] if n["id"] == "root"), None)
-            root_x = root_node["position"]["x"] if root_node else 400
-            root_y = root_node["position"]["y"] if root_node else 300
+            has_valid_competitors = competitors_data and isinstance(competitors_data, list) and len(competitors_data) > 0
 
-            # Check if ideation node already exists
-            existing_ideation = next((n for n in canvas_state["nodes"] if n["id"] == "ideation"), None)
+            def add_ideation_nodes(graph: CanvasGraph) -> None:
+                # Find root node position
+                root_x, root_y = graph.position("root")
+
+                if "ideation" in graph:
+                    # Use existing ideation position
+                    ideation_x, ideation_y = graph.position("ideation")
+                else:
+                    # Calculate new ideation position from root
+                    ideation_x = root_x + 318
+                    ideation_y = root_y - 192  # Moved down 72px from original -264
+
+                    graph.add_node(
+                        "ideation", "ideation", {"x": ideation_x, "y": ideation_y},
+                        {"label": "Ideation", "pillars": pillars_data},
+                        parent_id="root", source_handle="right",
+                    )
 
-            if existing_ideation:
-                # Use existing ideation position
-                ideation_x = existing_ideation["position"]["x"]
-                ideation_y = existing_ideation["position"]["y"]
-            else:
-                # Calculate new ideation position from root
-                ideation_x = root_x + 318
-                ideation_y = root_y - 192  # Moved down 72px from original -264
-
-                canvas_state["nodes"].append({
-                    "id": "ideation",
-                    "type": "ideation",
-                    "position": {"x": ideation_x, "y": ideation_y},
-                    "data": {
-                        "label": "Ideation",
-                        "pillars": pillars_data
-                    }
-                })
-                canvas_state["edges"].append({
-                    "id": "root-ideation",
-                    "source": "root",
-                    "target": "ideation",
-                    "sourceHandle": "right",
-                    "type": "smoothstep",
-                    "animated": False,
-                    "style": {"stroke": "#D6D3D1", "strokeWidth": 1.5}
-                })
-
-            # Add competitors node if not already present and we have valid competitors data
-            has_valid_competitors = competitors_data and isinstance(competitors_data, list) and len(competitors_data) > 0
-            if not any(n["id"] == "competitors" for n in canvas_state["nodes"]) and has_valid_competitors:
-                canvas_state["nodes"].append({
-                    "id": "competitors",
-                    "type": "competitors",
-                    "position": {"x": ideation_x + 432, "y": ideation_y},
-                    "data": {
-                        "competitors": competitors_data
-                    }
-                })
-                canvas_state["edges"].append({
-                    "id": "ideation-competitors",
-                    "source": "ideation",
-                    "target": "competitors",
-                    "sourceHandle": "right",
-                    "type": "smoothstep",
-                    "animated": False,
-                    "style": {"stroke": "#D6D3D1", "strokeWidth": 1.5}
-                })
+                # Add competitors node if not already present and we have valid competitors data
+                if has_valid_competitors:
+                    graph.add_node(
+                        "competitors", "competitors", {"x": ideation_x + 432, "y": ideation_y},
+                        {"competitors": competitors_data},
+                        parent_id="ideation", source_handle="right",
+                    )
+
+            # Version-checked, before anything else is written, so a conflict leaves the project as it was
+            add_ideation_nodes(canvas)
+            canvas_state, canvas_version = save_canvas_edits(project_id, canvas, project.canvas_version, add_ideation_nodes)
 
             # Create Phase 2 welcome message
             supabase.table("messages").insert({
@@ -2228,32 +2375,31 @@ async def advance_phase(project_id: str, request: AdvancePhaseRequest, backgroun
             }).execute()
 
             # Background: pre-generate PRD Section 1 (Product Overview) from ideation data
-            background_tasks.add_task(generate_prd_sections, project_id, 1)
+            background_tasks.add_task(track_job("prd_sections", generate_prd_sections), project_id, 1)
 
         elif current == 2:
             # Phase 2→3: Feature Mapping to MindMapping
             feature_data = request.ideation_data  # reuse field for feature data
             if not feature_data and project.get("feature_data"):
-                stored = project["feature_data"]
-                feature_data = json.loads(stored) if isinstance(stored, str) else stored
+                feature_data = project.feature_data
 
             # Extract userFlow data from canvas nodes and merge into feature_data
             if feature_data and isinstance(feature_data, dict) and "features" in feature_data:
-                for node in canvas_state.get("nodes", []):
-                    if node.get("type") == "userFlow":
-                        node_data = node.get("data", {})
-                        parent_feature_id = node_data.get("parentFeatureId", "")
-                        steps = node_data.get("steps", [])
-                        if parent_feature_id and steps:
-                            # Extract feature index from parent_feature_id (e.g., "feature-1" -> 0)
-                            try:
-                                feature_idx = int(parent_feature_id.split("-")[1]) - 1
-                                if 0 <= feature_idx < len(feature_data["features"]):
-                                    feature_data["features"][feature_idx]["userFlow"] = {"steps": steps}
-                            except (ValueError, IndexError):
-                                pass
+                for node in canvas.nodes_of_type("userFlow"):
+                    node_data = node.get("data", {})
+                    parent_feature_id = node_data.get("parentFeatureId", "")
+                    steps = node_data.get("steps", [])
+                    if parent_feature_id and steps:
+                        # Extract feature index from parent_feature_id (e.g., "feature-1" -> 0)
+                        try:
+                            feature_idx = int(parent_feature_id.split("-")[1]) - 1
+                            if 0 <= feature_idx < len(feature_data["features"]):
+                                feature_data["features"][feature_idx]["userFlow"] = {"steps": steps}
+                        except (ValueError, IndexError):
+                            pass
 
             phase_summaries["2"] = feature_data
+            patches.append(json_patch("phase_summaries", ["2"], feature_data))
 
             # Feature nodes should already be on canvas from UPDATE_CANVAS during chat
             # No new nodes to add here
@@ -2291,16 +2437,14 @@ async def advance_phase(project_id: str, request: AdvancePhaseRequest, backgroun
         new_phase = current + 1
 
         # Update project
-        supabase.table("projects").update({
-            "phase": new_phase,
-            "phase_summaries": json.dumps(phase_summaries),
-            "canvas_state": json.dumps(canvas_state)
-        }).eq("id", project_id).execute()
+        patch_project_json(project_id, patches)
+        supabase.table("projects").update({"phase": new_phase}).eq("id", project_id).execute()
 
         return {
             "success": True,
             "new_phase": new_phase,
-            "canvas_state": canvas_state
+            "canvas_state": canvas_state,
+            "canvas_version": canvas_version,
         }
     except HTTPException:
         raise
@@ -2308,12 +2452,15 @@ async def advance_phase(project_id: str, request: AdvancePhaseRequest, backgroun
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/projects/{project_id}/generate-prd")
-async def generate_prd(project_id: str, user_id: str = Depends(get_current_user)):
+async def generate_prd(project_id: str, user_id: str = Depends(require_llm_quota)):
     """Assemble PRD from pre-generated sections + generate Section 4 at assembly time."""
+    set_usage_scope(project_id=project_id, phase=4)
     try:
-        project = await verify_project_ownership(project_id, user_id)
+        project = await load_project(project_id, user_id, (
+            "name", "phase", "phase_summaries", "mindmap_data", "prd_draft",
+        ))
 
-        if project["phase"] != 4:
+        if project.phase != 4:
             raise HTTPException(status_code=400, detail="Project is not in Phase 4")
 
         # Idempotency: check if PRD already exists
@@ -2322,41 +2469,32 @@ async def generate_prd(project_id: str, user_id: str = Depends(get_current_user)
             return {"status": "already_exists", "message": "PRD already generated", "document": existing_docs.data[0]}
 
         # Load project data
-        phase_summaries = project.get("phase_summaries") or {}
-        if isinstance(phase_summaries, str):
-            phase_summaries = json.loads(phase_summaries)
-
-        mindmap_data = project.get("mindmap_data") or {}
-        if isinstance(mindmap_data, str):
-            mindmap_data = json.loads(mindmap_data)
-
-        project_name = project.get("name", "Untitled Project")
+        summary = project.summary
+        project_name = project.name
 
         # Load pre-generated sections from prd_draft
-        prd_draft = project.get("prd_draft") or {}
-        if isinstance(prd_draft, str):
-            prd_draft = json.loads(prd_draft)
+        prd_draft = project.prd_draft
         sections = prd_draft.get("sections", {})
 
         # Fallback: generate any missing sections inline
         if "1" not in sections:
-            print(f"[PRD Assembly] Section 1 missing for {project_id}, generating inline...")
-            prompt = generate_section1_prompt(phase_summaries, project_name)
-            sections["1"] = generate_section_content(prompt, max_tokens=800)
+            log.info("PRD section %s missing at assembly, generating inline", 1)
+            prompt = generate_section1_prompt(summary, project_name)
+            sections["1"] = await asyncio.to_thread(generate_section_content, prompt, "prd_section_1", max_tokens=800)
 
         if "2" not in sections:
-            print(f"[PRD Assembly] Section 2 missing for {project_id}, generating inline...")
-            prompt = generate_section2_prompt(phase_summaries, mindmap_data, project_name)
-            sections["2"] = generate_section_content(prompt, max_tokens=1000)
+            log.info("PRD section %s missing at assembly, generating inline", 2)
+            prompt = generate_section2_prompt(summary, project_name)
+            sections["2"] = await asyncio.to_thread(generate_section_content, prompt, "prd_section_2", max_tokens=1000)
 
         if "3" not in sections:
-            print(f"[PRD Assembly] Section 3 missing for {project_id}, generating inline...")
-            prompt = generate_section3_prompt(phase_summaries, mindmap_data, project_name)
-            sections["3"] = generate_section_content(prompt, max_tokens=2500)
+            log.info("PRD section %s missing at assembly, generating inline", 3)
+            prompt = generate_section3_prompt(summary, project_name)
+            sections["3"] = await asyncio.to_thread(generate_section_content, prompt, "prd_section_3", max_tokens=2500)
 
         # Always generate Section 4 at assembly time (needs full context)
-        prompt4 = generate_section4_prompt(phase_summaries, mindmap_data, project_name)
-        sections["4"] = generate_section_content(prompt4, max_tokens=800)
+        prompt4 = generate_section4_prompt(summary, project_name)
+        sections["4"] = await asyncio.to_thread(generate_section_content, prompt4, "prd_section_4", max_tokens=800)
 
         # Assemble final document
         prd_content = "\n\n---\n\n".join([
@@ -2376,7 +2514,7 @@ async def generate_prd(project_id: str, user_id: str = Depends(get_current_user)
 
         # Attempt PDF generation (graceful fallback)
         pdf_path = None
-        if WEASYPRINT_AVAILABLE:
+        if weasyprint_html.get() is not None:
             try:
                 pdf_path = f"/tmp/documents/{project_id}_prd.pdf"
                 generate_pdf_from_markdown(md_content, pdf_path)
@@ -2392,12 +2530,14 @@ async def generate_prd(project_id: str, user_id: str = Depends(get_current_user)
             "created_at": datetime.utcnow().isoformat()
         }
         supabase.table("documents").insert(doc_record).execute()
+        if pdf_path:
+            event_bus.publish(project_id, "pdf_ready", {"doc_type": "prd", "pdf_path": pdf_path})
 
         # Update prd_draft with all sections (including any newly generated fallbacks)
         prd_draft["sections"] = sections
         prd_draft["last_updated"] = datetime.utcnow().isoformat()
         supabase.table("projects").update({
-            "prd_draft": json.dumps(prd_draft)
+            "prd_draft": prd_draft
         }).eq("id", project_id).execute()
 
         # Insert completion message (for DB history — frontend shows PrdGenerationView, not this)
@@ -2429,7 +2569,7 @@ async def generate_prd(project_id: str, user_id: str = Depends(get_current_user)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/documents/{project_id}/content")
-async def get_document_content(project_id: str, user_id: str = Depends(get_current_user)):
+async def get_document_content(project_id: str, http_request: Request, user_id: str = Depends(get_current_user)):
     """Return PRD markdown content for in-app document preview."""
     try:
         await verify_project_ownership(project_id, user_id)
@@ -2442,10 +2582,16 @@ async def get_document_content(project_id: str, user_id: str = Depends(get_curre
         if not md_path or not os.path.exists(md_path):
             raise HTTPException(status_code=404, detail="Document file not found")
 
+        # File stat + document row: no need to read the file to answer a revalidation
+        stat = os.stat(md_path)
+        etag = make_etag("prd", docs.data[0], stat.st_mtime_ns, stat.st_size)
+        if etag_matches(http_request, etag):
+            return not_modified(etag)
+
         with open(md_path, "r", encoding="utf-8") as f:
             content = f.read()
 
-        return {"content": content, "document": docs.data[0]}
+        return json_with_etag({"content": content, "document": docs.data[0]}, etag)
 
     except HTTPException:
         raise
@@ -2469,46 +2615,129 @@ async def get_project_messages(project_id: str, phase: int = None, user_id: str
 
 @app.delete("/api/projects/{project_id}")
 async def delete_project(project_id: str, user_id: str = Depends(get_current_user)):
-    """Delete a project and all its related data"""
+    """Delete a project and all its related data.
+
+    The project is hidden immediately; its rows and files are purged by the sweeper.
+    """
     try:
         await verify_project_ownership(project_id, user_id)
-        # Delete children first, parent last
-        supabase.table("documents").delete().eq("project_id", project_id).execute()
-        supabase.table("messages").delete().eq("project_id", project_id).execute()
-        supabase.table("projects").delete().eq("id", project_id).execute()
+        supabase.table("projects").update({
+            "deleted_at": datetime.utcnow().isoformat()
+        }).eq("id", project_id).execute()
         return {"success": True}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def replace_canvas(project_id: str, canvas_state: Dict, base_version: Optional[int]) -> Optional[int]:
+    """Compare-and-swap canvas write. Returns the new canvas_version, or None if base_version is stale."""
+    result = supabase.rpc("replace_canvas", {
+        "p_project_id": project_id,
+        "p_base_version": base_version,
+        "p_canvas": canvas_state,
+    }).execute()
+    return result.data
+
+def save_canvas_edits(project_id: str, canvas: CanvasGraph, base_version: int,
+                      edit: Callable[[CanvasGraph], Any], attempts: int = 3):
+    """Save a canvas that edit() has been applied to. If the canvas moved on since
+    base_version (e.g. an edit from another tab), reload it, apply edit() again
+    and retry; 409 after `attempts` conflicts.
+
+    Returns (canvas_state, canvas_version).
+    """
+    for _ in range(attempts):
+        canvas_state = canvas.to_dict()
+        version = replace_canvas(project_id, canvas_state, base_version)
+        if version is not None:
+            event_bus.publish(project_id, "canvas_patched", {"canvas_version": version})
+            return canvas_state, version
+        current = fetch_project_state(project_id, ("canvas_state",))
+        if current is None:
+            break
+        canvas, base_version = current.canvas, current.canvas_version
+        edit(canvas)
+    raise canvas_conflict(project_id)
+
+def save_chat_canvas(project_id: str, canvas: CanvasGraph, base_version: int,
+                     canvas_updates: List[Dict], attempts: int = 3):
+    """Save a canvas with chat updates applied, re-applying them on top of newer
+    client edits if the canvas moved on while the AI was responding."""
+    return save_canvas_edits(project_id, canvas, base_version,
+                             lambda graph: apply_chat_canvas_updates(graph, canvas_updates), attempts)
+
+def canvas_conflict(project_id: str) -> HTTPException:
+    """409 carrying the current version so the client can rebase its ops and retry."""
+    current = fetch_project_state(project_id, ("canvas_version",))
+    return HTTPException(status_code=409, detail={
+        "message": "Canvas was modified by another session",
+        "canvas_version": current.canvas_version if current else None,
+    })
+
 @app.post("/api/canvas")
 async def update_canvas(update: NodeUpdate, user_id: str = Depends(get_current_user)):
-    """Update canvas state"""
+    """Replace the whole canvas state"""
     try:
         await verify_project_ownership(update.project_id, user_id)
         canvas_state = {
             "nodes": update.nodes,
             "edges": update.edges
         }
+        try:
+            check_canvas(canvas_state)
+        except CanvasPatchError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-        supabase.table("projects").update({
-            "canvas_state": json.dumps(canvas_state)
-        }).eq("id", update.project_id).execute()
+        new_version = replace_canvas(update.project_id, canvas_state, update.canvas_version)
+        if new_version is None:
+            raise canvas_conflict(update.project_id)
+        event_bus.publish(update.project_id, "canvas_patched", {"canvas_version": new_version})
 
-        return {"success": True}
+        return {"success": True, "canvas_version": new_version}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.patch("/api/canvas/{project_id}")
+async def patch_canvas(project_id: str, patch: CanvasPatch, user_id: str = Depends(get_current_user)):
+    """Apply node/edge-level operations against a known canvas_version (409 if it moved on)"""
+    try:
+        project = await load_project(project_id, user_id, ("canvas_state",))
+        if project.canvas_version != patch.canvas_version:
+            raise HTTPException(status_code=409, detail={
+                "message": "Canvas was modified by another session",
+                "canvas_version": project.canvas_version,
+            })
+
+        try:
+            canvas_state = apply_canvas_ops(project.canvas_state, patch.ops)
+        except CanvasPatchError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        new_version = replace_canvas(project_id, canvas_state, patch.canvas_version)
+        if new_version is None:
+            raise canvas_conflict(project_id)
+        # Other sessions can apply the ops directly if they're at canvas_version - 1
+        event_bus.publish(project_id, "canvas_patched", {"canvas_version": new_version, "ops": patch.ops})
+
+        return {"success": True, "canvas_version": new_version}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/canvas/{project_id}")
-async def get_canvas(project_id: str, user_id: str = Depends(get_current_user)):
+async def get_canvas(project_id: str, http_request: Request, user_id: str = Depends(get_current_user)):
     """Get canvas state"""
     try:
-        project = await verify_project_ownership(project_id, user_id)
-        canvas_state = json.loads(project["canvas_state"]) if project["canvas_state"] else {"nodes": [], "edges": []}
-        return canvas_state
+        project = await load_project(project_id, user_id, ("canvas_state",))
+        etag = make_etag("canvas", project_id, project.canvas_version)
+        if etag_matches(http_request, etag):
+            return not_modified(etag)
+
+        return json_with_etag({**project.canvas_state, "canvas_version": project.canvas_version}, etag)
     except HTTPException:
         raise
     except Exception as e:
@@ -2518,101 +2747,70 @@ async def get_canvas(project_id: str, user_id: str = Depends(get_current_user)):
 async def update_phase_data(update: PhaseDataUpdate, user_id: str = Depends(get_current_user)):
     """Update phase_summaries or mindmap_data when user edits node content"""
     try:
-        project = await verify_project_ownership(update.project_id, user_id)
-
-        if update.phase == 1:
-            # Update ideation pillars in phase_summaries["1"]
-            phase_summaries = project.get("phase_summaries") or {}
-            if isinstance(phase_summaries, str):
-                phase_summaries = json.loads(phase_summaries)
+        # Phase 2 edits also rewrite the feature_data mirror, which needs the current features
+        columns = ("phase_summaries",) if update.phase == 2 else ()
+        project = await load_project(update.project_id, user_id, columns)
 
-            if "1" not in phase_summaries:
-                phase_summaries["1"] = {}
+        # Only the edited path + value is sent; the database applies it with jsonb_set
+        patches = []
 
-            phase_summaries["1"][update.field] = update.value
-
-            # Also update ideation_pillars column for backup
-            ideation_pillars = project.get("ideation_pillars") or {}
-            if isinstance(ideation_pillars, str):
-                ideation_pillars = json.loads(ideation_pillars)
-            ideation_pillars[update.field] = update.value
-
-            supabase.table("projects").update({
-                "phase_summaries": json.dumps(phase_summaries),
-                "ideation_pillars": json.dumps(ideation_pillars)
-            }).eq("id", update.project_id).execute()
+        if update.phase == 1:
+            # Update ideation pillars in phase_summaries["1"] (+ ideation_pillars column for backup)
+            patches.append(json_patch("phase_summaries", ["1", update.field], update.value))
+            patches.append(json_patch("ideation_pillars", [update.field], update.value))
 
         elif update.phase == 2:
-            # Update feature data in phase_summaries["2"]
-            phase_summaries = project.get("phase_summaries") or {}
-            if isinstance(phase_summaries, str):
-                phase_summaries = json.loads(phase_summaries)
-
-            if "2" not in phase_summaries:
-                phase_summaries["2"] = {"features": []}
+            features_summary = copy.deepcopy(project.phase_summaries.get("2") or {"features": []})
+            features = features_summary.get("features") or []
 
             # Find and update the feature by matching node_id pattern (feature-N)
             if update.node_id:
-                features = phase_summaries["2"].get("features", [])
                 # Extract feature index from node_id (e.g., "feature-1" -> 0, feature-2 -> 1)
                 try:
                     feature_idx = int(update.node_id.split("-")[1]) - 1  # feature-1 = index 0
-                    if 0 <= feature_idx < len(features):
-                        # Check if this is a userFlow update or a regular feature update
-                        if update.field == "userFlow" and update.value:
-                            # Update userFlow data for the feature
-                            features[feature_idx]["userFlow"] = update.value
-                        elif update.node_data:
-                            # Update the feature with new data
-                            features[feature_idx] = {
-                                "title": update.node_data.get("label", features[feature_idx].get("title", "")),
-                                "subFeatures": update.node_data.get("subFeatures", features[feature_idx].get("subFeatures", [])),
-                                "userFlow": features[feature_idx].get("userFlow", {})  # Preserve existing userFlow
-                            }
-                        phase_summaries["2"]["features"] = features
                 except (ValueError, IndexError):
-                    pass
-
-            # Also update feature_data column for backup
-            supabase.table("projects").update({
-                "phase_summaries": json.dumps(phase_summaries),
-                "feature_data": json.dumps(phase_summaries["2"])
-            }).eq("id", update.project_id).execute()
+                    feature_idx = -1
+
+                if 0 <= feature_idx < len(features):
+                    # Check if this is a userFlow update or a regular feature update
+                    fields = {}
+                    if update.field == "userFlow" and update.value:
+                        fields["userFlow"] = update.value
+                    elif update.node_data:
+                        # Existing userFlow is preserved because only these keys are written
+                        if "label" in update.node_data:
+                            fields["title"] = update.node_data["label"]
+                        if "subFeatures" in update.node_data:
+                            fields["subFeatures"] = update.node_data["subFeatures"]
+
+                    # Skipped server-side if the feature was removed meanwhile
+                    for key, value in fields.items():
+                        features[feature_idx][key] = value
+                        patches.append(json_patch("phase_summaries", ["2", "features", feature_idx, key], value, create_parents=False))
+
+            # feature_data mirrors phase_summaries["2"] (advance_phase reads it); written in the same RPC
+            patches.append(json_patch("feature_data", [], features_summary))
 
         elif update.phase == 3:
             # Update mindmap_data and phase_summaries["3"]
-            mindmap_data = project.get("mindmap_data") or {}
-            if isinstance(mindmap_data, str):
-                mindmap_data = json.loads(mindmap_data)
-
-            phase_summaries = project.get("phase_summaries") or {}
-            if isinstance(phase_summaries, str):
-                phase_summaries = json.loads(phase_summaries)
-
-            if "3" not in phase_summaries:
-                phase_summaries["3"] = {}
+            patches.append(json_patch("mindmap_data", [update.field], update.value))
+            patches.append(json_patch("phase_summaries", ["3", update.field], update.value))
 
-            # Update the specific field
-            mindmap_data[update.field] = update.value
-            phase_summaries["3"][update.field] = update.value
-
-            supabase.table("projects").update({
-                "mindmap_data": json.dumps(mindmap_data),
-                "phase_summaries": json.dumps(phase_summaries)
-            }).eq("id", update.project_id).execute()
+        patch_project_json(update.project_id, patches)
 
         return {"success": True}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error updating phase data: {e}")
+        log.exception("Updating phase data failed")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/documents/generate")
-async def generate_document(request: DocumentRequest, user_id: str = Depends(get_current_user)):
+async def generate_document(request: DocumentRequest, user_id: str = Depends(require_llm_quota)):
     """Generate document (MD and PDF)"""
+    set_usage_scope(project_id=request.project_id)
     try:
-        project = await verify_project_ownership(request.project_id, user_id)
+        project = await load_project(request.project_id, user_id, ("name", "canvas_state"))
         
         # Get chat history for context
         chat_result = supabase.table("messages").select("*").eq("project_id", request.project_id).order("created_at").execute()
@@ -2623,7 +2821,7 @@ async def generate_document(request: DocumentRequest, user_id: str = Depends(get
             messages = [{"role": "system", "content": "Generate a comprehensive PRD document based on all the information gathered."}]
             messages.extend([{"role": msg["role"], "content": msg["content"]} for msg in (chat_result.data or [])])
             
-            content = get_ai_response(messages, 4, {"canvas_state": json.loads(project["canvas_state"])})
+            content = await asyncio.to_thread(get_ai_response, messages, 4, {"canvas_state": project.canvas_state})
             title = f"{project['name']} - PRD"
         else:
             content = "Document generation in progress..."
@@ -2650,18 +2848,24 @@ async def generate_document(request: DocumentRequest, user_id: str = Depends(get
             "pdf_path": pdf_path,
             "created_at": datetime.utcnow().isoformat()
         }).execute()
+        event_bus.publish(request.project_id, "pdf_ready", {"doc_type": request.doc_type, "pdf_path": pdf_path})
         
         return {"md_path": md_path, "pdf_path": pdf_path}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/documents/{project_id}")
-async def get_documents(project_id: str, user_id: str = Depends(get_current_user)):
+async def get_documents(project_id: str, http_request: Request, user_id: str = Depends(get_current_user)):
     """Get all documents for a project"""
     try:
         await verify_project_ownership(project_id, user_id)
         result = supabase.table("documents").select("*").eq("project_id", project_id).execute()
-        return {"documents": result.data or []}
+        documents = result.data or []
+        # Rows are tiny; hashing them still saves re-sending and re-rendering an unchanged list
+        etag = make_etag("documents", documents)
+        if etag_matches(http_request, etag):
+            return not_modified(etag)
+        return json_with_etag({"documents": documents}, etag)
     except HTTPException:
         raise
     except Exception as e:
@@ -2674,37 +2878,72 @@ async def download_document(file_path: str):
         raise HTTPException(status_code=404, detail="File not found")
     return FileResponse(file_path)
 
-## ─── Account Management ─────────────────────────────────────────
+## ─── Project Events ─────────────────────────────────────────────
 
-@app.post("/api/account/delete-data")
-async def delete_account_data(user_id: str = Depends(get_current_user)):
-    """Delete all user data (projects, messages, documents) but keep the account."""
-    try:
-        # Get all user projects first
-        projects_result = supabase.table("projects").select("id").eq("user_id", user_id).execute()
-        project_ids = [p["id"] for p in (projects_result.data or [])]
+SSE_KEEPALIVE_SECONDS = 15
+
+@app.post("/api/projects/{project_id}/events/ticket")
+async def project_events_ticket(project_id: str, user_id: str = Depends(get_current_user)):
+    """Short-lived ticket for opening the event stream, so the bearer token stays out of the URL."""
+    await verify_project_ownership(project_id, user_id)
+    return {
+        "ticket": issue_stream_ticket(STREAM_TICKET_SECRET, user_id, project_id),
+        "expires_in": STREAM_TICKET_TTL_SECONDS,
+    }
+
+@app.get("/api/projects/{project_id}/events")
+async def project_events(project_id: str, http_request: Request, user_id: str = Depends(get_event_stream_user)):
+    """Server-sent events for a project: section_ready, pdf_ready, step_options_ready, canvas_patched."""
+    await verify_project_ownership(project_id, user_id)
+    queue = event_bus.subscribe(project_id)
 
-        deleted_projects = 0
-        deleted_messages = 0
-        deleted_documents = 0
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await http_request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            event_bus.unsubscribe(project_id, queue)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # don't let a proxy buffer the stream
+    })
+
+## ─── Account Management ─────────────────────────────────────────
 
-        # Delete children for each project, then the project itself
-        for pid in project_ids:
-            docs_result = supabase.table("documents").delete().eq("project_id", pid).execute()
-            deleted_documents += len(docs_result.data or [])
+def account_project_ids(user_id: str) -> List[str]:
+    result = supabase.table("projects").select("id").eq("user_id", user_id).execute()
+    return [p["id"] for p in (result.data or [])]
 
-            msgs_result = supabase.table("messages").delete().eq("project_id", pid).execute()
-            deleted_messages += len(msgs_result.data or [])
+@app.post("/api/account/delete-data")
+async def delete_account_data(background_tasks: BackgroundTasks, user_id: str = Depends(get_current_user)):
+    """Delete all user data (projects, messages, documents) but keep the account.
+
+    Large accounts are purged in the background; poll /api/account/purge-jobs/{job_id}.
+    """
+    try:
+        project_ids = account_project_ids(user_id)
 
-            supabase.table("projects").delete().eq("id", pid).execute()
-            deleted_projects += 1
+        if len(project_ids) > BACKGROUND_PURGE_THRESHOLD:
+            job = create_purge_job(supabase, user_id, len(project_ids))
+            background_tasks.add_task(track_job("purge", run_purge_job), supabase, job, project_ids)
+            return {"success": True, **job.to_dict()}
 
+        deleted = purge_projects(supabase, project_ids)
         return {
             "success": True,
             "deleted": {
-                "projects": deleted_projects,
-                "messages": deleted_messages,
-                "documents": deleted_documents,
+                "projects": deleted["projects"],
+                "messages": deleted["messages"],
+                "documents": deleted["documents"],
             },
         }
     except HTTPException:
@@ -2713,21 +2952,34 @@ async def delete_account_data(user_id: str = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/account/purge-jobs/{job_id}")
+async def get_purge_job_status(job_id: str, user_id: str = Depends(get_current_user)):
+    """Progress of a background account purge."""
+    job = await asyncio.to_thread(get_purge_job, supabase, job_id)
+    if not job or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Purge job not found")
+    return job.to_dict()
+
+
 @app.post("/api/account/delete")
-async def delete_account(user_id: str = Depends(get_current_user)):
+async def delete_account(background_tasks: BackgroundTasks, user_id: str = Depends(get_current_user)):
     """Permanently delete user account and all associated data."""
     try:
         # Step 1: Delete all user data (same logic as delete-data)
-        projects_result = supabase.table("projects").select("id").eq("user_id", user_id).execute()
-        project_ids = [p["id"] for p in (projects_result.data or [])]
-
-        for pid in project_ids:
-            supabase.table("documents").delete().eq("project_id", pid).execute()
-            supabase.table("messages").delete().eq("project_id", pid).execute()
-            supabase.table("projects").delete().eq("id", pid).execute()
+        project_ids = account_project_ids(user_id)
 
         # Step 2: Delete the auth user (requires service role key)
-        supabase.auth.admin.delete_user(user_id)
+        def delete_auth_user():
+            supabase.auth.admin.delete_user(user_id)
+
+        if len(project_ids) > BACKGROUND_PURGE_THRESHOLD:
+            # The client signs out right away; the auth user goes once the data is gone
+            job = create_purge_job(supabase, user_id, len(project_ids))
+            background_tasks.add_task(track_job("purge", run_purge_job), supabase, job, project_ids, delete_auth_user)
+            return {"success": True, **job.to_dict()}
+
+        purge_projects(supabase, project_ids)
+        delete_auth_user()
 
         return {"success": True}
     except HTTPException:
@@ -2736,6 +2988,40 @@ async def delete_account(user_id: str = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+## ─── Admin ──────────────────────────────────────────────────────
+
+MAX_USAGE_DAYS = 90
+
+@app.get("/api/admin/usage")
+async def get_llm_usage(days: int = 7, group_by: str = "day", admin_id: str = Depends(get_admin_user)):
+    """LLM tokens, latency and cost over the last `days` UTC days.
+
+    group_by is a comma-separated subset of day, user_id, project_id, phase, site, model.
+    """
+    dimensions = [d.strip() for d in group_by.split(",") if d.strip()]
+    unknown = [d for d in dimensions if d not in GROUP_DIMENSIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown group_by dimension(s): {', '.join(unknown)}")
+    if not 1 <= days <= MAX_USAGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"days must be between 1 and {MAX_USAGE_DAYS}")
+    try:
+        # Include rows still buffered in this process
+        await asyncio.to_thread(usage_recorder.flush)
+        since, until = usage_window(days)
+        rows = await asyncio.to_thread(rollup_usage, supabase, since, until, dimensions)
+        totals = {field: sum(r[field] for r in rows) for field in SUM_FIELDS}
+        totals["cost_usd"] = round(totals["cost_usd"], 6)
+        return {
+            "since": since.isoformat(),
+            "until": until.isoformat(),
+            "group_by": dimensions,
+            "rows": rows,
+            "totals": totals,
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -0,0 +1,40 @@
+"""Shared fixtures: the app in offline mode (see offline.py), one fresh user per test."""
+import os
+import sys
+import uuid
+
+import pytest
+
+# Must be set before server.py is imported: it picks its clients at import time
+os.environ["FOUNDERLAB_OFFLINE"] = "1"
+os.environ.setdefault("STARTUP_WARMUP", "0")
+os.environ.setdefault("OFFLINE_LLM_LATENCY_MS", "0")
+os.environ.setdefault("OFFLINE_LLM_MS_PER_TOKEN", "0")
+os.environ.setdefault("OFFLINE_SEARCH_LATENCY_MS", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def server():
+    import server
+    return server
+
+
+@pytest.fixture(scope="session")
+def client(server):
+    from fastapi.testclient import TestClient
+    return TestClient(server.app)
+
+
+@pytest.fixture
+def headers():
+    # Offline mode treats every distinct bearer token as its own user
+    return {"Authorization": f"Bearer {uuid.uuid4().hex}"}
+
+
+@pytest.fixture
+def project_id(client, headers):
+    response = client.post("/api/projects", json={"name": "Invoice tracker"}, headers=headers)
+    assert response.status_code == 200
+    return response.json()["project_id"]
@@ -0,0 +1,168 @@
+import pytest
+
+from canvas import MAX_OPS_PER_PATCH, CanvasGraph, CanvasPatchError, apply_canvas_ops, check_canvas
+
+BASE = {
+    "nodes": [{"id": "root", "type": "root"}, {"id": "a", "type": "feature"}, {"id": "b", "type": "feature"}],
+    "edges": [{"id": "root-a", "source": "root", "target": "a"}, {"id": "a-b", "source": "a", "target": "b"}],
+}
+
+
+def node_ids(canvas):
+    return [n["id"] for n in canvas["nodes"]]
+
+
+def edge_ids(canvas):
+    return [e["id"] for e in canvas["edges"]]
+
+
+# --- CanvasGraph ---
+
+def test_graph_indexes_types_and_adjacency():
+    graph = CanvasGraph(BASE)
+    assert graph.count_type("feature") == 2
+    assert graph.children("root") == ["a"]
+    assert graph.parents("b") == ["a"]
+
+    graph.upsert_node({"id": "a", "type": "featureGroup"})
+    assert graph.count_type("feature") == 1
+    assert graph.count_type("featureGroup") == 1
+
+
+def test_graph_revision_counts_edits():
+    graph = CanvasGraph(BASE)
+    start = graph.revision
+    graph.delete_edge("missing")
+    assert graph.revision == start
+    graph.add_node("c", "feature", {"x": 0, "y": 0}, {}, parent_id="root")
+    assert graph.revision == start + 2  # node and edge
+
+
+# --- apply_canvas_ops ---
+
+def test_upsert_keeps_order_and_appends_new():
+    canvas = apply_canvas_ops(BASE, [
+        {"op": "upsert_node", "node": {"id": "a", "type": "feature", "data": {"label": "A"}}},
+        {"op": "upsert_node", "node": {"id": "c", "type": "feature"}},
+    ])
+    assert node_ids(canvas) == ["root", "a", "b", "c"]
+    assert canvas["nodes"][1]["data"] == {"label": "A"}
+
+
+def test_delete_node_removes_its_edges():
+    canvas = apply_canvas_ops(BASE, [{"op": "delete_node", "id": "a"}])
+    assert node_ids(canvas) == ["root", "b"]
+    assert edge_ids(canvas) == []
+
+
+def test_ops_are_idempotent():
+    ops = [
+        {"op": "upsert_edge", "edge": {"id": "root-b", "source": "root", "target": "b"}},
+        {"op": "delete_edge", "id": "a-b"},
+        {"op": "delete_node", "id": "missing"},
+    ]
+    once = apply_canvas_ops(BASE, ops)
+    assert apply_canvas_ops(once, ops) == once
+
+
+def test_does_not_modify_the_input():
+    apply_canvas_ops(BASE, [{"op": "delete_node", "id": "a"}])
+    assert node_ids(BASE) == ["root", "a", "b"]
+
+
+@pytest.mark.parametrize("op", [
+    {"op": "rename_node", "id": "a"},
+    "upsert_node",
+    {"op": "upsert_node", "node": "a"},
+    {"op": "upsert_node", "node": {"type": "feature"}},
+    {"op": "upsert_node", "node": {"id": "c", "type": []}},
+    {"op": "upsert_node", "node": {"id": ["c"], "type": "feature"}},
+    {"op": "upsert_edge", "edge": {"id": "e", "source": {"id": "a"}, "target": "b"}},
+    {"op": "upsert_edge", "edge": {"id": "e", "source": "a", "target": 1}},
+    {"op": "delete_node", "id": ["a"]},
+    {"op": "delete_edge"},
+])
+def test_malformed_ops_are_rejected(op):
+    with pytest.raises(CanvasPatchError):
+        apply_canvas_ops(BASE, [op])
+
+
+def test_too_many_ops_are_rejected():
+    ops = [{"op": "delete_node", "id": "missing"}] * (MAX_OPS_PER_PATCH + 1)
+    with pytest.raises(CanvasPatchError):
+        apply_canvas_ops(BASE, ops)
+    apply_canvas_ops(BASE, ops[:MAX_OPS_PER_PATCH])
+
+
+def test_check_canvas():
+    check_canvas(BASE)
+    with pytest.raises(CanvasPatchError):
+        check_canvas({"nodes": [{"id": "a", "type": {}}], "edges": []})
+    with pytest.raises(CanvasPatchError):
+        check_canvas({"nodes": [], "edges": ["a-b"]})
+
+
+# --- Versioned writes ---
+
+def get_canvas(client, headers, project_id):
+    response = client.get(f"/api/canvas/{project_id}", headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_replace_canvas_is_compare_and_swap(server, project_id):
+    version = server.fetch_project_state(project_id, ("canvas_version",)).canvas_version
+    assert server.replace_canvas(project_id, BASE, version) == version + 1
+    assert server.replace_canvas(project_id, {"nodes": [], "edges": []}, version) is None
+    assert node_ids(server.fetch_project_state(project_id, ("canvas_state",)).canvas_state) == node_ids(BASE)
+
+
+def test_patch_applies_ops_and_bumps_version(client, headers, project_id):
+    version = get_canvas(client, headers, project_id)["canvas_version"]
+    response = client.patch(f"/api/canvas/{project_id}", headers=headers, json={
+        "canvas_version": version,
+        "ops": [{"op": "upsert_node", "node": {"id": "idea", "type": "ideation"}}],
+    })
+    assert response.status_code == 200
+    assert response.json()["canvas_version"] == version + 1
+
+    canvas = get_canvas(client, headers, project_id)
+    assert canvas["canvas_version"] == version + 1
+    assert "idea" in node_ids(canvas)
+
+
+def test_patch_with_stale_version_conflicts(client, headers, project_id):
+    version = get_canvas(client, headers, project_id)["canvas_version"]
+    ops = [{"op": "upsert_node", "node": {"id": "idea", "type": "ideation"}}]
+    assert client.patch(f"/api/canvas/{project_id}", headers=headers,
+                        json={"canvas_version": version, "ops": ops}).status_code == 200
+
+    response = client.patch(f"/api/canvas/{project_id}", headers=headers,
+                            json={"canvas_version": version, "ops": ops})
+    assert response.status_code == 409
+    assert response.json()["detail"]["canvas_version"] == version + 1
+
+
+def test_malformed_patch_is_a_400(client, headers, project_id):
+    version = get_canvas(client, headers, project_id)["canvas_version"]
+    for ops in ([{"op": "upsert_node", "node": {"id": "n", "type": []}}],
+                [{"op": "delete_node", "id": "missing"}] * (MAX_OPS_PER_PATCH + 1)):
+        response = client.patch(f"/api/canvas/{project_id}", headers=headers,
+                                json={"canvas_version": version, "ops": ops})
+        assert response.status_code == 400
+    assert get_canvas(client, headers, project_id)["canvas_version"] == version
+
+
+def test_full_replace_validates_and_checks_version(client, headers, project_id):
+    version = get_canvas(client, headers, project_id)["canvas_version"]
+    body = {"project_id": project_id, "nodes": BASE["nodes"], "edges": BASE["edges"], "canvas_version": version}
+    assert client.post("/api/canvas", headers=headers,
+                       json={**body, "nodes": [{"id": "n", "type": []}]}).status_code == 400
+    assert client.post("/api/canvas", headers=headers, json=body).status_code == 200
+    assert client.post("/api/canvas", headers=headers, json=body).status_code == 409
+
+
+def test_other_users_cannot_patch(client, headers, project_id):
+    response = client.patch(f"/api/canvas/{project_id}", headers={"Authorization": "Bearer someone-else"},
+                            json={"canvas_version": 0, "ops": []})
+    assert response.status_code == 404
@@ -0,0 +1,66 @@
+import pytest
+from starlette.requests import Request
+
+from http_cache import etag_matches, make_etag
+
+
+def request_with(if_none_match=None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_make_etag_is_stable_and_weak():
+    etag = make_etag("canvas", "p1", 3)
+    assert etag.startswith('W/"')
+    assert etag == make_etag("canvas", "p1", 3)
+    assert etag != make_etag("canvas", "p1", 4)
+
+
+@pytest.mark.parametrize("header, matches", [
+    (None, False),
+    ("", False),
+    ("*", True),
+    ('W/"abc"', True),
+    ('"abc"', True),  # weak comparison ignores W/
+    ('W/"xyz", W/"abc"', True),
+    ('W/"xyz"', False),
+    ('W/"abcd"', False),
+])
+def test_etag_matches(header, matches):
+    assert etag_matches(request_with(header), 'W/"abc"') is matches
+
+
+def test_project_read_revalidates(client, headers, project_id):
+    url = f"/api/projects/{project_id}"
+    first = client.get(url, headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    assert client.get(url, headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    # Any project write changes updated_at and with it the ETag
+    client.post("/api/projects/update-phase-data", headers=headers,
+                json={"project_id": project_id, "phase": 1, "field": "problem", "value": "Unpaid invoices"})
+    changed = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_canvas_read_revalidates(client, headers, project_id):
+    url = f"/api/canvas/{project_id}"
+    first = client.get(url, headers=headers)
+    etag = first.headers["etag"]
+    assert client.get(url, headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    client.patch(url, headers=headers, json={
+        "canvas_version": first.json()["canvas_version"],
+        "ops": [{"op": "upsert_node", "node": {"id": "idea", "type": "ideation"}}],
+    })
+    assert client.get(url, headers={**headers, "If-None-Match": etag}).status_code == 200
+
+
+def test_matching_etag_does_not_bypass_ownership(client, headers, project_id):
+    url = f"/api/canvas/{project_id}"
+    etag = client.get(url, headers=headers).headers["etag"]
+    response = client.get(url, headers={"Authorization": "Bearer someone-else", "If-None-Match": etag})
+    assert response.status_code == 404
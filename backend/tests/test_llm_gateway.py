@@ -0,0 +1,162 @@
+import time
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+import llm_gateway
+from llm_gateway import CallPolicy, CircuitBreaker, LLMGateway, LLMUnavailable, RetryBudget, is_retryable
+from offline import ScriptedLLM
+
+MESSAGES = [{"role": "user", "content": "Suggest three features"}]
+
+
+def status_error(cls, status: int):
+    return cls("error", response=SimpleNamespace(status_code=status, headers={}, request=None), body=None)
+
+
+def connection_error():
+    return openai.APIConnectionError(request=None)
+
+
+class FlakyLLM(ScriptedLLM):
+    """ScriptedLLM that raises the queued errors first, one per call."""
+
+    def __init__(self, errors=()):
+        super().__init__(latency_ms=0, ms_per_token=0)
+        self.errors = list(errors)
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return super().create(**kwargs)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "backoff_delay", lambda attempt: 0)
+
+
+def gateway(client, **kwargs):
+    policies = {"json": CallPolicy(deadline=10, max_attempts=3)}
+    return LLMGateway(client, policies=policies, **kwargs)
+
+
+def complete(gw):
+    return gw.complete("json", model="gpt-4o-mini", messages=MESSAGES)
+
+
+def test_is_retryable():
+    assert is_retryable(connection_error())
+    assert is_retryable(status_error(openai.RateLimitError, 429))
+    assert is_retryable(status_error(openai.InternalServerError, 503))
+    assert not is_retryable(status_error(openai.BadRequestError, 400))
+    assert not is_retryable(ValueError("bad prompt"))
+
+
+def test_transient_errors_are_retried():
+    client = FlakyLLM([connection_error(), status_error(openai.InternalServerError, 502)])
+    response = complete(gateway(client))
+    assert response.choices[0].message.content
+    assert client.calls == 3
+
+
+def test_gives_up_after_max_attempts():
+    client = FlakyLLM([connection_error()] * 5)
+    with pytest.raises(openai.APIConnectionError):
+        complete(gateway(client))
+    assert client.calls == 3
+
+
+def test_non_retryable_errors_are_raised_at_once():
+    client = FlakyLLM([status_error(openai.BadRequestError, 400)])
+    gw = gateway(client)
+    with pytest.raises(openai.BadRequestError):
+        complete(gw)
+    assert client.calls == 1
+    assert gw.breaker.state == "closed"
+
+
+def test_retries_draw_from_the_shared_budget():
+    client = FlakyLLM([connection_error()] * 5)
+    gw = gateway(client)
+    gw.budget = RetryBudget(min_tokens=1)
+    with pytest.raises(openai.APIConnectionError):
+        complete(gw)
+    assert client.calls == 2  # one retry, then the budget is empty
+
+
+def test_open_breaker_fails_fast():
+    client = FlakyLLM([connection_error()] * 10)
+    gw = gateway(client)
+    gw.breaker = CircuitBreaker(threshold=3, reset_after=60)
+    with pytest.raises(openai.APIConnectionError):
+        complete(gw)
+    assert gw.breaker.state == "open"
+
+    calls = client.calls
+    with pytest.raises(LLMUnavailable):
+        complete(gw)
+    assert client.calls == calls
+
+
+def test_breaker_half_open_allows_one_trial():
+    breaker = CircuitBreaker(threshold=1, reset_after=0.01)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.02)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # the trial is still in flight
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_spent_deadline_raises_unavailable():
+    client = FlakyLLM()
+    gw = LLMGateway(client, policies={"json": CallPolicy(deadline=0)})
+    with pytest.raises(LLMUnavailable):
+        complete(gw)
+    assert client.calls == 0
+
+
+def test_usage_is_reported_once_per_successful_call():
+    reported = []
+    client = FlakyLLM([connection_error()])
+    gw = gateway(client, on_usage=lambda site, model, response, latency: reported.append((site, model)))
+    gw.complete("json", site="design_guidelines", model="gpt-4o-mini", messages=MESSAGES)
+    assert reported == [("design_guidelines", "gpt-4o-mini")]
+
+
+def test_hedged_call_reports_both_requests():
+    reported = []
+
+    class SlowFirstLLM(ScriptedLLM):
+        def __init__(self):
+            super().__init__(latency_ms=0, ms_per_token=0)
+            self.calls = 0
+
+        def create(self, **kwargs):
+            self.calls += 1
+            if self.calls == 1:
+                time.sleep(0.2)
+            return super().create(**kwargs)
+
+    client = SlowFirstLLM()
+    gw = LLMGateway(client, policies={"json": CallPolicy(deadline=10, hedge=True)}, hedging=True,
+                    on_usage=lambda site, model, response, latency: reported.append(response.id))
+    for _ in range(llm_gateway.MIN_SAMPLES_FOR_HEDGE):
+        gw.latency.record("json", 0.01)
+
+    response = complete(gw)
+    assert client.calls == 2
+    gw._executor.shutdown(wait=True)
+    assert len(reported) == 2
+    assert response.id in reported
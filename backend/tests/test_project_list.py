@@ -0,0 +1,57 @@
+import base64
+import json
+import uuid
+
+import pytest
+
+from project_state import decode_project_cursor, encode_project_cursor
+
+
+def raw_cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    row = {"id": str(uuid.uuid4()), "updated_at": "2026-10-19T14:28:25.123456+00:00"}
+    assert decode_project_cursor(encode_project_cursor(row)) == (row["updated_at"], row["id"])
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not base64 !",
+    raw_cursor({"updated_at": "2026-10-19T14:28:25", "id": str(uuid.uuid4())}),
+    raw_cursor(["2026-10-19T14:28:25"]),
+    raw_cursor(["2026-10-19T14:28:25", "not-a-uuid"]),
+    raw_cursor(["2026-10-19T14:28:25", None]),
+    raw_cursor([None, str(uuid.uuid4())]),
+    # Would otherwise be pasted into the PostgREST or_() filter
+    raw_cursor(['2026-10-19",id.gt.0', str(uuid.uuid4())]),
+])
+def test_malformed_cursors_decode_to_none(cursor):
+    assert decode_project_cursor(cursor) is None
+
+
+def test_pages_cover_every_project_once(client, headers):
+    created = {client.post("/api/projects", json={"name": f"Project {i}"}, headers=headers).json()["project_id"]
+               for i in range(7)}
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/projects", params=params, headers=headers).json()
+        assert len(page["projects"]) <= 3
+        seen += [p["id"] for p in page["projects"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) == len(created)
+    assert set(seen) == created
+    everything = client.get("/api/projects", headers=headers).json()
+    assert [p["id"] for p in everything["projects"]] == seen
+    assert everything["next_cursor"] is None
+
+
+def test_invalid_cursor_is_a_400(client, headers):
+    response = client.get("/api/projects", params={"limit": 3, "cursor": "garbage"}, headers=headers)
+    assert response.status_code == 400
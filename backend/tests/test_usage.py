@@ -0,0 +1,59 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from offline import OfflineSupabase
+from usage import ROLLUP_PAGE_SIZE, rollup_usage
+
+NOW = datetime.now(timezone.utc)
+
+
+def usage_rows(users: int, calls_each: int = 1):
+    return [
+        {
+            "created_at": NOW.isoformat(),
+            "user_id": str(uuid.UUID(int=u + 1)),
+            "site": "chat",
+            "model": "gpt-4o-mini",
+            "prompt_tokens": 100,
+            "completion_tokens": 10,
+            "latency_ms": 50,
+            "cost_usd": 0.001,
+        }
+        for u in range(users) for _ in range(calls_each)
+    ]
+
+
+def rollup(client, group_by):
+    return rollup_usage(client, NOW - timedelta(days=1), NOW + timedelta(days=1), group_by)
+
+
+def test_rollup_reads_every_page():
+    client = OfflineSupabase()
+    users = ROLLUP_PAGE_SIZE * 2 + 500
+    client.table("llm_usage").insert(usage_rows(users)).execute()
+
+    by_user = rollup(client, ["user_id"])
+    assert len(by_user) == users
+    assert len({row["user_id"] for row in by_user}) == users
+    assert sum(row["calls"] for row in by_user) == users
+
+
+def test_rollup_sums_over_the_other_dimensions():
+    client = OfflineSupabase()
+    client.table("llm_usage").insert(usage_rows(3, calls_each=4)).execute()
+
+    (total,) = rollup(client, ["model"])
+    assert total == {
+        "model": "gpt-4o-mini",
+        "calls": 12,
+        "prompt_tokens": 1200,
+        "completion_tokens": 120,
+        "latency_ms": 600,
+        "cost_usd": 0.012,
+    }
+
+
+def test_rollup_of_a_full_last_page_stops():
+    client = OfflineSupabase()
+    client.table("llm_usage").insert(usage_rows(ROLLUP_PAGE_SIZE)).execute()
+    assert len(rollup(client, ["user_id"])) == ROLLUP_PAGE_SIZE
@@ -0,0 +1,384 @@
+"""Request tracing: OpenTelemetry-style spans for every request and external call.
+
+Off unless TRACE_EXPORTER is set:
+
+    TRACE_EXPORTER=file             JSON lines at TRACE_FILE_PATH (default
+                                    /tmp/founderlab_traces.jsonl), one span per
+                                    line; see scripts/trace_report.py
+    TRACE_EXPORTER=module:factory   factory() returns any object with
+                                    export(spans) (and optionally shutdown()),
+                                    e.g. a bridge to an OTLP collector
+    TRACE_SAMPLE_RATE=0.1           share of traces kept (default 1)
+
+TracingMiddleware opens a span per HTTP request (continuing an incoming W3C
+traceparent). span() opens a child of whatever span is current; the current
+span lives in a ContextVar, so it follows the request into awaited code,
+threadpool endpoints and background tasks. Project attributes
+(set_project_attributes) are copied to every span opened below the one they
+were set on. TracedSupabase wraps the Supabase client so every execute() is
+a span.
+
+Finished spans are buffered and handed to the exporter in batches from a
+background thread; nothing is exported on the request path. With tracing off,
+span() costs one ContextVar lookup.
+"""
+import functools
+import importlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+log = logging.getLogger(__name__)
+
+EXPORT_INTERVAL_SECONDS = 2.0
+EXPORT_BATCH_SIZE = 512
+# Spans kept while the exporter is failing; the oldest are dropped beyond this
+MAX_PENDING_SPANS = 10_000
+
+# Copied from a span to every span opened below it
+INHERITED_ATTRIBUTES = ("project.id", "project.phase", "project.step")
+
+# Not worth a trace, or open for minutes (SSE)
+UNTRACED_PATHS = ("/api/health",)
+UNTRACED_SUFFIXES = ("/events",)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "sampled", "attributes",
+                 "start_ns", "_start", "duration_ms", "status", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool,
+                 attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.status = "OK"
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = "ERROR"
+        self.error = f"{type(error).__name__}: {error}"[:500]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span when tracing is off, so callers never check."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def record_error(self, error: BaseException) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+_tracer: Optional["Tracer"] = None
+
+
+def _new_id(nbytes: int) -> str:
+    return f"{random.getrandbits(nbytes * 8):0{nbytes * 2}x}"
+
+
+class JsonlFileExporter:
+    """Appends one JSON span per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        lines = "".join(json.dumps(s.to_dict(), default=str) + "\n" for s in spans)
+        with self._lock, open(self.path, "a") as f:
+            f.write(lines)
+
+
+class Tracer:
+    def __init__(self, exporter, sample_rate: float = 1.0, export_interval: float = EXPORT_INTERVAL_SECONDS):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.export_interval = export_interval
+        self._pending: List[Span] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.export_interval + 5)
+        while self.flush():
+            pass
+        shutdown = getattr(self.exporter, "shutdown", None)
+        if shutdown:
+            shutdown()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.export_interval):
+            self.flush()
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None,
+                   parent: Optional[Span] = None, trace_id: Optional[str] = None,
+                   parent_id: Optional[str] = None, sampled: Optional[bool] = None) -> Span:
+        """A span below parent (default: the current span), or the root of a new trace."""
+        parent = parent if parent is not None else _current.get()
+        inherited = {}
+        if parent is not None:
+            trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+            inherited = {k: parent.attributes[k] for k in INHERITED_ATTRIBUTES if k in parent.attributes}
+        if sampled is None:
+            sampled = random.random() < self.sample_rate
+        span = Span(name, trace_id or _new_id(16), parent_id, sampled, inherited)
+        if attributes:
+            span.set_attributes(attributes)
+        return span
+
+    def end_span(self, span: Span, end: Optional[float] = None) -> None:
+        """end is a time.perf_counter() reading; default now."""
+        span.duration_ms = round(((end or time.perf_counter()) - span._start) * 1000, 3)
+        if not span.sampled:
+            return
+        with self._lock:
+            self._pending.append(span)
+            if len(self._pending) > MAX_PENDING_SPANS:
+                del self._pending[:len(self._pending) - MAX_PENDING_SPANS]
+
+    def flush(self) -> int:
+        """Export buffered spans. Returns spans exported; on failure they stay buffered."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending[:EXPORT_BATCH_SIZE], self._pending[EXPORT_BATCH_SIZE:]
+            if not batch:
+                return 0
+            try:
+                self.exporter.export(batch)
+                return len(batch)
+            except Exception as e:
+                log.warning("Failed to export %d spans: %s", len(batch), e)
+                with self._lock:
+                    self._pending[:0] = batch
+                return 0
+
+
+def set_tracer(tracer: Optional[Tracer]) -> None:
+    global _tracer
+    _tracer = tracer
+
+
+def current_span():
+    return _current.get() or NOOP_SPAN
+
+
+@contextmanager
+def span(name: str, attributes: Optional[Dict[str, Any]] = None, **start_args) -> Iterator[Any]:
+    """Time the block as a child of the current span; exceptions mark it as failed."""
+    if _tracer is None:
+        yield NOOP_SPAN
+        return
+    current = _tracer.start_span(name, attributes, **start_args)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_error(e)
+        raise
+    finally:
+        _current.reset(token)
+        _tracer.end_span(current)
+
+
+def traced(name: str):
+    """Decorator form of span() for whole functions (sync only)."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def set_project_attributes(project_id: Optional[str] = None, phase: Optional[int] = None,
+                           step: Optional[int] = None) -> None:
+    """Tag the current span, and every span opened below it from now on, with the project."""
+    current_span().set_attributes({"project.id": project_id, "project.phase": phase, "project.step": step})
+
+
+# --- Supabase ---
+
+DB_OPERATIONS = ("select", "insert", "update", "upsert", "delete")
+
+
+class TracedSupabase:
+    """Supabase client whose query builders open a span on execute()."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name: str) -> "_TracedQuery":
+        return _TracedQuery(self._client.table(name), name, None)
+
+    from_ = table
+
+    def rpc(self, name: str, params: Optional[Dict] = None, *args, **kwargs) -> "_TracedQuery":
+        return _TracedQuery(self._client.rpc(name, params, *args, **kwargs), name, "rpc")
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+
+class _TracedQuery:
+    __slots__ = ("_builder", "_table", "_operation")
+
+    def __init__(self, builder, table: str, operation: Optional[str]):
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+
+    def execute(self):
+        with span(f"supabase {self._operation or 'query'} {self._table}", {
+            "db.system": "postgresql",
+            "db.collection.name": self._table,
+            "db.operation.name": self._operation,
+        }) as current:
+            result = self._builder.execute()
+            data = getattr(result, "data", None)
+            if isinstance(data, list):
+                current.set_attribute("db.response.rows", len(data))
+            return result
+
+    def __getattr__(self, name: str) -> Any:
+        value = getattr(self._builder, name)
+        operation = self._operation or (name if name in DB_OPERATIONS else None)
+        if not callable(value):
+            # Builder-valued properties such as .not_
+            return _TracedQuery(value, self._table, operation) if hasattr(value, "execute") else value
+
+        def call(*args, **kwargs):
+            result = value(*args, **kwargs)
+            return _TracedQuery(result, self._table, operation) if hasattr(result, "execute") else result
+        return call
+
+
+# --- ASGI ---
+
+def _parse_traceparent(header: str):
+    """(trace_id, parent_id, sampled) from a W3C traceparent header, or None."""
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+class TracingMiddleware:
+    """One root span per HTTP request, named after the matched route.
+
+    The span ends when the last body chunk is sent; background tasks that run
+    after the response get their own spans below it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if (_tracer is None or scope["type"] != "http"
+                or path in UNTRACED_PATHS or path.endswith(UNTRACED_SUFFIXES)):
+            await self.app(scope, receive, send)
+            return
+
+        remote = None
+        for key, value in scope.get("headers", []):
+            if key == b"traceparent":
+                remote = _parse_traceparent(value.decode("latin-1"))
+                break
+        trace_id, parent_id, sampled = remote or (None, None, None)
+        method = scope.get("method", "GET")
+        current = _tracer.start_span(f"{method} {path}", {"http.request.method": method, "url.path": path},
+                                     trace_id=trace_id, parent_id=parent_id, sampled=sampled)
+        response = {}
+
+        async def send_and_watch(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body"):
+                response["end"] = time.perf_counter()
+            await send(message)
+
+        token = _current.set(current)
+        try:
+            await self.app(scope, receive, send_and_watch)
+        except BaseException as e:
+            current.record_error(e)
+            raise
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            if route is not None and hasattr(route, "path"):
+                current.name = f"{method} {route.path}"
+                current.set_attribute("http.route", route.path)
+            code = response.get("status")
+            current.set_attribute("http.response.status_code", code)
+            if code and code >= 500:
+                current.status = "ERROR"
+            _tracer.end_span(current, response.get("end"))
+
+
+def tracer_from_env() -> Optional[Tracer]:
+    """The Tracer described by TRACE_EXPORTER, or None when tracing is off."""
+    exporter_name = os.environ.get("TRACE_EXPORTER", "").strip()
+    if not exporter_name:
+        return None
+    if exporter_name == "file":
+        exporter = JsonlFileExporter(os.environ.get("TRACE_FILE_PATH", "/tmp/founderlab_traces.jsonl"))
+    else:
+        module_name, _, factory = exporter_name.partition(":")
+        exporter = getattr(importlib.import_module(module_name), factory or "exporter")()
+    sample_rate = float(os.environ.get("TRACE_SAMPLE_RATE", "1"))
+    return Tracer(exporter, sample_rate=sample_rate)
@@ -0,0 +1,174 @@
+"""Token and cost accounting for LLM calls, and the per-user daily quota.
+
+The gateway reports every completion here. Who it was for (user, project,
+phase) comes from the request's usage scope, set by the endpoint with
+set_usage_scope() and inherited by its background tasks. Rows are buffered
+and inserted into llm_usage in batches by a background thread, so
+recording never adds a database round trip to a request.
+
+The quota (LLM_DAILY_TOKEN_QUOTA, tokens per user per UTC day, unset = no
+quota) is checked from llm_usage plus the tokens this process has recorded
+since it last read the table.
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from llm_routing import estimate_cost
+
+log = logging.getLogger(__name__)
+
+_scope: ContextVar[Dict[str, Any]] = ContextVar("llm_usage_scope", default={})
+
+FLUSH_INTERVAL_SECONDS = 5.0
+FLUSH_BATCH_SIZE = 500
+# Rows kept while the database is unreachable; the oldest are dropped beyond this
+MAX_PENDING_ROWS = 10_000
+# How long a user's token total read from llm_usage is trusted
+QUOTA_REFRESH_SECONDS = 30.0
+
+GROUP_DIMENSIONS = ("day", "user_id", "project_id", "phase", "site", "model")
+SUM_FIELDS = ("calls", "prompt_tokens", "completion_tokens", "latency_ms", "cost_usd")
+# Rows per llm_usage_rollup call; at or below PostgREST's max-rows (1000 on Supabase)
+ROLLUP_PAGE_SIZE = 1000
+
+
+def set_usage_scope(**fields: Any) -> None:
+    """Attribute the rest of this request's LLM calls (and its background tasks') to these fields."""
+    _scope.set({**_scope.get(), **fields})
+
+
+def usage_scope() -> Dict[str, Any]:
+    return _scope.get()
+
+
+def _utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _start_of_day(day: date) -> datetime:
+    return datetime.combine(day, dt_time.min, tzinfo=timezone.utc)
+
+
+class UsageRecorder:
+    def __init__(self, client, table: str = "llm_usage", flush_interval: float = FLUSH_INTERVAL_SECONDS):
+        self.client = client
+        self.table = table
+        self.flush_interval = flush_interval
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # user_id -> (day, tokens read from llm_usage, read at, tokens recorded here since)
+        self._user_tokens: Dict[str, list] = {}
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="llm-usage-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def record(self, site: str, model: str, response: Any, latency: float) -> None:
+        """Gateway hook: one completed call."""
+        usage = getattr(response, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        scope = usage_scope()
+        row = {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "user_id": scope.get("user_id"),
+            "project_id": scope.get("project_id"),
+            "phase": scope.get("phase"),
+            "site": site,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latency_ms": int(latency * 1000),
+            "cost_usd": round(estimate_cost(model, prompt_tokens, completion_tokens), 6),
+        }
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) > MAX_PENDING_ROWS:
+                del self._pending[:len(self._pending) - MAX_PENDING_ROWS]
+            entry = self._user_tokens.get(row["user_id"])
+            if entry and entry[0] == _utc_today():
+                entry[3] += prompt_tokens + completion_tokens
+
+    def flush(self) -> int:
+        """Insert buffered rows. Returns rows written; on failure they stay buffered."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending[:FLUSH_BATCH_SIZE], self._pending[FLUSH_BATCH_SIZE:]
+            if not batch:
+                return 0
+            try:
+                self.client.table(self.table).insert(batch, returning="minimal").execute()
+                return len(batch)
+            except Exception as e:
+                log.warning("Failed to write %d usage rows: %s", len(batch), e)
+                with self._lock:
+                    self._pending[:0] = batch
+                return 0
+
+    def tokens_today(self, user_id: str) -> int:
+        today = _utc_today()
+        with self._lock:
+            entry = self._user_tokens.get(user_id)
+            if entry and entry[0] == today and time.monotonic() - entry[2] < QUOTA_REFRESH_SECONDS:
+                return entry[1] + entry[3]
+        result = self.client.rpc("llm_usage_tokens", {
+            "p_user_id": user_id,
+            "p_since": _start_of_day(today).isoformat(),
+        }).execute()
+        stored = int(result.data or 0)
+        with self._lock:
+            # Buffered rows aren't in the table yet
+            pending = sum(r["prompt_tokens"] + r["completion_tokens"]
+                          for r in self._pending if r["user_id"] == user_id)
+            self._user_tokens[user_id] = [today, stored + pending, time.monotonic(), 0]
+        return stored + pending
+
+
+def rollup_usage(client, since: datetime, until: datetime, group_by: Iterable[str]) -> List[Dict[str, Any]]:
+    """Usage between since and until, summed over the given dimensions (see GROUP_DIMENSIONS).
+
+    Grouped in SQL (migrations/007) and read in pages: PostgREST caps the rows an
+    RPC returns, so a single call would silently drop groups on a busy window.
+    """
+    keys = tuple(group_by)
+    result = []
+    while True:
+        page = client.rpc("llm_usage_rollup", {
+            "p_since": since.isoformat(),
+            "p_until": until.isoformat(),
+            "p_group_by": list(keys),
+            "p_limit": ROLLUP_PAGE_SIZE,
+            "p_offset": len(result),
+        }).execute().data or []
+        for row in page:
+            totals = {field: float(row[field] or 0) if field == "cost_usd" else int(row[field] or 0)
+                      for field in SUM_FIELDS}
+            totals["cost_usd"] = round(totals["cost_usd"], 6)
+            result.append({**{k: row.get(k) for k in keys}, **totals})
+        if len(page) < ROLLUP_PAGE_SIZE:
+            break
+    return sorted(result, key=lambda e: e["cost_usd"], reverse=True)
+
+
+def usage_window(days: int) -> tuple:
+    """(since, until) covering the last `days` UTC days including today."""
+    until = _start_of_day(_utc_today() + timedelta(days=1))
+    return until - timedelta(days=days), until
@@ -18,6 +18,8 @@ import { Loader2 } from 'lucide-react';
 // Apply theme immediately on load (before React renders)
 applyTheme();
 
+const PROJECTS_PAGE_SIZE = 50;
+
 function AppContent() {
   const [projects, setProjects] = useState([]);
   const { user, loading } = useAuth();
@@ -68,9 +70,17 @@ function AppContent() {
 
   const loadProjects = async () => {
     try {
-      const response = await api.get('/api/projects');
-      const backendProjects = response.data.projects || [];
+      // First page renders right away; later pages are appended as they arrive
+      let response = await api.get('/api/projects', { params: { limit: PROJECTS_PAGE_SIZE } });
+      let backendProjects = response.data.projects || [];
       setProjects(backendProjects);
+      while (response.data.next_cursor) {
+        response = await api.get('/api/projects', {
+          params: { limit: PROJECTS_PAGE_SIZE, cursor: response.data.next_cursor },
+        });
+        backendProjects = [...backendProjects, ...(response.data.projects || [])];
+        setProjects(backendProjects);
+      }
       localStorage.setItem('founderlab_projects', JSON.stringify(backendProjects));
     } catch (error) {
       console.error('Error loading projects from API, falling back to localStorage:', error);
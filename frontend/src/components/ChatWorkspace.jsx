@@ -1,6 +1,8 @@
 import React, { useState, useEffect, useRef, useCallback } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import api from '../lib/api';
+import { patchCanvas } from '../lib/canvas';
+import { subscribeProjectEvents } from '../lib/events';
 import ChatInterface from './ChatInterface';
 import CanvasView from './CanvasView';
 import DocumentsPanel from './DocumentsPanel';
@@ -97,6 +99,9 @@ function ChatWorkspace({ projects, onUpdateProject }) {
   const saveTimer = useRef(null);
   const canvasRef = useRef(canvasState);
   const projectIdRef = useRef(projectId);
+  // Last canvas persisted to the backend and its version, for delta saves
+  const savedCanvasRef = useRef({ nodes: [], edges: [] });
+  const canvasVersionRef = useRef(0);
 
   useEffect(() => { canvasRef.current = canvasState; }, [canvasState]);
   useEffect(() => { projectIdRef.current = projectId; }, [projectId]);
@@ -143,12 +148,10 @@ function ChatWorkspace({ projects, onUpdateProject }) {
     }
 
     saveTimer.current = setTimeout(() => {
+      saveTimer.current = null;
       if (canvasState.nodes.length > 0) {
-        api.post('/api/canvas', {
-          project_id: projectId,
-          nodes: canvasState.nodes,
-          edges: canvasState.edges,
-        }).catch((err) => console.error('Error saving canvas:', err));
+        saveCanvas(projectId, canvasState)
+          .catch((err) => console.error('Error saving canvas:', err));
       }
     }, 800);
 
@@ -167,19 +170,41 @@ function ChatWorkspace({ projects, onUpdateProject }) {
       const canvas = canvasRef.current;
       const pid = projectIdRef.current;
       if (canvas && canvas.nodes.length > 0 && pid) {
-        api.post('/api/canvas', {
-          project_id: pid,
-          nodes: canvas.nodes,
-          edges: canvas.edges,
-        }).catch(() => {});
+        saveCanvas(pid, canvas).catch(() => {});
       }
     };
   }, []);
 
+  // Pick up canvas changes made by other sessions or server-side steps
+  useEffect(() => {
+    if (!projectId) return undefined;
+    return subscribeProjectEvents(projectId, {
+      canvas_patched: async ({ canvas_version: version }) => {
+        // Our own saves already advanced the ref; skip while local edits are pending
+        if (version <= canvasVersionRef.current || saveTimer.current) return;
+        try {
+          const { data } = await api.get(`/api/canvas/${projectId}`);
+          const { canvas_version: latest, ...canvas } = data;
+          if (latest <= canvasVersionRef.current) return;
+          savedCanvasRef.current = canvas;
+          canvasVersionRef.current = latest;
+          setCanvasState(canvas);
+        } catch (err) {
+          console.error('Error refreshing canvas:', err);
+        }
+      },
+    });
+  }, [projectId]);
+
+  const saveCanvas = async (pid, canvas) => {
+    canvasVersionRef.current = await patchCanvas(pid, savedCanvasRef.current, canvas, canvasVersionRef.current);
+    savedCanvasRef.current = canvas;
+  };
+
   const loadProject = async () => {
     try {
-      const response = await api.get(`/api/projects/${projectId}`);
-      const { project, messages: projectMessages } = response.data;
+      const response = await api.get(`/api/projects/${projectId}/workspace`);
+      const { project, messages: projectMessages, canvas: projectCanvas, prd } = response.data;
 
       setProjectName(project.name);
       setPhase(project.phase);
@@ -204,14 +229,12 @@ function ChatWorkspace({ projects, onUpdateProject }) {
         ]);
       }
 
-      if (project.canvas_state) {
-        try {
-          const canvas = JSON.parse(project.canvas_state);
-          // Fix edge handles for existing projects with incorrect data
-          setCanvasState(fixEdgeHandles(canvas));
-        } catch (e) {
-          console.error('Error parsing canvas state:', e);
-        }
+      if (projectCanvas) {
+        const { canvas_version: canvasVersion, ...canvas } = projectCanvas;
+        savedCanvasRef.current = canvas;
+        canvasVersionRef.current = canvasVersion || 0;
+        // Fix edge handles for existing projects with incorrect data
+        setCanvasState(fixEdgeHandles(canvas));
       }
 
       // Check if ideation_pillars exist and phase is 1 — show Continue button on refresh
@@ -391,21 +414,12 @@ function ChatWorkspace({ projects, onUpdateProject }) {
 
       // Phase 4+: check if PRD already exists, or trigger generation
       if (project.phase >= 4) {
-        try {
-          const docsResponse = await api.get(`/api/documents/${projectId}`);
-          const docs = docsResponse.data.documents || [];
-          const hasPrd = docs.some(d => d.doc_type === 'prd');
-          if (hasPrd) {
-            setPrdGenerated(true);
-            setIsPrdGenerating(false);
-          } else if (project.phase === 4) {
-            // PRD not yet generated — trigger it (only in Phase 4)
-            triggerPrdGeneration(projectId);
-          }
-        } catch (_) {
-          if (project.phase === 4) {
-            triggerPrdGeneration(projectId);
-          }
+        if (prd?.generated) {
+          setPrdGenerated(true);
+          setIsPrdGenerating(false);
+        } else if (project.phase === 4) {
+          // PRD not yet generated — trigger it (only in Phase 4)
+          triggerPrdGeneration(projectId);
         }
       } else {
         setPrdGenerated(false);
@@ -529,7 +543,12 @@ function ChatWorkspace({ projects, onUpdateProject }) {
         }, 500);
       }
 
-      if (response.data.canvas_updates && response.data.canvas_updates.length > 0) {
+      if (response.data.canvas_state) {
+        // Backend already applied and saved the updates — adopt its canvas as the saved baseline
+        savedCanvasRef.current = response.data.canvas_state;
+        canvasVersionRef.current = response.data.canvas_version ?? canvasVersionRef.current;
+        setCanvasState(response.data.canvas_state);
+      } else if (response.data.canvas_updates && response.data.canvas_updates.length > 0) {
         setCanvasState((prev) => {
           let newNodes = [...prev.nodes];
           let newEdges = [...prev.edges];
@@ -67,7 +67,19 @@ function Settings() {
     setDeleteSuccess('');
     try {
       const response = await api.post('/api/account/delete-data');
-      const { deleted } = response.data;
+      let { deleted } = response.data;
+
+      // Large accounts are purged in the background — poll until the job finishes
+      if (response.data.job_id) {
+        let job = response.data;
+        while (job.status === 'pending' || job.status === 'running') {
+          setDeleteSuccess(`Deleting… ${job.deleted.projects} of ${job.total_projects} projects`);
+          await new Promise((resolve) => setTimeout(resolve, 1000));
+          job = (await api.get(`/api/account/purge-jobs/${job.job_id}`)).data;
+        }
+        if (job.status === 'failed') throw new Error(job.error || 'Failed to delete data. Please try again.');
+        deleted = job.deleted;
+      }
 
       // Clear local caches
       localStorage.removeItem('founderlab_projects');
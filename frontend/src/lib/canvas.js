@@ -0,0 +1,59 @@
+import api from './api';
+
+const sameItem = (a, b) => JSON.stringify(a) === JSON.stringify(b);
+
+/**
+ * Node/edge-level ops that turn `prev` into `next` (see backend/canvas.py).
+ */
+export function diffCanvas(prev, next) {
+  const ops = [];
+  const diffList = (before = [], after = [], key, upsertOp, deleteOp) => {
+    const beforeById = new Map(before.map((item) => [item.id, item]));
+    const afterIds = new Set();
+    for (const item of after) {
+      afterIds.add(item.id);
+      const old = beforeById.get(item.id);
+      if (!old || !sameItem(old, item)) ops.push({ op: upsertOp, [key]: item });
+    }
+    for (const id of beforeById.keys()) {
+      if (!afterIds.has(id)) ops.push({ op: deleteOp, id });
+    }
+  };
+  diffList(prev?.nodes, next.nodes, 'node', 'upsert_node', 'delete_node');
+  diffList(prev?.edges, next.edges, 'edge', 'upsert_edge', 'delete_edge');
+  return ops;
+}
+
+// Matches MAX_OPS_PER_PATCH in backend/canvas.py; larger diffs go out in several PATCHes
+export const MAX_OPS_PER_PATCH = 500;
+
+/**
+ * PATCH one batch of ops. On a version conflict (another tab or a
+ * server-side step wrote first) the same ops are rebased once onto the
+ * current version — node-level upserts/deletes are last-writer-wins.
+ */
+async function sendOps(projectId, ops, version) {
+  try {
+    const res = await api.patch(`/api/canvas/${projectId}`, { canvas_version: version, ops });
+    return res.data.canvas_version;
+  } catch (err) {
+    const current = err.response?.status === 409 ? err.response.data?.detail?.canvas_version : null;
+    if (current === null || current === undefined) throw err;
+    const res = await api.patch(`/api/canvas/${projectId}`, { canvas_version: current, ops });
+    return res.data.canvas_version;
+  }
+}
+
+/**
+ * Send only the changes since the last save, at most MAX_OPS_PER_PATCH ops
+ * per request. Every op is idempotent, so if a later batch fails the next
+ * save simply sends the whole diff again. Returns the new canvas_version.
+ */
+export async function patchCanvas(projectId, lastSaved, canvas, version) {
+  const ops = diffCanvas(lastSaved, canvas);
+  let current = version;
+  for (let start = 0; start < ops.length; start += MAX_OPS_PER_PATCH) {
+    current = await sendOps(projectId, ops.slice(start, start + MAX_OPS_PER_PATCH), current);
+  }
+  return current;
+}
@@ -0,0 +1,57 @@
+import api from './api';
+
+const API_URL = import.meta.env.VITE_BACKEND_URL || '';
+
+const EVENT_TYPES = ['section_ready', 'pdf_ready', 'step_options_ready', 'canvas_patched'];
+
+/**
+ * Subscribe to a project's server-sent events (see /api/projects/{id}/events).
+ * `handlers` maps event type -> callback(data). Reconnects with a fresh ticket
+ * after errors. Returns an unsubscribe function.
+ */
+export function subscribeProjectEvents(projectId, handlers) {
+  let source = null;
+  let retryTimer = null;
+  let closed = false;
+
+  const connect = async () => {
+    // EventSource can't send an Authorization header; a short-lived ticket goes in the
+    // query instead, so the access token never appears in a URL (or an access log)
+    let ticket;
+    try {
+      ({ data: { ticket } } = await api.post(`/api/projects/${projectId}/events/ticket`));
+    } catch (err) {
+      if (!closed) retryTimer = setTimeout(connect, 3000);
+      return;
+    }
+    if (closed) return;
+
+    const params = new URLSearchParams({ ticket });
+    source = new EventSource(`${API_URL}/api/projects/${projectId}/events?${params}`);
+
+    for (const type of EVENT_TYPES) {
+      if (!handlers[type]) continue;
+      source.addEventListener(type, (e) => {
+        try {
+          handlers[type](JSON.parse(e.data));
+        } catch (err) {
+          console.error(`Error handling ${type} event:`, err);
+        }
+      });
+    }
+
+    source.onerror = () => {
+      // The browser would retry with the same (soon expired) ticket — reconnect ourselves
+      source.close();
+      if (!closed) retryTimer = setTimeout(connect, 3000);
+    };
+  };
+
+  connect();
+
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    if (source) source.close();
+  };
+}
@@ -0,0 +1,110 @@
+-- ============================================
+-- 001: JSON-text project columns -> JSONB, with field-level patch RPC
+--
+-- The backend used to store canvas_state, phase_summaries, mindmap_data,
+-- prd_draft, ideation_pillars and feature_data as JSON strings, so every
+-- edit read the whole row, re-parsed it and wrote the whole blob back.
+-- After this migration the backend sends only the changed path + value to
+-- patch_project_json(), which applies it with jsonb_set under the row lock.
+--
+-- Safe to re-run.
+-- ============================================
+
+-- 1. Columns the server already uses but the original setup script never declared
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS user_id UUID;
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT NOW();
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS phase_summaries JSONB;
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS mindmap_data JSONB;
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS prd_draft JSONB;
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS ideation_pillars JSONB;
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS feature_data JSONB;
+
+-- 2. Convert any remaining TEXT columns in place (empty strings become NULL)
+DO $$
+DECLARE
+    col TEXT;
+BEGIN
+    FOREACH col IN ARRAY ARRAY['canvas_state', 'phase_summaries', 'mindmap_data', 'prd_draft', 'ideation_pillars', 'feature_data'] LOOP
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'projects' AND column_name = col AND data_type IN ('text', 'json', 'character varying')
+        ) THEN
+            EXECUTE format(
+                'ALTER TABLE projects ALTER COLUMN %I TYPE JSONB USING NULLIF(btrim(%I::text), '''')::jsonb',
+                col, col
+            );
+        END IF;
+    END LOOP;
+END $$;
+
+-- 3. updated_at doubles as the project version (used to memoize derived data),
+--    so every write bumps it, not only the ones that remember to set it.
+CREATE OR REPLACE FUNCTION projects_touch_updated_at()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.updated_at := clock_timestamp();
+    RETURN NEW;
+END $$;
+
+DROP TRIGGER IF EXISTS trg_projects_touch_updated_at ON projects;
+CREATE TRIGGER trg_projects_touch_updated_at
+    BEFORE UPDATE ON projects
+    FOR EACH ROW EXECUTE FUNCTION projects_touch_updated_at();
+
+-- 4. jsonb_set that also creates missing intermediate objects
+CREATE OR REPLACE FUNCTION jsonb_set_deep(target JSONB, path TEXT[], new_value JSONB)
+RETURNS JSONB LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+    depth INT := COALESCE(array_length(path, 1), 0);
+    i INT;
+BEGIN
+    IF depth = 0 THEN
+        RETURN new_value;
+    END IF;
+    target := COALESCE(target, '{}'::jsonb);
+    FOR i IN 1..depth - 1 LOOP
+        IF target #> path[1:i] IS NULL THEN
+            target := jsonb_set(target, path[1:i], '{}'::jsonb, true);
+        END IF;
+    END LOOP;
+    RETURN jsonb_set(target, path, new_value, true);
+END $$;
+
+-- 5. Apply a batch of field-level patches atomically.
+--    p_patches: [{"column": "...", "path": ["a", "b"], "value": <json>, "create_parents": true}, ...]
+--    With create_parents = false the patch is skipped unless the parent exists
+--    (and, for arrays, the index is in range) — used for edits to existing items.
+CREATE OR REPLACE FUNCTION patch_project_json(p_project_id UUID, p_patches JSONB)
+RETURNS VOID LANGUAGE plpgsql AS $$
+DECLARE
+    patch JSONB;
+    col TEXT;
+    path TEXT[];
+    depth INT;
+    parent JSONB;
+    doc JSONB;
+BEGIN
+    FOR patch IN SELECT * FROM jsonb_array_elements(p_patches) LOOP
+        col := patch->>'column';
+        IF col NOT IN ('canvas_state', 'phase_summaries', 'mindmap_data', 'prd_draft', 'ideation_pillars', 'feature_data') THEN
+            RAISE EXCEPTION 'Column % is not patchable', col;
+        END IF;
+        path := ARRAY(SELECT jsonb_array_elements_text(COALESCE(patch->'path', '[]'::jsonb)));
+        depth := COALESCE(array_length(path, 1), 0);
+
+        IF COALESCE((patch->>'create_parents')::BOOLEAN, TRUE) OR depth = 0 THEN
+            EXECUTE format('UPDATE projects SET %I = jsonb_set_deep(%I, $1, $2) WHERE id = $3', col, col)
+                USING path, patch->'value', p_project_id;
+        ELSE
+            EXECUTE format('SELECT %I #> $1 FROM projects WHERE id = $2 FOR UPDATE', col)
+                INTO parent USING path[1:depth - 1], p_project_id;
+            CONTINUE WHEN parent IS NULL;
+            CONTINUE WHEN jsonb_typeof(parent) = 'array'
+                AND (path[depth] !~ '^\d+$' OR path[depth]::INT >= jsonb_array_length(parent));
+            EXECUTE format('UPDATE projects SET %I = jsonb_set(%I, $1, $2, true) WHERE id = $3', col, col)
+                USING path, patch->'value', p_project_id;
+        END IF;
+    END LOOP;
+END $$;
+
+GRANT EXECUTE ON FUNCTION patch_project_json(UUID, JSONB) TO service_role;
@@ -0,0 +1,43 @@
+-- ============================================
+-- 002: Versioned canvas for optimistic concurrency
+--
+-- canvas_version increments whenever canvas_state actually changes, no matter
+-- which code path wrote it. Clients send the version they last saw with a
+-- canvas patch; replace_canvas() only writes if it still matches.
+--
+-- Safe to re-run.
+-- ============================================
+
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS canvas_version INTEGER NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION projects_bump_canvas_version()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    IF NEW.canvas_state IS DISTINCT FROM OLD.canvas_state THEN
+        NEW.canvas_version := OLD.canvas_version + 1;
+    END IF;
+    RETURN NEW;
+END $$;
+
+DROP TRIGGER IF EXISTS trg_projects_bump_canvas_version ON projects;
+CREATE TRIGGER trg_projects_bump_canvas_version
+    BEFORE UPDATE OF canvas_state ON projects
+    FOR EACH ROW EXECUTE FUNCTION projects_bump_canvas_version();
+
+-- Compare-and-swap write of the whole canvas.
+-- Returns the new canvas_version, or NULL when p_base_version is stale
+-- (pass NULL as p_base_version for an unconditional write).
+CREATE OR REPLACE FUNCTION replace_canvas(p_project_id UUID, p_base_version INTEGER, p_canvas JSONB)
+RETURNS INTEGER LANGUAGE plpgsql AS $$
+DECLARE
+    new_version INTEGER;
+BEGIN
+    UPDATE projects
+    SET canvas_state = p_canvas
+    WHERE id = p_project_id
+      AND (p_base_version IS NULL OR canvas_version = p_base_version)
+    RETURNING canvas_version INTO new_version;
+    RETURN new_version;
+END $$;
+
+GRANT EXECUTE ON FUNCTION replace_canvas(UUID, INTEGER, JSONB) TO service_role;
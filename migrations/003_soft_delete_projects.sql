@@ -0,0 +1,14 @@
+-- ============================================
+-- 003: Soft-deleted projects
+--
+-- DELETE /api/projects/{id} only stamps deleted_at. Deleted projects are
+-- hidden from every read, and the backend sweeper purges their documents,
+-- messages and rows in batches.
+--
+-- Safe to re-run.
+-- ============================================
+
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMPTZ;
+
+-- The sweeper's queue: small, since rows leave it as soon as they're purged
+CREATE INDEX IF NOT EXISTS idx_projects_deleted_at ON projects(deleted_at) WHERE deleted_at IS NOT NULL;
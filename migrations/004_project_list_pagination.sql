@@ -0,0 +1,79 @@
+-- ============================================
+-- 004: Paginated project list with denormalized counters
+--
+-- GET /api/projects pages with a keyset cursor on (updated_at, id), served
+-- by a composite index. message_count and has_prd are maintained by
+-- statement-level triggers so the dashboard never queries per project.
+--
+-- Safe to re-run.
+-- ============================================
+
+-- 1. Keyset index for the dashboard list (live projects only)
+CREATE INDEX IF NOT EXISTS idx_projects_user_updated
+    ON projects(user_id, updated_at DESC, id DESC)
+    WHERE deleted_at IS NULL;
+
+-- 2. Counters
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS message_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS has_prd BOOLEAN NOT NULL DEFAULT FALSE;
+
+UPDATE projects p SET message_count = c.n
+FROM (SELECT project_id, COUNT(*) AS n FROM messages GROUP BY project_id) c
+WHERE c.project_id = p.id AND p.message_count IS DISTINCT FROM c.n;
+
+UPDATE projects p SET has_prd = TRUE
+WHERE NOT p.has_prd AND EXISTS (SELECT 1 FROM documents d WHERE d.project_id = p.id AND d.doc_type = 'prd');
+
+-- 3. message_count: one UPDATE per statement, not per message row,
+--    so bulk purges don't rewrite the project row once per message
+CREATE OR REPLACE FUNCTION messages_count_inserted()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE projects p SET message_count = p.message_count + c.n
+    FROM (SELECT project_id, COUNT(*) AS n FROM new_rows GROUP BY project_id) c
+    WHERE p.id = c.project_id;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION messages_count_deleted()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE projects p SET message_count = GREATEST(p.message_count - c.n, 0)
+    FROM (SELECT project_id, COUNT(*) AS n FROM old_rows GROUP BY project_id) c
+    WHERE p.id = c.project_id;
+    RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS trg_messages_count_inserted ON messages;
+CREATE TRIGGER trg_messages_count_inserted
+    AFTER INSERT ON messages
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION messages_count_inserted();
+
+DROP TRIGGER IF EXISTS trg_messages_count_deleted ON messages;
+CREATE TRIGGER trg_messages_count_deleted
+    AFTER DELETE ON messages
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION messages_count_deleted();
+
+-- 4. has_prd: recomputed for the projects a documents statement touched
+CREATE OR REPLACE FUNCTION documents_refresh_has_prd()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE projects p
+    SET has_prd = EXISTS (SELECT 1 FROM documents d WHERE d.project_id = p.id AND d.doc_type = 'prd')
+    WHERE p.id IN (SELECT project_id FROM changed_rows);
+    RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS trg_documents_has_prd_inserted ON documents;
+CREATE TRIGGER trg_documents_has_prd_inserted
+    AFTER INSERT ON documents
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION documents_refresh_has_prd();
+
+DROP TRIGGER IF EXISTS trg_documents_has_prd_deleted ON documents;
+CREATE TRIGGER trg_documents_has_prd_deleted
+    AFTER DELETE ON documents
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION documents_refresh_has_prd();
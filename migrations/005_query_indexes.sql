@@ -0,0 +1,23 @@
+-- ============================================
+-- 005: Composite indexes for the hot read paths
+--
+-- Chat history:  messages WHERE project_id = ? AND phase = ? ORDER BY created_at
+-- PRD lookup:    documents WHERE project_id = ? AND doc_type = ?
+-- Dashboard:     projects WHERE user_id = ? ORDER BY updated_at DESC  (see 004)
+--
+-- Also declares the messages columns the server writes but the baseline
+-- setup script never created.
+--
+-- Safe to re-run.
+-- ============================================
+
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS phase INTEGER DEFAULT 1;
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS metadata JSONB;
+
+-- One index serves both the filter and the sort, so no separate sort step
+CREATE INDEX IF NOT EXISTS idx_messages_project_phase_created ON messages(project_id, phase, created_at);
+CREATE INDEX IF NOT EXISTS idx_documents_project_doc_type ON documents(project_id, doc_type);
+
+-- Left prefixes of the indexes above — redundant, and they cost every insert
+DROP INDEX IF EXISTS idx_messages_project_id;
+DROP INDEX IF EXISTS idx_documents_project_id;
@@ -0,0 +1,61 @@
+-- ============================================
+-- 006: LLM token and cost accounting
+--
+-- One row per OpenAI completion, written in batches by the backend
+-- (backend/usage.py). No foreign keys: usage outlives purged projects.
+-- Only the service role reads or writes it (RLS on, no policies).
+--
+-- Safe to re-run.
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS llm_usage (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    user_id UUID,
+    project_id UUID,
+    phase INTEGER,
+    site TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    latency_ms INTEGER NOT NULL DEFAULT 0,
+    cost_usd NUMERIC(12, 6) NOT NULL DEFAULT 0
+);
+
+ALTER TABLE llm_usage ENABLE ROW LEVEL SECURITY;
+
+-- Daily quota lookups and per-user rollups
+CREATE INDEX IF NOT EXISTS idx_llm_usage_user_created ON llm_usage(user_id, created_at);
+-- Admin rollups over a time range
+CREATE INDEX IF NOT EXISTS idx_llm_usage_created ON llm_usage(created_at);
+
+-- Tokens a user has used since p_since (the daily quota check)
+CREATE OR REPLACE FUNCTION llm_usage_tokens(p_user_id UUID, p_since TIMESTAMPTZ)
+RETURNS BIGINT LANGUAGE sql STABLE AS $$
+    SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0)
+    FROM llm_usage
+    WHERE user_id = p_user_id AND created_at >= p_since;
+$$;
+
+-- Usage rolled up per day, user, project, phase, site and model;
+-- /api/admin/usage regroups these rows by whichever dimensions it is asked for
+CREATE OR REPLACE FUNCTION llm_usage_rollup(p_since TIMESTAMPTZ, p_until TIMESTAMPTZ)
+RETURNS TABLE (
+    day DATE,
+    user_id UUID,
+    project_id UUID,
+    phase INTEGER,
+    site TEXT,
+    model TEXT,
+    calls BIGINT,
+    prompt_tokens BIGINT,
+    completion_tokens BIGINT,
+    latency_ms BIGINT,
+    cost_usd NUMERIC
+) LANGUAGE sql STABLE AS $$
+    SELECT (u.created_at AT TIME ZONE 'UTC')::date, u.user_id, u.project_id, u.phase, u.site, u.model,
+           COUNT(*), SUM(u.prompt_tokens), SUM(u.completion_tokens), SUM(u.latency_ms), SUM(u.cost_usd)
+    FROM llm_usage u
+    WHERE u.created_at >= p_since AND u.created_at < p_until
+    GROUP BY 1, 2, 3, 4, 5, 6;
+$$;
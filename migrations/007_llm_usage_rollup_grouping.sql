@@ -0,0 +1,50 @@
+-- ============================================
+-- 007: Group the usage rollup in SQL, in pages
+--
+-- llm_usage_rollup (006) returned one row per day, user, project, phase,
+-- site and model for the whole window and left the regrouping to the
+-- backend. PostgREST caps the rows an RPC returns (max-rows, 1000 on
+-- Supabase), so busy windows came back truncated and /api/admin/usage
+-- totals were low without any error. The function now groups by the
+-- dimensions the caller asks for (the others come back NULL) and returns
+-- one ordered page at a time; backend/usage.py reads pages until a short one.
+--
+-- Safe to re-run.
+-- ============================================
+
+DROP FUNCTION IF EXISTS llm_usage_rollup(TIMESTAMPTZ, TIMESTAMPTZ);
+
+CREATE OR REPLACE FUNCTION llm_usage_rollup(
+    p_since TIMESTAMPTZ,
+    p_until TIMESTAMPTZ,
+    p_group_by TEXT[],
+    p_limit INTEGER DEFAULT 1000,
+    p_offset INTEGER DEFAULT 0
+)
+RETURNS TABLE (
+    day DATE,
+    user_id UUID,
+    project_id UUID,
+    phase INTEGER,
+    site TEXT,
+    model TEXT,
+    calls BIGINT,
+    prompt_tokens BIGINT,
+    completion_tokens BIGINT,
+    latency_ms BIGINT,
+    cost_usd NUMERIC
+) LANGUAGE sql STABLE AS $$
+    SELECT CASE WHEN 'day' = ANY(p_group_by) THEN (u.created_at AT TIME ZONE 'UTC')::date END,
+           CASE WHEN 'user_id' = ANY(p_group_by) THEN u.user_id END,
+           CASE WHEN 'project_id' = ANY(p_group_by) THEN u.project_id END,
+           CASE WHEN 'phase' = ANY(p_group_by) THEN u.phase END,
+           CASE WHEN 'site' = ANY(p_group_by) THEN u.site END,
+           CASE WHEN 'model' = ANY(p_group_by) THEN u.model END,
+           COUNT(*), SUM(u.prompt_tokens), SUM(u.completion_tokens), SUM(u.latency_ms), SUM(u.cost_usd)
+    FROM llm_usage u
+    WHERE u.created_at >= p_since AND u.created_at < p_until
+    GROUP BY 1, 2, 3, 4, 5, 6
+    -- A stable order, so pages neither skip nor repeat groups
+    ORDER BY 1, 2, 3, 4, 5, 6
+    LIMIT p_limit OFFSET p_offset;
+$$;
@@ -0,0 +1,30 @@
+-- ============================================
+-- 008: Background account purge jobs
+--
+-- Progress of large account purges (backend/purge.py) was kept in the
+-- memory of the worker that ran the job, so with several workers a poll of
+-- /api/account/purge-jobs/{id} that reached another worker got a 404, and
+-- a restart lost the job. Jobs are now rows: the running worker updates
+-- the counts after every batch, and the sweeper marks jobs whose worker
+-- stopped updating them as failed, then drops finished jobs after a week.
+-- Only the service role reads or writes it (RLS on, no policies).
+--
+-- Safe to re-run.
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS purge_jobs (
+    id UUID PRIMARY KEY,
+    user_id UUID NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    total_projects INTEGER NOT NULL DEFAULT 0,
+    deleted JSONB NOT NULL DEFAULT '{}'::jsonb,
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMPTZ
+);
+
+ALTER TABLE purge_jobs ENABLE ROW LEVEL SECURITY;
+
+-- The sweeper's lookups of interrupted and expired jobs
+CREATE INDEX IF NOT EXISTS idx_purge_jobs_status_updated ON purge_jobs(status, updated_at);
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+FounderLab - Canvas Benchmark
+Compares CanvasGraph against the list-scan code it replaced on large canvases.
+
+Usage: python scripts/bench_canvas.py [--sizes 500,1000,2000] [--repeat 5]
+"""
+
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from canvas import CanvasGraph, apply_canvas_ops, apply_chat_canvas_updates  # noqa: E402
+
+NODE_TYPES = ["featureGroup", "userFlow", "feature", "tech", "database"]
+
+
+def make_canvas(size):
+    """Root plus `size` nodes, each wired to a random earlier node."""
+    rng = random.Random(size)
+    nodes = [{"id": "root", "type": "root", "position": {"x": 400, "y": 300}, "data": {"label": "Root"}}]
+    edges = []
+    for i in range(size):
+        node_id = f"node-{i}"
+        parent = nodes[rng.randrange(len(nodes))]["id"]
+        nodes.append({
+            "id": node_id,
+            "type": rng.choice(NODE_TYPES),
+            "position": {"x": rng.randint(0, 4000), "y": rng.randint(0, 4000)},
+            "data": {"label": f"Node {i}"},
+        })
+        edges.append({"id": f"{parent}-{node_id}", "source": parent, "target": node_id})
+    return {"nodes": nodes, "edges": edges}
+
+
+def chat_updates(count):
+    return [{
+        "action": "add_node",
+        "node": {"id": f"feature-new-{i}", "type": "featureGroup", "parentId": "root", "data": {"label": f"F{i}"}},
+    } for i in range(count)]
+
+
+# --- The list-scan patterns CanvasGraph replaced ---
+
+def legacy_add_nodes(canvas_state, updates):
+    for update in updates:
+        node = update["node"]
+        if any(n["id"] == node["id"] for n in canvas_state["nodes"]):
+            continue
+        root_node = next((n for n in canvas_state["nodes"] if n["id"] == "root"), None)
+        col = len([n for n in canvas_state["nodes"] if n.get("type") == "featureGroup"])
+        canvas_state["nodes"].append({
+            "id": node["id"],
+            "type": node["type"],
+            "position": {"x": root_node["position"]["x"] - 200 + col * 300, "y": root_node["position"]["y"] + 180},
+            "data": node["data"],
+        })
+        canvas_state["edges"].append({"id": f"root-{node['id']}", "source": "root", "target": node["id"]})
+
+
+def legacy_delete_nodes(canvas_state, node_ids):
+    nodes, edges = canvas_state["nodes"], canvas_state["edges"]
+    for node_id in node_ids:
+        nodes = [n for n in nodes if n["id"] != node_id]
+        edges = [e for e in edges if e["source"] != node_id and e["target"] != node_id]
+    return {"nodes": nodes, "edges": edges}
+
+
+def copy_canvas(canvas_state):
+    return {"nodes": list(canvas_state["nodes"]), "edges": list(canvas_state["edges"])}
+
+
+def bench(fn, repeat):
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark canvas operations")
+    parser.add_argument("--sizes", default="500,1000,2000", help="comma-separated node counts")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'nodes':>6}  {'operation':<28}{'list scan (ms)':>16}{'CanvasGraph (ms)':>18}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        canvas_state = make_canvas(size)
+        updates = chat_updates(50)
+        delete_ids = [f"node-{i}" for i in range(0, size, max(1, size // 50))]
+        delete_ops = [{"op": "delete_node", "id": i} for i in delete_ids]
+
+        rows = [
+            ("build index", None,
+             lambda: CanvasGraph(canvas_state)),
+            ("add 50 chat nodes", lambda: legacy_add_nodes(copy_canvas(canvas_state), updates),
+             lambda: apply_chat_canvas_updates(CanvasGraph(canvas_state), updates)),
+            ("delete 50 nodes + edges", lambda: legacy_delete_nodes(canvas_state, delete_ids),
+             lambda: apply_canvas_ops(canvas_state, delete_ops)),
+            ("1000 id lookups", lambda: [next((n for n in canvas_state["nodes"] if n["id"] == f"node-{i % size}"), None) for i in range(1000)],
+             lambda: (lambda g: [g.node(f"node-{i % size}") for i in range(1000)])(CanvasGraph(canvas_state))),
+        ]
+        for name, legacy, graph in rows:
+            legacy_ms = f"{bench(legacy, args.repeat):.2f}" if legacy else "-"
+            print(f"{size:>6}  {name:<28}{legacy_ms:>16}{bench(graph, args.repeat):>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+FounderLab - Model Tier Benchmark
+Replays recorded JSON prompts against each model tier and compares latency,
+token cost and how often the output passes the call site's validation.
+
+Prompts are JSONL in the format the backend writes with LLM_RECORD_PATH set;
+scripts/fixtures/recorded_prompts.jsonl has one sample per structured call site.
+Needs OPENAI_API_KEY (backend/.env or the environment). Costs real tokens.
+
+Usage: python scripts/bench_models.py [--prompts file.jsonl] [--tiers fast,large] [--repeat 3]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+root_dir = Path(__file__).parent.parent
+backend_dir = root_dir / 'backend'
+sys.path.insert(0, str(backend_dir))
+
+load_dotenv(backend_dir / '.env')
+
+from llm_routing import estimate_cost, router_from_env  # noqa: E402
+
+# Colors for terminal output
+GREEN = '\033[92m'
+RED = '\033[91m'
+YELLOW = '\033[93m'
+RESET = '\033[0m'
+
+# Mirrors the validate= checks the call sites pass to complete_json
+VALIDATORS = {
+    "complementary_features": lambda r: isinstance(r.get("features"), list),
+    "color_palettes": lambda r: len(r.get("palettes", [])) >= 3,
+    "design_styles": lambda r: len(r.get("styles", [])) >= 3,
+    "design_guidelines": lambda r: len(r.get("guidelines", [])) >= 3,
+    "tech_stack": lambda r: all(k in r for k in ("frontend", "backend", "database")),
+    "security": lambda r: all(isinstance(r.get(k), list) for k in ("frontend", "backend", "database")),
+}
+
+
+def load_prompts(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def is_valid(site, content):
+    try:
+        result = json.loads(content)
+    except (TypeError, json.JSONDecodeError):
+        return False
+    return isinstance(result, dict) and VALIDATORS.get(site, lambda r: True)(result)
+
+
+def run_once(client, record, model):
+    params = {k: v for k, v in record.items() if k not in ("site", "call_type", "model")}
+    started = time.perf_counter()
+    response = client.chat.completions.create(model=model, **params)
+    elapsed = time.perf_counter() - started
+    usage = response.usage
+    return {
+        "latency": elapsed,
+        "cost": estimate_cost(model, usage.prompt_tokens, usage.completion_tokens),
+        "tokens": usage.prompt_tokens + usage.completion_tokens,
+        "valid": is_valid(record["site"], response.choices[0].message.content),
+    }
+
+
+def summarize(runs):
+    return {
+        "p50_ms": statistics.median(r["latency"] for r in runs) * 1000,
+        "cost": statistics.mean(r["cost"] for r in runs),
+        "tokens": statistics.mean(r["tokens"] for r in runs),
+        "valid": sum(r["valid"] for r in runs) / len(runs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark model tiers on recorded prompts")
+    parser.add_argument("--prompts", default=str(root_dir / 'scripts' / 'fixtures' / 'recorded_prompts.jsonl'))
+    parser.add_argument("--tiers", default="fast,large", help="comma-separated tiers to compare")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if not os.environ.get("OPENAI_API_KEY"):
+        print(f"{RED}OPENAI_API_KEY is not set (add it to backend/.env).{RESET}")
+        sys.exit(1)
+
+    from openai import OpenAI
+
+    client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+    router = router_from_env()
+    records = load_prompts(args.prompts)
+    tiers = [t.strip() for t in args.tiers.split(",") if t.strip()]
+
+    print(f"{'site':<24}{'tier':<7}{'model':<14}{'p50 (ms)':>10}{'tokens':>9}{'$/call':>11}{'valid':>8}")
+    totals = {tier: [] for tier in tiers}
+    for record in records:
+        for tier in tiers:
+            model = router.tier_models[tier]
+            runs = []
+            for _ in range(args.repeat):
+                try:
+                    runs.append(run_once(client, record, model))
+                except Exception as e:
+                    print(f"{YELLOW}  {record['site']} on {model} failed: {e}{RESET}")
+            if not runs:
+                continue
+            totals[tier].extend(runs)
+            s = summarize(runs)
+            color = GREEN if s["valid"] == 1 else RED
+            print(f"{record['site']:<24}{tier:<7}{model:<14}{s['p50_ms']:>10.0f}{s['tokens']:>9.0f}"
+                  f"{s['cost']:>11.5f}{color}{s['valid']:>8.0%}{RESET}")
+
+    print()
+    for tier, runs in totals.items():
+        if runs:
+            s = summarize(runs)
+            print(f"{tier:<7} p50 {s['p50_ms']:.0f} ms, ${s['cost']:.5f}/call, {s['valid']:.0%} valid "
+                  f"over {len(runs)} calls")
+
+
+if __name__ == "__main__":
+    main()
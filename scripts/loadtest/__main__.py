@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+FounderLab - Load Test
+Drives concurrent simulated founders through the whole journey (project,
+phase 1-2 chat, phase 3 steps 1-5, each advance-phase, generate-prd) against
+one server worker and reports p50/p95/p99 per endpoint and journey step,
+event loop lag and the highest concurrency the worker sustains.
+
+By default the backend runs in-process in offline mode (no keys, no network)
+with injected latencies for the LLM, Supabase and Tavily. Results are written
+as JSON; pass an earlier file to --compare to fail on regressions.
+
+Usage: python scripts/loadtest [--levels 1,2,4,8,16,32] [--journeys 1]
+                               [--llm-ms 200] [--db-ms 5] [--search-ms 300]
+                               [--slo-ms 3000] [--out results.json]
+                               [--compare baseline.json] [--url http://localhost:8001]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+
+from report import compare, format_level, max_sustainable, summarize_level, write_results
+from runner import ServerThread, load_offline_app, ramp
+
+# Colors for terminal output
+GREEN = '\033[92m'
+RED = '\033[91m'
+YELLOW = '\033[93m'
+RESET = '\033[0m'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the founder journey")
+    parser.add_argument("--levels", default="1,2,4,8,16,32", help="comma-separated concurrent founders per step of the ramp")
+    parser.add_argument("--journeys", type=int, default=1, help="journeys each founder runs per level")
+    parser.add_argument("--think-ms", type=float, default=0, help="pause between a founder's requests")
+    parser.add_argument("--llm-ms", type=float, default=200, help="simulated LLM latency per call")
+    parser.add_argument("--llm-ms-per-token", type=float, default=2, help="simulated LLM latency per output token")
+    parser.add_argument("--db-ms", type=float, default=5, help="simulated Supabase latency per query")
+    parser.add_argument("--search-ms", type=float, default=300, help="simulated Tavily latency per search")
+    parser.add_argument("--slo-ms", type=float, default=3000, help="overall p95 a level must stay under to count as sustainable")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="failed journey share a level may have")
+    parser.add_argument("--keep-going", action="store_true", help="run every level even after one breaks the SLO")
+    parser.add_argument("--url", help="test a running server instead of an in-process offline one")
+    parser.add_argument("--out", default="loadtest_results.json", help="results file")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="p95 growth allowed against --compare")
+    parser.add_argument("--verbose", action="store_true", help="show the server's own output")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    levels = [int(level) for level in args.levels.split(",")]
+    run_id = f"{int(time.time())}-{os.getpid()}"
+
+    def report_level(run):
+        level = summarize_level(run, args.slo_ms, args.max_error_rate)
+        color = GREEN if level["sustainable"] else RED
+        print(f"{color}{format_level(level)[0]}{RESET}", file=sys.stderr, flush=True)
+        return level["sustainable"] or args.keep_going
+
+    # The backend logs to stdout; keep it out of the report unless asked
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with quiet:
+        server = None
+        if args.url:
+            base_url, lag = args.url.rstrip("/"), None
+        else:
+            app = load_offline_app(args.llm_ms, args.llm_ms_per_token, args.db_ms, args.search_ms)
+            server = ServerThread(app)
+            server.start()
+            base_url, lag = server.url, server.lag
+        print(f"Load testing {base_url} at concurrency {levels}", file=sys.stderr, flush=True)
+        try:
+            runs = asyncio.run(ramp(base_url, levels, args.journeys, run_id, args.think_ms, lag, report_level))
+        finally:
+            if server:
+                server.stop()
+
+    summaries = [summarize_level(run, args.slo_ms, args.max_error_rate) for run in runs]
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "target": args.url or "in-process offline",
+        "config": {
+            "journeys_per_founder": args.journeys,
+            "think_ms": args.think_ms,
+            "llm_ms": args.llm_ms,
+            "llm_ms_per_token": args.llm_ms_per_token,
+            "db_ms": args.db_ms,
+            "search_ms": args.search_ms,
+            "slo_ms": args.slo_ms,
+            "max_error_rate": args.max_error_rate,
+        },
+        "max_sustainable_concurrency": max_sustainable(summaries),
+        "levels": summaries,
+    }
+    write_results(args.out, results)
+
+    print(f"\n{'step':<44}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for level in summaries:
+        for line in format_level(level):
+            print(line)
+        for error in level["sample_errors"]:
+            print(f"    {RED}{error}{RESET}")
+    print(f"\nMax sustainable concurrency per worker: {results['max_sustainable_concurrency']} "
+          f"(p95 <= {args.slo_ms:.0f}ms, errors <= {args.max_error_rate:.0%})")
+    print(f"Results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{RED}{len(regressions)} regression(s) against {args.compare}:{RESET}")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\n{GREEN}No regressions against {args.compare}{RESET}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+One simulated founder: the full five-phase journey the frontend drives,
+as a fixed sequence of API calls.
+
+Every call is timed and recorded twice, under its endpoint (route template,
+so all projects share a key) and under its journey step ("phase3.step2").
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+IDEATION_MESSAGES = [
+    "I want to build an app that helps freelance designers track unpaid invoices.",
+    "Freelancers lose weeks chasing clients; existing tools are built for agencies.",
+    "Solo designers with 3-10 active clients, mostly paid by bank transfer.",
+]
+
+FEATURE_MESSAGES = [
+    "Automatic payment reminders that escalate politely over time.",
+    "A client portal where invoices can be paid by card.",
+    "I'm ready to move on to architecture.",
+]
+
+COMPLEMENTARY_FEATURES = ["Dark Mode", "Export to CSV", "Email Notifications"]
+
+PALETTE = {
+    "name": "Ocean Calm",
+    "colors": ["#0F172A", "#1E3A8A", "#3B82F6", "#93C5FD", "#F8FAFC"],
+    "description": "Deep blues with a light neutral",
+}
+
+
+@dataclass
+class Sample:
+    endpoint: str
+    step: str
+    latency: float
+    ok: bool
+    status: Optional[int] = None
+
+
+@dataclass
+class JourneyResult:
+    founder: int
+    samples: List[Sample] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class JourneyFailed(Exception):
+    pass
+
+
+async def _call(client, result: JourneyResult, step: str, method: str, path: str, template: str,
+                json: Any = None) -> Dict[str, Any]:
+    start = time.perf_counter()
+    status = None
+    try:
+        response = await client.request(method, path, json=json)
+        status = response.status_code
+    except Exception as e:
+        result.samples.append(Sample(f"{method} {template}", step, time.perf_counter() - start, False))
+        raise JourneyFailed(f"{step}: {type(e).__name__}: {e}")
+    latency = time.perf_counter() - start
+    ok = status < 400
+    result.samples.append(Sample(f"{method} {template}", step, latency, ok, status))
+    if not ok:
+        raise JourneyFailed(f"{step}: HTTP {status} {response.text[:200]}")
+    return response.json()
+
+
+async def run_journey(client, founder: int, think_time: Callable[[], float] = lambda: 0.0) -> JourneyResult:
+    """Drive one founder from a new project to a generated PRD.
+
+    `client` is an httpx.AsyncClient already carrying this founder's bearer
+    token; offline mode treats every distinct token as its own user.
+    """
+    result = JourneyResult(founder)
+
+    async def call(step, method, path, template, json=None):
+        data = await _call(client, result, step, method, path, template, json)
+        pause = think_time()
+        if pause:
+            await asyncio.sleep(pause)
+        return data
+
+    try:
+        project = await call("setup.create_project", "POST", "/api/projects", "/api/projects",
+                             {"name": f"Load test founder {founder}"})
+        project_id = project["project_id"]
+        await call("setup.workspace", "GET", f"/api/projects/{project_id}/workspace",
+                   "/api/projects/{id}/workspace")
+
+        def chat(step, phase, message, step_data=None):
+            body = {"project_id": project_id, "message": message, "phase": phase}
+            if step_data is not None:
+                body["step_data"] = step_data
+            return call(step, "POST", "/api/chat", "/api/chat", body)
+
+        def advance(step, phase):
+            return call(step, "POST", f"/api/projects/{project_id}/advance-phase",
+                        "/api/projects/{id}/advance-phase", {"current_phase": phase})
+
+        for message in IDEATION_MESSAGES:
+            await chat("phase1.chat", 1, message)
+        await advance("phase1.advance", 1)
+
+        for message in FEATURE_MESSAGES:
+            await chat("phase2.chat", 2, message)
+        await advance("phase2.advance", 2)
+
+        await chat("phase3.init", 3, "__init_phase_3__")
+        await chat("phase3.step1", 3, ", ".join(COMPLEMENTARY_FEATURES),
+                   {"step": 1, "selections": COMPLEMENTARY_FEATURES})
+        await chat("phase3.step2", 3, "Light theme", {"step": 2, "selection": "light"})
+        await chat("phase3.step3", 3, PALETTE["name"], {"step": 3, "selection": PALETTE})
+        await chat("phase3.step4", 3, "Minimalist", {"step": 4, "selection": "Minimalist"})
+        await chat("phase3.step5", 3, "__auto_step_5__", {"step": 5})
+        await advance("phase3.advance", 3)
+
+        await call("phase4.generate_prd", "POST", f"/api/projects/{project_id}/generate-prd",
+                   "/api/projects/{id}/generate-prd")
+    except JourneyFailed as e:
+        result.error = str(e)
+    return result
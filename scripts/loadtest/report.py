@@ -0,0 +1,119 @@
+"""
+Latency summaries, the results file and regression comparison.
+
+Results are plain JSON: one entry per concurrency level with p50/p95/p99
+(milliseconds) per endpoint and per journey step, plus event loop lag. The
+max sustainable concurrency is the highest level whose overall p95 stayed
+within the SLO with an error rate under the limit.
+"""
+
+import json
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of unsorted values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_stats(latencies: Iterable[float], errors: int = 0) -> Dict:
+    values = [v * 1000 for v in latencies]
+    stats = {"count": len(values), "errors": errors}
+    for pct in PERCENTILES:
+        stats[f"p{pct}"] = round(percentile(values, pct), 2)
+    stats["max"] = round(max(values), 2) if values else 0.0
+    return stats
+
+
+def summarize_level(run: Dict, slo_ms: float, max_error_rate: float) -> Dict:
+    results = run["results"]
+    samples = [s for r in results for s in r.samples]
+    by_endpoint, by_step = defaultdict(list), defaultdict(list)
+    errors_endpoint, errors_step = defaultdict(int), defaultdict(int)
+    for sample in samples:
+        by_endpoint[sample.endpoint].append(sample.latency)
+        by_step[sample.step].append(sample.latency)
+        if not sample.ok:
+            errors_endpoint[sample.endpoint] += 1
+            errors_step[sample.step] += 1
+
+    failed = [r for r in results if not r.ok]
+    error_rate = len(failed) / len(results) if results else 1.0
+    overall = latency_stats((s.latency for s in samples), sum(not s.ok for s in samples))
+    summary = {
+        "concurrency": run["concurrency"],
+        "elapsed_s": round(run["elapsed"], 2),
+        "journeys": len(results),
+        "failed_journeys": len(failed),
+        "error_rate": round(error_rate, 4),
+        "journeys_per_min": round(len(results) / run["elapsed"] * 60, 2) if run["elapsed"] else 0.0,
+        "requests_per_s": round(len(samples) / run["elapsed"], 2) if run["elapsed"] else 0.0,
+        "overall": overall,
+        "loop_lag_ms": latency_stats(run["loop_lag"]) if run["loop_lag"] is not None else None,
+        "endpoints": {k: latency_stats(v, errors_endpoint[k]) for k, v in sorted(by_endpoint.items())},
+        "steps": {k: latency_stats(v, errors_step[k]) for k, v in by_step.items()},
+        "sample_errors": sorted({r.error for r in failed})[:5],
+    }
+    summary["sustainable"] = overall["p95"] <= slo_ms and error_rate <= max_error_rate
+    return summary
+
+
+def max_sustainable(levels: List[Dict]) -> int:
+    """Highest concurrency reached before the first level that broke the SLO (0 if none held)."""
+    best = 0
+    for level in levels:
+        if not level["sustainable"]:
+            break
+        best = level["concurrency"]
+    return best
+
+
+def write_results(path: str, results: Dict) -> None:
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Regressions of current against baseline: p95 per endpoint/step at shared
+    concurrency levels grown by more than `tolerance` (0.2 = 20%), or a lower
+    max sustainable concurrency."""
+    regressions = []
+    if current["max_sustainable_concurrency"] < baseline["max_sustainable_concurrency"]:
+        regressions.append(
+            f"max sustainable concurrency {baseline['max_sustainable_concurrency']} -> "
+            f"{current['max_sustainable_concurrency']}"
+        )
+    baseline_levels = {level["concurrency"]: level for level in baseline["levels"]}
+    for level in current["levels"]:
+        before = baseline_levels.get(level["concurrency"])
+        if not before:
+            continue
+        for group in ("endpoints", "steps"):
+            for key, stats in level[group].items():
+                old = before[group].get(key)
+                if old and old["p95"] and stats["p95"] > old["p95"] * (1 + tolerance):
+                    regressions.append(
+                        f"c={level['concurrency']} {key}: p95 {old['p95']:.0f}ms -> {stats['p95']:.0f}ms"
+                    )
+    return regressions
+
+
+def format_level(level: Dict, group: str = "steps") -> List[str]:
+    lag = level["loop_lag_ms"]
+    lag_text = f"loop lag p99 {lag['p99']:.0f}ms max {lag['max']:.0f}ms" if lag else "loop lag n/a"
+    lines = [
+        f"concurrency {level['concurrency']}: {level['journeys']} journeys, "
+        f"{level['failed_journeys']} failed, {level['journeys_per_min']} journeys/min, {lag_text}"
+    ]
+    for key, stats in level[group].items():
+        lines.append(f"    {key:<40}{stats['p50']:>10.0f}{stats['p95']:>10.0f}{stats['p99']:>10.0f}")
+    return lines
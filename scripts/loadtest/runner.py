@@ -0,0 +1,151 @@
+"""
+Concurrency ramp against one server worker.
+
+In-process mode starts the app under uvicorn on a background thread with
+FOUNDERLAB_OFFLINE=1 (backend/offline.py fakes, with the injected
+latencies), so a run needs no keys and no network and measures exactly one
+worker. A lag monitor runs on the server's own event loop: it sleeps for a
+fixed interval and records how late it wakes up, which is the time the loop
+spent blocked by synchronous work in request handlers.
+
+With --url the journeys go to an already running server instead and event
+loop lag is not available.
+"""
+
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from journey import JourneyResult, run_journey
+
+backend_dir = Path(__file__).resolve().parent.parent.parent / "backend"
+
+LAG_INTERVAL_SECONDS = 0.01
+REQUEST_TIMEOUT_SECONDS = 600
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = LAG_INTERVAL_SECONDS):
+        self.interval = interval
+        self._samples: List[float] = []
+
+    async def run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self._samples.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def drain(self) -> List[float]:
+        """Samples since the last drain."""
+        samples, self._samples = self._samples, []
+        return samples
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def load_offline_app(llm_ms: float, llm_ms_per_token: float, db_ms: float, search_ms: float):
+    """Import backend/server.py wired to the offline fakes with the given latencies."""
+    os.environ["FOUNDERLAB_OFFLINE"] = "1"
+    os.environ["OFFLINE_LLM_LATENCY_MS"] = str(llm_ms)
+    os.environ["OFFLINE_LLM_MS_PER_TOKEN"] = str(llm_ms_per_token)
+    os.environ["OFFLINE_DB_LATENCY_MS"] = str(db_ms)
+    os.environ["OFFLINE_SEARCH_LATENCY_MS"] = str(search_ms)
+    # A warm cache from an earlier run would hide LLM latency
+    os.environ["LLM_CACHE_PATH"] = ""
+    os.environ.pop("LLM_DAILY_TOKEN_QUOTA", None)
+    sys.path.insert(0, str(backend_dir))
+    import server
+    return server.app
+
+
+class ServerThread:
+    """uvicorn serving `app` on its own thread and event loop (one worker)."""
+
+    def __init__(self, app):
+        import uvicorn
+
+        self.port = _free_port()
+        self.server = uvicorn.Server(uvicorn.Config(
+            app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="on",
+        ))
+        self.lag = LoopLagMonitor()
+        self.thread = threading.Thread(target=lambda: asyncio.run(self._serve()), name="loadtest-server", daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def _serve(self) -> None:
+        monitor = asyncio.create_task(self.lag.run())
+        try:
+            await self.server.serve()
+        finally:
+            monitor.cancel()
+
+    def start(self) -> None:
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("Server failed to start")
+            time.sleep(0.05)
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=30)
+
+
+@asynccontextmanager
+async def founder_client(base_url: str, founder: int, run_id: str):
+    headers = {"Authorization": f"Bearer loadtest-{run_id}-{founder}"}
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=REQUEST_TIMEOUT_SECONDS) as client:
+        yield client
+
+
+async def run_level(base_url: str, concurrency: int, journeys: int, run_id: str,
+                    think_ms: float = 0.0, first_founder: int = 0) -> Dict:
+    """`concurrency` founders in parallel, each running `journeys` journeys back to back."""
+    think_time = (lambda: think_ms / 1000) if think_ms else (lambda: 0.0)
+
+    async def founder(index: int) -> List[JourneyResult]:
+        results = []
+        async with founder_client(base_url, index, run_id) as client:
+            for _ in range(journeys):
+                results.append(await run_journey(client, index, think_time))
+        return results
+
+    start = time.perf_counter()
+    per_founder = await asyncio.gather(*(founder(first_founder + i) for i in range(concurrency)))
+    return {
+        "concurrency": concurrency,
+        "elapsed": time.perf_counter() - start,
+        "results": [r for results in per_founder for r in results],
+    }
+
+
+async def ramp(base_url: str, levels: List[int], journeys: int, run_id: str, think_ms: float,
+               lag: Optional[LoopLagMonitor], on_level) -> List[Dict]:
+    """Run each concurrency level in turn; on_level(run) may return False to stop the ramp."""
+    runs = []
+    first_founder = 0
+    for concurrency in levels:
+        if lag:
+            lag.drain()
+        run = await run_level(base_url, concurrency, journeys, run_id, think_ms, first_founder)
+        run["loop_lag"] = lag.drain() if lag else None
+        first_founder += concurrency
+        runs.append(run)
+        if on_level(run) is False:
+            break
+    return runs
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+FounderLab - Migration Runner
+Applies migrations/NNN_*.sql in order, records them in schema_migrations,
+then checks with EXPLAIN that the hot queries are served by their indexes.
+
+Needs a direct Postgres connection string (Supabase: Project Settings →
+Database → Connection string) in SUPABASE_DB_URL, in backend/.env or the
+environment. SUPABASE_SETUP.sql must have been run once first.
+
+Usage:
+  python scripts/migrate.py              apply pending migrations, then verify
+  python scripts/migrate.py --status     list applied / pending migrations
+  python scripts/migrate.py --dry-run    show what would be applied
+  python scripts/migrate.py --verify     only run the EXPLAIN checks
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+root_dir = Path(__file__).parent.parent
+backend_dir = root_dir / 'backend'
+migrations_dir = root_dir / 'migrations'
+
+load_dotenv(backend_dir / '.env')
+
+# Colors for terminal output
+GREEN = '\033[92m'
+RED = '\033[91m'
+YELLOW = '\033[93m'
+RESET = '\033[0m'
+
+MIGRATION_FILE = re.compile(r'^(\d{3})_(\w+)\.sql$')
+
+LEDGER_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+)
+"""
+
+NO_ID = "'00000000-0000-0000-0000-000000000000'::uuid"
+
+# (description, index the plan must use, whether the plan may contain a Sort, query)
+INDEX_CHECKS = [
+    ("chat history by phase", "idx_messages_project_phase_created", False,
+     f"SELECT * FROM messages WHERE project_id = {NO_ID} AND phase = 1 ORDER BY created_at"),
+    ("PRD document lookup", "idx_documents_project_doc_type", True,
+     f"SELECT * FROM documents WHERE project_id = {NO_ID} AND doc_type = 'prd'"),
+    ("dashboard project page", "idx_projects_user_updated", False,
+     f"SELECT id FROM projects WHERE user_id = {NO_ID} AND deleted_at IS NULL "
+     "ORDER BY updated_at DESC, id DESC LIMIT 51"),
+]
+
+
+def load_migrations():
+    """[(version, name, sql, checksum)] for every migrations/NNN_name.sql, in order."""
+    migrations = []
+    for path in sorted(migrations_dir.glob('*.sql')):
+        match = MIGRATION_FILE.match(path.name)
+        if not match:
+            print(f"{YELLOW}Skipping {path.name}: not named NNN_name.sql{RESET}")
+            continue
+        sql = path.read_text(encoding='utf-8')
+        migrations.append((match.group(1), match.group(2), sql, hashlib.sha256(sql.encode()).hexdigest()))
+    return migrations
+
+
+def applied_migrations(conn):
+    conn.execute(LEDGER_SQL)
+    rows = conn.execute("SELECT version, checksum FROM schema_migrations").fetchall()
+    return dict(rows)
+
+
+def check_baseline(conn):
+    row = conn.execute("SELECT to_regclass('public.projects')").fetchone()
+    if row[0] is None:
+        print(f"{RED}Table 'projects' not found — run SUPABASE_SETUP.sql in the Supabase SQL Editor first.{RESET}")
+        sys.exit(1)
+
+
+def show_status(conn, migrations):
+    applied = applied_migrations(conn)
+    for version, name, _, checksum in migrations:
+        if version not in applied:
+            state = f"{YELLOW}pending{RESET}"
+        elif applied[version] != checksum:
+            state = f"{RED}applied (file changed since){RESET}"
+        else:
+            state = f"{GREEN}applied{RESET}"
+        print(f"  {version}_{name:<40} {state}")
+
+
+def apply_pending(conn, migrations, dry_run=False):
+    applied = applied_migrations(conn)
+    pending = [m for m in migrations if m[0] not in applied]
+
+    for version, name, _, checksum in migrations:
+        if version in applied and applied[version] != checksum:
+            print(f"{YELLOW}Warning: {version}_{name}.sql changed after it was applied — add a new migration instead{RESET}")
+
+    if not pending:
+        print(f"{GREEN}Schema is up to date.{RESET}")
+        return
+
+    for version, name, sql, checksum in pending:
+        if dry_run:
+            print(f"  would apply {version}_{name}")
+            continue
+        print(f"  applying {version}_{name} ...", end=" ", flush=True)
+        # Each migration and its ledger row commit together, or not at all
+        with conn.transaction():
+            conn.execute(sql)
+            conn.execute(
+                "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                (version, name, checksum),
+            )
+        print(f"{GREEN}done{RESET}")
+
+
+def verify_indexes(conn):
+    """EXPLAIN each hot query and check it uses its index. Returns True if all pass."""
+    ok = True
+    for description, index, sort_allowed, query in INDEX_CHECKS:
+        with conn.transaction():
+            # Tiny dev tables would otherwise be seq-scanned; we want to know the index is usable
+            conn.execute("SET LOCAL enable_seqscan = off")
+            plan = "\n".join(r[0] for r in conn.execute(f"EXPLAIN {query}").fetchall())
+        uses_index = index in plan
+        has_sort = re.search(r'^\s*(->\s*)?Sort\b', plan, re.MULTILINE) is not None
+        passed = uses_index and (sort_allowed or not has_sort)
+        ok &= passed
+        mark = f"{GREEN}✓{RESET}" if passed else f"{RED}✗{RESET}"
+        print(f"  {mark} {description}: {index}" + ("" if uses_index else " not used")
+              + (" (plan sorts)" if has_sort and not sort_allowed else ""))
+        if not passed:
+            print("\n".join(f"      {line}" for line in plan.splitlines()))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply database migrations")
+    parser.add_argument("--status", action="store_true", help="list applied and pending migrations")
+    parser.add_argument("--dry-run", action="store_true", help="show pending migrations without applying")
+    parser.add_argument("--verify", action="store_true", help="only run the EXPLAIN index checks")
+    args = parser.parse_args()
+
+    db_url = os.environ.get("SUPABASE_DB_URL")
+    if not db_url:
+        print(f"{RED}SUPABASE_DB_URL is not set (add it to backend/.env).{RESET}")
+        sys.exit(1)
+
+    import psycopg
+
+    migrations = load_migrations()
+    with psycopg.connect(db_url, autocommit=True) as conn:
+        check_baseline(conn)
+
+        if args.status:
+            show_status(conn, migrations)
+            return
+        if not args.verify:
+            print("Migrations:")
+            apply_pending(conn, migrations, dry_run=args.dry_run)
+            if args.dry_run:
+                return
+
+        print("\nIndex checks:")
+        if not verify_indexes(conn):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+FounderLab - Prompt Budget
+Replays recorded conversations through the backend's prompt assembly and
+checks prompt size and cost per phase against budgets, so a change to
+PHASE_PROMPTS, the project context or the PRD section prompt builders shows
+up as numbers before it ships.
+
+  (default) For every fixture in scripts/fixtures/conversations, rebuild the
+            exact messages each phase 1/2/5 chat turn would send (phase
+            prompt, project context, history so far) and each PRD section
+            prompt. Reports prompt tokens per turn, growth per turn and
+            estimated cost per phase; exits 1 when any phase exceeds
+            scripts/fixtures/prompt_budgets.json.
+  record    Capture a real project from Supabase as a new fixture. Emails,
+            URLs, phone numbers, ids and the project name are replaced
+            before anything is written. Needs SUPABASE_* in backend/.env.
+
+Fixtures hold the project as captured, so earlier turns are replayed with the
+final canvas and summaries of earlier phases - an upper bound on what was
+sent. Web search results injected at request time are not stored and not
+replayed. Tokens are counted with tiktoken when installed, otherwise
+estimated at 4 characters per token; completion tokens come from the
+recorded replies.
+
+Usage: python scripts/prompt_budget.py [--budgets file] [--json out.json] [--verbose]
+       python scripts/prompt_budget.py record <project_id> [--label name]
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+root_dir = Path(__file__).parent.parent
+backend_dir = root_dir / 'backend'
+sys.path.insert(0, str(backend_dir))
+
+load_dotenv(backend_dir / '.env')
+
+from discovery import build_discovery_summary  # noqa: E402
+from llm_routing import estimate_cost  # noqa: E402
+from project_state import ProjectState  # noqa: E402
+
+FIXTURES_DIR = root_dir / 'scripts' / 'fixtures' / 'conversations'
+BUDGETS_PATH = root_dir / 'scripts' / 'fixtures' / 'prompt_budgets.json'
+
+# Colors for terminal output
+GREEN = '\033[92m'
+RED = '\033[91m'
+YELLOW = '\033[93m'
+RESET = '\033[0m'
+
+# Chat format overhead per message and for priming the reply (OpenAI's counting guide)
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+# Phases 3 and 4 never reach get_ai_response (step controller / PRD endpoint)
+CHAT_PHASES = (1, 2, 5)
+PRD_PHASE = 4
+
+BUDGET_FIELDS = ("max_prompt_tokens", "max_growth_per_turn", "max_cost_usd")
+
+
+# --- Token counting ---
+
+_encodings = {}
+
+
+def count_tokens(text: str, model: str) -> int:
+    if not TIKTOKEN_AVAILABLE:
+        return math.ceil(len(text) / 4)
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("o200k_base")
+    return len(_encodings[model].encode(text))
+
+
+def count_message_tokens(messages, model: str) -> int:
+    return sum(TOKENS_PER_MESSAGE + count_tokens(m["content"], model) for m in messages) + TOKENS_PER_REPLY
+
+
+# --- Replay ---
+
+def load_backend():
+    """server.py wired to the offline fakes: prompt assembly needs no keys or network."""
+    os.environ["FOUNDERLAB_OFFLINE"] = "1"
+    # Backend logs share stdout with the report (and --json)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import server
+    return server
+
+
+def replay_chat(server, fixture, phase):
+    """Token counts for each user turn of one chat phase, in order."""
+    site = "phase_chat"
+    model = server.model_router.model(site)
+    project = ProjectState({**fixture["project"], "id": "fixture", "phase": phase})
+    project_context = server.build_chat_context(project, phase)
+
+    history, turns = [], []
+    messages = [m for m in fixture["messages"] if m["phase"] == phase and m["role"] in ("user", "assistant")]
+    for i, message in enumerate(messages):
+        history.append({"role": message["role"], "content": message["content"]})
+        if message["role"] != "user":
+            continue
+        reply = messages[i + 1]["content"] if i + 1 < len(messages) and messages[i + 1]["role"] == "assistant" else ""
+        prompt_tokens = count_message_tokens(server.build_chat_messages(history, phase, project_context), model)
+        completion_tokens = count_tokens(reply, model)
+        turns.append({
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cost_usd": estimate_cost(model, prompt_tokens, completion_tokens),
+        })
+    return model, turns
+
+
+def replay_prd(server, fixture):
+    """Token counts for the four PRD section prompts."""
+    project = fixture["project"]
+    summary = build_discovery_summary(project.get("phase_summaries") or {}, project.get("mindmap_data") or {})
+    recorded = (project.get("prd_draft") or {}).get("sections", {})
+    builders = (server.generate_section1_prompt, server.generate_section2_prompt,
+                server.generate_section3_prompt, server.generate_section4_prompt)
+
+    model, turns = None, []
+    for number, builder in enumerate(builders, 1):
+        site = f"prd_section_{number}"
+        model = server.model_router.model(site)
+        prompt = builder(summary, project.get("name") or "Untitled Project")
+        prompt_tokens = count_message_tokens(server.build_section_messages(prompt), model)
+        completion_tokens = count_tokens(recorded.get(str(number), ""), model)
+        turns.append({
+            "section": number,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cost_usd": estimate_cost(model, prompt_tokens, completion_tokens),
+        })
+    return model, turns
+
+
+def phase_report(model, turns):
+    prompt = [t["prompt_tokens"] for t in turns]
+    growth = [b - a for a, b in zip(prompt, prompt[1:])]
+    return {
+        "model": model,
+        "turns": len(turns),
+        "first_prompt_tokens": prompt[0],
+        "max_prompt_tokens": max(prompt),
+        "total_prompt_tokens": sum(prompt),
+        "total_completion_tokens": sum(t["completion_tokens"] for t in turns),
+        "mean_growth_per_turn": round(sum(growth) / len(growth), 1) if growth else 0.0,
+        "max_growth_per_turn": max(growth) if growth else 0,
+        "cost_usd": round(sum(t["cost_usd"] for t in turns), 6),
+        "per_turn": turns,
+    }
+
+
+def replay(server, fixture):
+    phases = {}
+    for phase in CHAT_PHASES:
+        model, turns = replay_chat(server, fixture, phase)
+        if turns:
+            phases[str(phase)] = phase_report(model, turns)
+    if fixture["project"].get("phase_summaries"):
+        model, turns = replay_prd(server, fixture)
+        # PRD sections are independent prompts, not a growing conversation
+        report = phase_report(model, turns)
+        report["mean_growth_per_turn"] = report["max_growth_per_turn"] = 0
+        phases[str(PRD_PHASE)] = report
+    return phases
+
+
+def over_budget(phases, budgets):
+    failures = []
+    for phase, report in phases.items():
+        budget = budgets.get(phase, {})
+        for field in BUDGET_FIELDS:
+            limit = budget.get(field)
+            actual = report["cost_usd"] if field == "max_cost_usd" else report[field]
+            if limit is not None and actual > limit:
+                failures.append(f"phase {phase} {field}: {actual} > {limit}")
+    return failures
+
+
+def run_replay(args):
+    fixtures = sorted(Path(args.fixtures).glob("*.json"))
+    if not fixtures:
+        print(f"{RED}No fixtures in {args.fixtures}{RESET}")
+        sys.exit(1)
+    with open(args.budgets) as f:
+        budgets = json.load(f)
+
+    server = load_backend()
+    if not TIKTOKEN_AVAILABLE:
+        print(f"{YELLOW}tiktoken not installed: estimating 4 characters per token{RESET}")
+
+    results, failed = {}, False
+    print(f"\n{'fixture':<28}{'phase':>6}{'turns':>7}{'max prompt':>12}{'growth/turn':>13}{'cost $':>10}")
+    for path in fixtures:
+        with open(path) as f:
+            fixture = json.load(f)
+        phases = replay(server, fixture)
+        failures = over_budget(phases, budgets)
+        results[path.stem] = {"phases": phases, "over_budget": failures}
+        for phase, report in phases.items():
+            color = RED if any(f.startswith(f"phase {phase} ") for f in failures) else GREEN
+            print(f"{color}{path.stem:<28}{phase:>6}{report['turns']:>7}{report['max_prompt_tokens']:>12}"
+                  f"{report['mean_growth_per_turn']:>13}{report['cost_usd']:>10.4f}{RESET}")
+            if args.verbose:
+                for i, turn in enumerate(report["per_turn"], 1):
+                    print(f"{'':<28}{'':>6}{i:>7}{turn['prompt_tokens']:>12}{'':>13}{turn['cost_usd']:>10.4f}")
+        for failure in failures:
+            print(f"  {RED}over budget: {failure}{RESET}")
+        failed = failed or bool(failures)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "token_counter": "tiktoken" if TIKTOKEN_AVAILABLE else "chars/4",
+                "fixtures": results,
+            }, f, indent=2)
+            f.write("\n")
+        print(f"\nResults written to {args.json}")
+
+    if failed:
+        print(f"\n{RED}Prompt budget exceeded (budgets: {args.budgets}){RESET}")
+        sys.exit(1)
+    print(f"\n{GREEN}All {len(fixtures)} fixtures within budget{RESET}")
+
+
+# --- Record ---
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+URL_RE = re.compile(r"https?://[^\s)\]\"']+")
+# Nine or more digits, so dates and amounts survive
+PHONE_RE = re.compile(r"\+?\d(?:[\s().-]*\d){8,}")
+UUID_RE = re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.IGNORECASE)
+
+
+def sanitizer(project_name: str, label: str):
+    name_re = re.compile(re.escape(project_name), re.IGNORECASE) if project_name else None
+    ids = {}
+
+    def clean(value):
+        if isinstance(value, dict):
+            return {k: clean(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [clean(v) for v in value]
+        if not isinstance(value, str):
+            return value
+        value = EMAIL_RE.sub("founder@example.com", value)
+        value = URL_RE.sub("https://example.com", value)
+        value = UUID_RE.sub(lambda m: ids.setdefault(m.group(0).lower(), f"id-{len(ids) + 1}"), value)
+        value = PHONE_RE.sub("555-0100", value)
+        if name_re:
+            value = name_re.sub(label, value)
+        return value
+
+    return clean
+
+
+def run_record(args):
+    from supabase import create_client
+
+    client = create_client(os.environ["SUPABASE_PROJECT_URL"], os.environ["SUPABASE_SERVICE_ROLE_KEY"])
+    rows = client.table("projects").select(
+        "name, phase, phase_summaries, canvas_state, mindmap_data, prd_draft"
+    ).eq("id", args.project_id).execute().data
+    if not rows:
+        print(f"{RED}Project {args.project_id} not found{RESET}")
+        sys.exit(1)
+    project = rows[0]
+    messages = client.table("messages").select("phase, role, content").eq(
+        "project_id", args.project_id
+    ).order("created_at").execute().data or []
+
+    label = args.label or f"Project {args.project_id[:8]}"
+    clean = sanitizer(project.get("name") or "", label)
+    fixture = {
+        "captured_at": time.strftime("%Y-%m-%d", time.gmtime()),
+        "project": clean({
+            "name": label,
+            "phase": project.get("phase"),
+            **{k: project.get(k) for k in ("phase_summaries", "canvas_state", "mindmap_data", "prd_draft")},
+        }),
+        "messages": clean(messages),
+    }
+    # JSON columns were plain text before migrations/001
+    for column in ("phase_summaries", "canvas_state", "mindmap_data", "prd_draft"):
+        if isinstance(fixture["project"][column], str):
+            fixture["project"][column] = json.loads(fixture["project"][column] or "null")
+
+    slug = re.sub(r"[^a-z0-9]+", "_", label.lower()).strip("_")
+    out = Path(args.fixtures) / f"{slug}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(fixture, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    print(f"{GREEN}Wrote {len(messages)} messages to {out}{RESET}")
+    print(f"{YELLOW}Review it before committing: sanitizing is pattern-based.{RESET}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay conversations through prompt assembly and check budgets")
+    parser.add_argument("--fixtures", default=str(FIXTURES_DIR))
+    commands = parser.add_subparsers(dest="command")
+
+    record_parser = commands.add_parser("record", help="capture a project as a sanitized fixture")
+    record_parser.add_argument("project_id")
+    record_parser.add_argument("--label", help="name that replaces the project's name (also the file name)")
+
+    parser.add_argument("--budgets", default=str(BUDGETS_PATH))
+    parser.add_argument("--json", help="write the full per-turn results here")
+    parser.add_argument("--verbose", action="store_true", help="show every turn")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        run_record(args)
+    else:
+        run_replay(args)
+
+
+if __name__ == "__main__":
+    main()
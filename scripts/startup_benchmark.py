@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+FounderLab - Startup Benchmark
+Measures how long a fresh interpreter takes to import server.py (what every
+new worker pays before it can serve) and, separately, what the lazily built
+clients and modules cost on first use (what the lifespan warm-up absorbs).
+Each run is a new process, so nothing is cached in memory between runs; the
+slowest modules server.py imports come from one extra run with -X importtime.
+
+Exits 1 when the median import time exceeds --max-import-ms, so CI can catch
+a heavy import creeping back into module scope.
+
+Usage: python scripts/startup_benchmark.py [--runs 5] [--top 15] [--offline]
+                                           [--max-import-ms 1500] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent / 'backend'
+
+# Colors for terminal output
+GREEN = '\033[92m'
+RED = '\033[91m'
+YELLOW = '\033[93m'
+RESET = '\033[0m'
+
+RESULT_PREFIX = "STARTUP_RESULT "
+
+# Runs inside the child process, with backend/ as the working directory
+CHILD = f"""
+import json, sys, time
+sys.path.insert(0, ".")
+started = time.perf_counter()
+import server
+imported = time.perf_counter() - started
+first_use = {{}}
+for resource in server.lazy_resources:
+    started = time.perf_counter()
+    try:
+        resource.get()
+        first_use[resource.name] = round((time.perf_counter() - started) * 1000, 1)
+    except Exception as e:
+        first_use[resource.name] = f"{{type(e).__name__}}: {{e}}"
+print({RESULT_PREFIX!r} + json.dumps({{"import_ms": round(imported * 1000, 1), "first_use_ms": first_use}}))
+"""
+
+
+def child_env(offline):
+    env = dict(os.environ, LOG_LEVEL="WARNING", STARTUP_WARMUP="0")
+    if offline:
+        env["FOUNDERLAB_OFFLINE"] = "1"
+    return env
+
+
+def run_once(offline):
+    proc = subprocess.run([sys.executable, "-c", CHILD], cwd=backend_dir, env=child_env(offline),
+                          capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError(f"import failed:\n{proc.stderr[-2000:]}")
+
+
+def slowest_imports(offline, top):
+    """(cumulative ms, module) for the slowest modules server.py imports directly, from -X importtime."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import server"], cwd=backend_dir,
+                          env=child_env(offline), capture_output=True, text=True)
+    # A module's line follows those of everything it imported; each level is indented two more spaces
+    children = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((int(cumulative) / 1000, name.strip()))
+        elif depth == 0:
+            if name.strip() == "server":
+                return sorted(children, reverse=True)[:top]
+            children = []
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend import time and first-use costs")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest imports of server.py to list")
+    parser.add_argument("--offline", action="store_true", help="import with FOUNDERLAB_OFFLINE=1 (no keys needed)")
+    parser.add_argument("--max-import-ms", type=float, help="exit 1 when the median import time is above this")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    runs = [run_once(args.offline) for _ in range(args.runs)]
+    import_ms = [r["import_ms"] for r in runs]
+    median = statistics.median(import_ms)
+
+    print(f"import server: median {median:.0f}ms, min {min(import_ms):.0f}ms, max {max(import_ms):.0f}ms "
+          f"over {len(runs)} runs")
+
+    # First use only costs something in a process that hasn't built the resource yet: report the median
+    print("\nfirst use (deferred to the lifespan warm-up):")
+    first_use = {}
+    for name in runs[0]["first_use_ms"]:
+        values = [r["first_use_ms"][name] for r in runs]
+        numbers = [v for v in values if isinstance(v, (int, float))]
+        if numbers:
+            first_use[name] = statistics.median(numbers)
+            print(f"  {name:<12}{first_use[name]:>9.0f}ms")
+        else:
+            first_use[name] = values[0]
+            print(f"  {name:<12}{YELLOW}{values[0]}{RESET}")
+
+    imports = slowest_imports(args.offline, args.top)
+    print("\nslowest imports of server.py (cumulative):")
+    for ms, name in imports:
+        print(f"  {ms:>9.1f}ms  {name}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "import_ms": {"median": median, "min": min(import_ms), "max": max(import_ms), "runs": import_ms},
+                "first_use_ms": first_use,
+                "slowest_imports": [{"module": name, "cumulative_ms": ms} for ms, name in imports],
+            }, f, indent=2)
+
+    if args.max_import_ms is not None:
+        if median > args.max_import_ms:
+            print(f"\n{RED}Median import time {median:.0f}ms is over the {args.max_import_ms:.0f}ms budget{RESET}")
+            sys.exit(1)
+        print(f"\n{GREEN}Median import time within the {args.max_import_ms:.0f}ms budget{RESET}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+FounderLab - Trace Report
+Summarizes spans written by the backend with TRACE_EXPORTER=file: time per
+span name (auth, each Supabase table/operation, each LLM call type, search,
+PDF rendering, background jobs) and a breakdown of the slowest requests.
+
+Usage: python scripts/trace_report.py [--file /tmp/founderlab_traces.jsonl]
+                                      [--slowest 5] [--project <id>] [--route "POST /api/chat"]
+"""
+
+import argparse
+import json
+import math
+from collections import defaultdict
+
+# Colors for terminal output
+GREEN = '\033[92m'
+RED = '\033[91m'
+YELLOW = '\033[93m'
+RESET = '\033[0m'
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1] if ordered else 0.0
+
+
+def load_spans(path):
+    spans = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                spans.append(json.loads(line))
+    return spans
+
+
+def print_tree(span, children, depth=0):
+    attrs = span["attributes"]
+    tags = " ".join(f"{k}={attrs[k]}" for k in ("project.phase", "project.step", "llm.site", "db.response.rows") if k in attrs)
+    color = RED if span["status"] == "ERROR" else ""
+    error = f"  {span['error']}" if span.get("error") else ""
+    print(f"  {'  ' * depth}{color}{span['duration_ms']:>9.1f}ms  {span['name']}  {tags}{error}{RESET if color else ''}")
+    for child in sorted(children.get(span["span_id"], []), key=lambda s: s["start_time_unix_nano"]):
+        print_tree(child, children, depth + 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a trace file")
+    parser.add_argument("--file", default="/tmp/founderlab_traces.jsonl")
+    parser.add_argument("--slowest", type=int, default=5, help="request traces to break down")
+    parser.add_argument("--project", help="only traces for this project id")
+    parser.add_argument("--route", help='only requests to this route, e.g. "POST /api/chat"')
+    args = parser.parse_args()
+
+    spans = load_spans(args.file)
+    by_trace = defaultdict(list)
+    for span in spans:
+        by_trace[span["trace_id"]].append(span)
+    if args.project:
+        by_trace = {t: s for t, s in by_trace.items()
+                    if any(x["attributes"].get("project.id") == args.project for x in s)}
+    spans = [s for trace in by_trace.values() for s in trace]
+
+    by_name = defaultdict(list)
+    errors = defaultdict(int)
+    for span in spans:
+        by_name[span["name"]].append(span["duration_ms"])
+        errors[span["name"]] += span["status"] == "ERROR"
+
+    print(f"{len(spans)} spans in {len(by_trace)} traces\n")
+    print(f"{'span':<52}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'total s':>10}")
+    for name, durations in sorted(by_name.items(), key=lambda item: -sum(item[1])):
+        color = RED if errors[name] else ""
+        print(f"{color}{name[:51]:<52}{len(durations):>7}{errors[name]:>8}{percentile(durations, 50):>10.1f}"
+              f"{percentile(durations, 95):>10.1f}{sum(durations) / 1000:>10.2f}{RESET if color else ''}")
+
+    # Request roots are the spans with an http.route
+    roots = [s for s in spans if "http.route" in s["attributes"]]
+    if args.route:
+        roots = [s for s in roots if s["name"] == args.route]
+    roots.sort(key=lambda s: -s["duration_ms"])
+    for root in roots[:args.slowest]:
+        children = defaultdict(list)
+        for span in by_trace[root["trace_id"]]:
+            children[span["parent_id"]].append(span)
+        print(f"\n{YELLOW}trace {root['trace_id']}{RESET}")
+        print_tree(root, children)
+
+
+if __name__ == "__main__":
+    main()